@@ -0,0 +1,126 @@
+"""Synthetic configurations, along with the factories they use.
+
+Every generated configuration is valid: arguments match the signature of the
+factory they are passed to, and references only point to earlier arguments of
+the same type, such that validation exercises the full code path.
+"""
+
+import inspect
+import random
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from confit_lite.registry import REGISTRY
+
+TYPES = [int, float, str, bool]
+
+
+@dataclass
+class GeneratorConfig:
+    n_keys: int = 1_000
+    """Approximate number of keys in the document."""
+
+    depth: int = 2
+    """Number of dotted components in table headers."""
+
+    reference_density: float = 0.1
+    """Fraction of arguments given as a reference to another argument."""
+
+    registry_size: int = 50
+    """Number of registered factories."""
+
+    arguments: int = 6
+    """Number of arguments per factory."""
+
+    seed: int = 0
+
+
+def make_factory(index: int, n_arguments: int) -> Callable:
+    """Build a factory with typed arguments, named after their type."""
+    annotations: dict[str, Any] = {
+        f"{TYPES[j % len(TYPES)].__name__}{j}": TYPES[j % len(TYPES)]
+        for j in range(n_arguments)
+    }
+
+    def factory(**kwargs: Any) -> dict[str, Any]:
+        return kwargs
+
+    factory.__name__ = factory.__qualname__ = f"factory{index}"
+    factory.__doc__ = f"Synthetic factory number {index}."
+
+    annotations["return"] = dict
+    factory.__annotations__ = annotations
+
+    # Give `inspect.signature` explicit parameters rather than `**kwargs`.
+    factory.__signature__ = inspect.Signature(
+        [
+            inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, annotation=kind)
+            for name, kind in annotations.items()
+            if name != "return"
+        ],
+        return_annotation=dict,
+    )
+
+    return factory
+
+
+def register_factories(config: GeneratorConfig) -> list[str]:
+    names = list[str]()
+
+    for i in range(config.registry_size):
+        name = f"bench.factory{i}"
+        if name not in REGISTRY:
+            REGISTRY[name] = make_factory(i, config.arguments)
+        names.append(name)
+
+    return names
+
+
+def literal(kind: type, rng: random.Random) -> str:
+    if kind is int:
+        return str(rng.randrange(1000))
+    if kind is float:
+        return f"{rng.random() * 100:.3f}"
+    if kind is bool:
+        return rng.choice(["true", "false"])
+    return f'"value {rng.randrange(1000)}"'
+
+
+def generate(config: GeneratorConfig) -> str:
+    """Generate a TOML configuration, registering the factories it uses."""
+    rng = random.Random(config.seed)
+    names = register_factories(config)
+
+    # Header, factory key and arguments.
+    n_tables = max(1, config.n_keys // (config.arguments + 2))
+
+    # Paths of the arguments defined so far, by argument name.
+    defined = dict[str, list[str]]()
+
+    lines = list[str]()
+
+    for i in range(n_tables):
+        prefix = ".".join(
+            f"group{(i >> (4 * level)) % 16}"
+            for level in range(config.depth - 1, 0, -1)
+        )
+        table = f"{prefix}.model{i}" if prefix else f"model{i}"
+
+        lines.append(f"[{table}]")
+        lines.append(f'factory = "{rng.choice(names)}"')
+
+        for j in range(config.arguments):
+            kind = TYPES[j % len(TYPES)]
+            argument = f"{kind.__name__}{j}"
+
+            candidates = defined.setdefault(argument, [])
+
+            if candidates and rng.random() < config.reference_density:
+                lines.append(f'{argument} = "${rng.choice(candidates)}"')
+            else:
+                lines.append(f"{argument} = {literal(kind, rng)}")
+                candidates.append(f"{table}.{argument}")
+
+        lines.append("")
+
+    return "\n".join(lines)
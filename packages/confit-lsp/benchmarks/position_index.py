@@ -0,0 +1,112 @@
+"""Position lookup latency, linear scan vs `RangeIndex`.
+
+Run with `python benchmarks/position_index.py [--keys N]`.
+"""
+
+import argparse
+import random
+import time
+from array import array
+
+from lsprotocol.types import Position
+
+from confit_lsp.descriptor import ConfigurationView
+from confit_lsp.parsers.types import MISSING
+from confit_lsp.ranges import RangeTable
+
+
+def synthetic_view(n_keys: int) -> ConfigurationView:
+    """A view with tables of ten arguments each, one element per line."""
+    rows = dict[tuple[str, ...], int]()
+    keys, values = array("q"), array("q")
+
+    line = 0
+    for i in range(0, n_keys, 10):
+        table = (f"table{i}",)
+        rows[table] = len(rows)
+        keys.extend((line, 1, line, 1 + len(table[0])))
+        values.extend((MISSING, 0, 0, 0))
+        line += 1
+
+        for j in range(10):
+            rows[(*table, f"arg{j}")] = len(rows)
+            keys.extend((line, 0, line, 4))
+            values.extend((line, 7, line, 10))
+            line += 1
+
+        line += 1
+
+    keys, values = RangeTable.from_columns(rows, keys, values)
+    return ConfigurationView(data={}, keys=keys, values=values)
+
+
+def linear_lookup(view: ConfigurationView, position: Position):
+    for path, location in view.keys.items():
+        end = view.values[path].end if path in view.values else location.end
+        if location.start <= position < end:
+            return path
+    return None
+
+
+def linear_range(view: ConfigurationView, start: Position, end: Position):
+    return [
+        path
+        for path, location in view.keys.items()
+        if not (location.start > end or start > location.end)
+    ]
+
+
+def measure(name: str, func, arguments) -> None:
+    timings = []
+    for args in arguments:
+        t0 = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - t0)
+
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    print(f"{name:<30} p50 {p50:>10.1f} µs   p99 {p99:>10.1f} µs")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=100_000, help="Number of keys.")
+    n_keys = parser.parse_args(argv).keys
+
+    view = synthetic_view(n_keys)
+    n_lines = max(location.end.line for location in view.keys.values()) + 1
+
+    t0 = time.perf_counter()
+    _ = view.element_index
+    _ = view.key_index
+    print(f"{n_keys} keys, index built in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+    rng = random.Random(0)
+    points = [
+        (view, Position(line=rng.randrange(n_lines), character=rng.randrange(12)))
+        for _ in range(200)
+    ]
+    windows = []
+    for _ in range(200):
+        line = rng.randrange(n_lines)
+        windows.append(
+            (
+                view,
+                Position(line=line, character=0),
+                Position(line=line + 60, character=0),
+            )
+        )
+
+    measure("point lookup (linear)", linear_lookup, points)
+    measure("point lookup (index)", ConfigurationView.get_element_from_position, points)
+    measure("range query (linear)", linear_range, windows)
+    measure(
+        "range query (index)",
+        lambda *args: list(ConfigurationView.get_keys_in_range(*args)),
+        windows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Memory held by element ranges, dicts of `Range` vs packed `RangeTable`.
+
+Run with `python benchmarks/range_storage.py [--sizes N ...]`.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from lsprotocol.types import Range
+
+from confit_lsp.descriptor import ConfigurationView
+from confit_lsp.stats import deep_size
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from generator import GeneratorConfig, generate
+
+
+def dict_layout(view: ConfigurationView) -> list:
+    """The previous layout: two dicts of `Range`, plus the merged element ranges."""
+    keys = dict(view.keys.items())
+    values = dict(view.values.items())
+
+    path_range = list[tuple[tuple[str, ...], Range]]()
+    for path, location in keys.items():
+        if (value := values.get(path)) is not None:
+            location = Range(start=location.start, end=value.end)
+        path_range.append((path, location))
+
+    return [keys, values, path_range]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1_000, 100_000],
+        help="Number of keys in the generated documents.",
+    )
+
+    for n_keys in parser.parse_args(argv).sizes:
+        view = ConfigurationView.from_source(generate(GeneratorConfig(n_keys=n_keys)))
+        n = len(view.keys)
+
+        before = deep_size(dict_layout(view))
+        after = deep_size([view.keys, view.values])
+
+        print(
+            f"{n:>8} keys   dicts {before / n:>7.1f} B/key   "
+            f"packed {after / n:>7.1f} B/key   ({before / after:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
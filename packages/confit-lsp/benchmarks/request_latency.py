@@ -0,0 +1,133 @@
+"""Hover latency on a small document, while a large one is parsed and validated.
+
+Compares parsing on the request pool with parsing on the event loop.
+Run with `python benchmarks/request_latency.py [--keys N] [--samples N]`.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from lsprotocol.types import (
+    HoverParams,
+    TextDocumentIdentifier,
+    TextDocumentItem,
+)
+from pygls.workspace import Workspace
+
+from confit_lsp import main as lsp
+from confit_lsp.diagnostics import validate_config
+from confit_lsp.metadata import MetadataStore
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from generator import GeneratorConfig, generate
+from suite import percentile
+
+SMALL = "file:///small.toml"
+LARGE = "file:///large.toml"
+
+
+def language_server(small: str, large: str) -> lsp.ConfitLanguageServer:
+    ls = lsp.ConfitLanguageServer("confit-lsp-benchmark", "v0")
+    ls.protocol._workspace = Workspace(None)
+    ls.metadata = MetadataStore(None)
+
+    for uri, source in [(SMALL, small), (LARGE, large)]:
+        ls.workspace.put_text_document(
+            TextDocumentItem(uri=uri, language_id="toml", version=0, text=source)
+        )
+
+    return ls
+
+
+async def load(ls: lsp.ConfitLanguageServer, on_loop: bool, stop: asyncio.Event):
+    """Re-parse and validate the large document until stopped."""
+    doc = ls.workspace.get_text_document(LARGE)
+    version = 0
+
+    while not stop.is_set():
+        version += 1
+
+        if on_loop:
+            view = ls.parse_source(LARGE, version, doc.source)
+            await asyncio.sleep(0)
+        else:
+            view = await ls.requests.run(ls.parse_source, LARGE, version, doc.source)
+
+        await ls.diagnostics.run(LARGE, validate_config, view)
+
+
+async def hovers(ls: lsp.ConfitLanguageServer, samples: int) -> list[float]:
+    """Latency of hover requests sent every millisecond, as seen by the client."""
+    view = ls.parse(ls.workspace.get_text_document(SMALL))
+    assert view is not None
+
+    position = next(
+        location.start for path, location in view.keys.items() if path[-1] != "factory"
+    )
+    params = HoverParams(
+        text_document=TextDocumentIdentifier(uri=SMALL),
+        position=position,
+    )
+
+    async def request(start: float) -> float:
+        await lsp.hover(ls, params)
+        return time.perf_counter() - start
+
+    tasks = list[asyncio.Task[float]]()
+    sent = time.perf_counter()
+
+    # Requests are due on a fixed schedule, which the loop may fall behind.
+    for i in range(samples):
+        tasks.append(asyncio.create_task(request(sent + i * 0.001)))
+        await asyncio.sleep(max(0, sent + (i + 1) * 0.001 - time.perf_counter()))
+
+    return sorted(await asyncio.gather(*tasks))
+
+
+async def scenario(n_keys: int, samples: int, on_loop: bool | None) -> list[float]:
+    ls = language_server(
+        generate(GeneratorConfig(n_keys=100)),
+        generate(GeneratorConfig(n_keys=n_keys)),
+    )
+    stop = asyncio.Event()
+
+    if on_loop is not None:
+        task = asyncio.create_task(load(ls, on_loop, stop))
+        await asyncio.sleep(0.1)
+
+    try:
+        return await hovers(ls, samples)
+    finally:
+        stop.set()
+        if on_loop is not None:
+            await task
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--keys",
+        type=int,
+        default=100_000,
+        help="Number of keys of the large document.",
+    )
+    parser.add_argument(
+        "--samples", type=int, default=500, help="Number of hover requests."
+    )
+    args = parser.parse_args(argv)
+    n_keys, samples = args.keys, args.samples
+
+    for name, on_loop in [("idle", None), ("pool", False), ("loop", True)]:
+        timings = asyncio.run(scenario(n_keys, samples, on_loop))
+        print(
+            f"{name:>5}   p50 {percentile(timings, 0.5) * 1e3:>8.2f} ms"
+            f"   p99 {percentile(timings, 0.99) * 1e3:>8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""Benchmark suite for parsing, indexing and request latency.
+
+Run with `python benchmarks/suite.py`, see `--help` for options. Results can be
+saved with `--save results.json`, and compared to a previous run with
+`--compare results.json`: the command then exits with a non-zero status if a
+case is slower than the baseline by more than `--threshold`.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from lsprotocol.types import (
+    CompletionParams,
+    InlayHintParams,
+    Position,
+    Range,
+    TextDocumentIdentifier,
+    TextDocumentItem,
+)
+from pygls.workspace import Workspace
+
+from confit_lsp import main as lsp
+from confit_lsp.descriptor import ConfigurationView
+from confit_lsp.diagnostics import validate_config
+from confit_lsp.metadata import MetadataStore
+from confit_lsp.tokens import encode
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from generator import GeneratorConfig, generate
+
+URI = "file:///benchmark.toml"
+
+
+@dataclass
+class Result:
+    case: str
+    n_keys: int
+    runs: int
+    p50: float
+    p90: float
+    p99: float
+    peak_memory: int
+    """Peak memory allocated during a single run, in bytes."""
+
+    throughput: float
+    """Keys per second, at the median."""
+
+    @property
+    def name(self) -> str:
+        return f"{self.case}[{self.n_keys}]"
+
+
+def percentile(timings: list[float], q: float) -> float:
+    return timings[min(len(timings) - 1, int(len(timings) * q))]
+
+
+def measure(
+    case: str,
+    n_keys: int,
+    func: Callable[..., Any],
+    arguments: list[tuple[Any, ...]],
+) -> Result:
+    # Warm up caches that are shared across runs (e.g. factory descriptions).
+    func(*arguments[0])
+
+    timings = list[float]()
+    gc.collect()
+
+    for args in arguments:
+        t0 = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - t0)
+
+    timings.sort()
+
+    tracemalloc.start()
+    func(*arguments[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50 = percentile(timings, 0.5)
+
+    return Result(
+        case=case,
+        n_keys=n_keys,
+        runs=len(timings),
+        p50=p50,
+        p90=percentile(timings, 0.9),
+        p99=percentile(timings, 0.99),
+        peak_memory=peak,
+        throughput=n_keys / p50 if p50 > 0 else float("inf"),
+    )
+
+
+def language_server(source: str) -> lsp.ConfitLanguageServer:
+    ls = lsp.ConfitLanguageServer("confit-lsp-benchmark", "v0")
+    # Skip the initialize handshake, which would only set up the workspace.
+    ls.protocol._workspace = Workspace(None)
+    ls.workspace.put_text_document(
+        TextDocumentItem(uri=URI, language_id="toml", version=0, text=source)
+    )
+    # Keep the user cache out of the measurements.
+    ls.metadata = MetadataStore(None)
+    return ls
+
+
+def run_size(config: GeneratorConfig, repeat: int, samples: int) -> list[Result]:
+    source = generate(config)
+    view = ConfigurationView.from_source(source)
+    n_keys = len(view.keys)
+
+    rng = random.Random(config.seed)
+    lines = source.splitlines()
+    n_lines = len(lines)
+
+    positions = [
+        Position(
+            line=(line := rng.randrange(n_lines)),
+            character=rng.randrange(len(lines[line]) + 1),
+        )
+        for _ in range(samples)
+    ]
+    factory_values = [
+        location.start
+        for path, location in view.values.items()
+        if path[-1] == "factory"
+    ]
+    completions = [
+        CompletionParams(
+            text_document=TextDocumentIdentifier(uri=URI),
+            position=rng.choice(factory_values),
+        )
+        for _ in range(samples)
+    ]
+    windows = list[InlayHintParams]()
+    for _ in range(samples):
+        line = rng.randrange(n_lines)
+        windows.append(
+            InlayHintParams(
+                text_document=TextDocumentIdentifier(uri=URI),
+                range=Range(
+                    start=Position(line=line, character=0),
+                    end=Position(line=line + 60, character=0),
+                ),
+            )
+        )
+
+    ls = language_server(source)
+
+    def references() -> None:
+        # Bypass the cached property, to measure the computation itself.
+        ConfigurationView.references.func(view)
+
+    def completion(params: CompletionParams) -> None:
+        asyncio.run(lsp.completion(ls, params))
+
+    return [
+        measure(
+            "from_source", n_keys, ConfigurationView.from_source, [(source,)] * repeat
+        ),
+        measure("references", n_keys, references, [()] * repeat),
+        measure(
+            "get_element_from_position",
+            n_keys,
+            view.get_element_from_position,
+            [(position,) for position in positions],
+        ),
+        measure("validate_config", n_keys, validate_config, [(view,)] * repeat),
+        measure(
+            "completion", n_keys, completion, [(params,) for params in completions]
+        ),
+        measure(
+            "inlay_hints",
+            n_keys,
+            lambda params: asyncio.run(lsp.inlay_hints(ls, params)),
+            [(params,) for params in windows],
+        ),
+        measure(
+            "semantic_tokens",
+            n_keys,
+            encode,
+            [(view, ls.metadata)] * repeat,
+        ),
+    ]
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds:.2f} s"
+
+
+def report(
+    results: list[Result],
+    baseline: dict[str, dict[str, Any]],
+    threshold: float,
+) -> list[str]:
+    """Print results, returning the cases that regressed against the baseline."""
+    print(
+        f"{'case':<36} {'p50':>10} {'p90':>10} {'p99':>10} "
+        f"{'keys/s':>12} {'peak mem':>10} {'vs base':>8}"
+    )
+
+    regressions = list[str]()
+
+    for result in results:
+        comparison = ""
+        if (reference := baseline.get(result.name)) is not None:
+            ratio = result.p50 / reference["p50"]
+            comparison = f"{ratio:>7.2f}x"
+            if ratio > 1 + threshold:
+                regressions.append(result.name)
+                comparison += " !"
+
+        print(
+            f"{result.name:<36} {format_duration(result.p50):>10} "
+            f"{format_duration(result.p90):>10} {format_duration(result.p99):>10} "
+            f"{result.throughput:>12,.0f} {result.peak_memory / 2**20:>8.1f} MB "
+            f"{comparison}"
+        )
+
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100, 1_000, 10_000, 100_000],
+        help="Number of keys in the generated documents.",
+    )
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--references", type=float, default=0.1)
+    parser.add_argument("--registry", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Runs of whole-document operations."
+    )
+    parser.add_argument(
+        "--samples", type=int, default=200, help="Requests per positional operation."
+    )
+    parser.add_argument("--save", type=Path, help="Save results to a JSON file.")
+    parser.add_argument("--compare", type=Path, help="Compare against saved results.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown of the median considered a regression.",
+    )
+
+    args = parser.parse_args(argv)
+
+    baseline = dict[str, dict[str, Any]]()
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())["results"]
+
+    results = list[Result]()
+
+    for n_keys in args.sizes:
+        config = GeneratorConfig(
+            n_keys=n_keys,
+            depth=args.depth,
+            reference_density=args.references,
+            registry_size=args.registry,
+            seed=args.seed,
+        )
+        results.extend(run_size(config, args.repeat, args.samples))
+
+    regressions = report(results, baseline, args.threshold)
+
+    if args.save is not None:
+        payload = dict(
+            python=sys.version,
+            results={result.name: asdict(result) for result in results},
+        )
+        args.save.write_text(json.dumps(payload, indent=2) + "\n")
+
+    if regressions:
+        print(f"\nRegressions: {', '.join(regressions)}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Parsing throughput, `rtoml` + persil grammar vs the single-pass scanner.
+
+Run with `python benchmarks/toml_parsing.py [--tables N]`.
+"""
+
+import argparse
+import time
+
+import rtoml
+
+from confit_lsp.parsers import parse_toml, scan
+
+
+def synthetic_config(n_tables: int) -> str:
+    lines = list[str]()
+
+    for i in range(n_tables):
+        lines.append(f"[experiment{i // 10}.model{i}]")
+        lines.append('factory = "add"')
+        lines.append(f"a = {i}")
+        lines.append(f"b = {i / 7}")
+        lines.append(f'name = "model number {i}"')
+        if i > 0:
+            lines.append(f'previous = "$experiment{(i - 1) // 10}.model{i - 1}"')
+        lines.append("")
+
+    return "\n".join(lines) + "\n"
+
+
+def current(content: str):
+    data = rtoml.loads(content)
+    return data, list(parse_toml(content))
+
+
+def measure(name: str, func, content: str, repeat: int = 5) -> None:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(content)
+        timings.append(time.perf_counter() - t0)
+
+    best = min(timings)
+    print(f"{name:<20} {best * 1e3:>10.1f} ms   {len(content) / best / 1e6:>6.2f} MB/s")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=10_000, help="Number of tables.")
+    n_tables = parser.parse_args(argv).tables
+
+    content = synthetic_config(n_tables)
+    print(f"{n_tables} tables, {content.count(chr(10))} lines")
+
+    # Timings are only comparable if both parsers locate the same elements.
+    (data, elements), (scanned_data, scanned_elements) = current(content), scan(content)
+    assert data == scanned_data, "The parsers disagree on the data."
+    assert elements == scanned_elements, (
+        f"The parsers disagree on the elements: {len(elements)} located by "
+        f"rtoml + persil, {len(scanned_elements)} by the scanner."
+    )
+
+    measure("rtoml + persil", current, content)
+    measure("scanner", scan, content)
+
+
+if __name__ == "__main__":
+    main()
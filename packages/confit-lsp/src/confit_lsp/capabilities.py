@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Callable, Self
+from typing import Any, Callable, Self
 
 
 from lsprotocol.types import Location
@@ -33,3 +33,37 @@ class FunctionDescription:
             input_model=input_model,
             return_type=return_type,
         )
+
+
+_DESCRIPTIONS = dict[str, tuple[Callable, Any, FunctionDescription]]()
+"""Memoized descriptions, keyed on the registered name."""
+
+
+def describe(name: str, func: Callable) -> FunctionDescription:
+    """Get the description of a registered function, building it at most once.
+
+    The cached description is reused as long as the registry entry is the same
+    function object, with the same code. Registering another function under the
+    same name (or hot-patching its `__code__`) transparently invalidates it.
+    """
+    code = getattr(func, "__code__", None)
+
+    if (cached := _DESCRIPTIONS.get(name)) is not None:
+        cached_func, cached_code, description = cached
+        if cached_func is func and cached_code is code:
+            return description
+
+    description = FunctionDescription.from_function(name, func)
+    _DESCRIPTIONS[name] = (func, code, description)
+
+    return description
+
+
+def invalidate(*names: str) -> None:
+    """Drop memoized descriptions. Drops all of them if no name is given."""
+    if not names:
+        _DESCRIPTIONS.clear()
+        return
+
+    for name in names:
+        _DESCRIPTIONS.pop(name, None)
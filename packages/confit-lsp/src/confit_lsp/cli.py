@@ -0,0 +1,234 @@
+"""Command line entry point.
+
+`confit-lsp` starts the language server on stdio, while `confit-lsp check`
+validates configuration files in batch, e.g. in CI.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Sequence, TextIO
+
+from lsprotocol.types import Diagnostic, DiagnosticSeverity
+
+from confit_lite.registry import REGISTRY
+
+from .capabilities import describe
+from .diagnostics import check_path, internal_error
+from .workspace import discover
+
+CHUNK_SIZE = 16
+"""Files checked per task, to amortize inter-process communication."""
+
+SEVERITIES = {
+    DiagnosticSeverity.Error: "error",
+    DiagnosticSeverity.Warning: "warning",
+    DiagnosticSeverity.Information: "note",
+    DiagnosticSeverity.Hint: "note",
+}
+
+
+@dataclass
+class Report:
+    """Diagnostics for a single file."""
+
+    path: str
+    diagnostics: list[Diagnostic]
+
+    @property
+    def failed(self) -> bool:
+        return any(d.severity == DiagnosticSeverity.Error for d in self.diagnostics)
+
+
+def check_file(path: str) -> Report:
+    try:
+        diagnostics = check_path(path)
+    except Exception as e:
+        # A single file must not abort the whole run.
+        diagnostics = [internal_error(e)]
+
+    return Report(path=path, diagnostics=diagnostics)
+
+
+def check_files(paths: Sequence[str]) -> list[Report]:
+    return [check_file(path) for path in paths]
+
+
+def warm_up() -> None:
+    """Import and describe every factory once.
+
+    Workers forked afterwards inherit the description cache; otherwise this
+    runs once per worker, and is re-used for every file it checks.
+    """
+    REGISTRY.load_all()
+
+    for name, factory in REGISTRY.items():
+        try:
+            describe(name, factory)
+        except Exception:
+            # Reported as a diagnostic when the factory is actually used.
+            pass
+
+
+def make_executor(jobs: int) -> Executor:
+    if "fork" in multiprocessing.get_all_start_methods():
+        # Single-threaded at this point, so forking is safe - and cheap.
+        warm_up()
+        return ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("fork"))
+
+    return ProcessPoolExecutor(jobs, initializer=warm_up)
+
+
+def check(paths: Sequence[str], jobs: int) -> Iterator[Report]:
+    """Check files, yielding reports as they complete."""
+    if jobs == 1 or len(paths) <= CHUNK_SIZE:
+        for path in paths:
+            yield check_file(path)
+        return
+
+    chunks = [paths[i : i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+
+    with make_executor(jobs) as executor:
+        futures = [executor.submit(check_files, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def expand_paths(paths: Iterable[str]) -> list[str]:
+    """Expand directories to the configuration files they contain."""
+    result = list[str]()
+
+    for path in paths:
+        if os.path.isdir(path):
+            result.extend(discover([path]))
+        else:
+            result.append(path)
+
+    return result
+
+
+def format_text(report: Report, output: TextIO) -> None:
+    for d in report.diagnostics:
+        start = d.range.start
+        severity = SEVERITIES[d.severity or DiagnosticSeverity.Error]
+        message = d.message.replace("\n", " ")
+        output.write(
+            f"{report.path}:{start.line + 1}:{start.character + 1}: {severity}: {message}\n"
+        )
+
+
+def format_jsonl(report: Report, output: TextIO) -> None:
+    for d in report.diagnostics:
+        record = dict(
+            path=report.path,
+            line=d.range.start.line + 1,
+            column=d.range.start.character + 1,
+            endLine=d.range.end.line + 1,
+            endColumn=d.range.end.character + 1,
+            severity=SEVERITIES[d.severity or DiagnosticSeverity.Error],
+            message=d.message,
+        )
+        output.write(json.dumps(record) + "\n")
+
+
+def sarif(reports: Iterable[Report]) -> dict[str, Any]:
+    """Build a SARIF 2.1.0 log."""
+    results = list[dict[str, Any]]()
+
+    for report in reports:
+        for d in report.diagnostics:
+            results.append(
+                dict(
+                    level=SEVERITIES[d.severity or DiagnosticSeverity.Error],
+                    message=dict(text=d.message),
+                    locations=[
+                        dict(
+                            physicalLocation=dict(
+                                artifactLocation=dict(uri=Path(report.path).as_posix()),
+                                region=dict(
+                                    startLine=d.range.start.line + 1,
+                                    startColumn=d.range.start.character + 1,
+                                    endLine=d.range.end.line + 1,
+                                    endColumn=d.range.end.character + 1,
+                                ),
+                            )
+                        )
+                    ],
+                )
+            )
+
+    return {
+        "version": "2.1.0",
+        "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+        "runs": [
+            dict(
+                tool=dict(driver=dict(name="confit-lsp")),
+                results=results,
+            )
+        ],
+    }
+
+
+def run_check(argv: Sequence[str] | None = None, output: TextIO = sys.stdout) -> int:
+    """Validate configuration files. Returns the exit code."""
+    parser = argparse.ArgumentParser(
+        prog="confit-lsp check",
+        description="Validate confit configuration files.",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="Files or directories to check. Directories are searched for `.toml` files.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", "jsonl", "sarif"],
+        default="text",
+        help="Output format. Text and JSON lines are streamed as files are checked.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes. Defaults to the number of CPUs.",
+    )
+
+    args = parser.parse_args(argv)
+
+    paths = expand_paths(args.paths)
+    reports = check(paths, max(1, args.jobs))
+
+    failed = False
+
+    if args.format == "sarif":
+        reports = sorted(reports, key=lambda report: report.path)
+        failed = any(report.failed for report in reports)
+        json.dump(sarif(reports), output, indent=2)
+        output.write("\n")
+        return int(failed)
+
+    write = format_text if args.format == "text" else format_jsonl
+
+    for report in reports:
+        write(report, output)
+        output.flush()
+        failed = failed or report.failed
+
+    return int(failed)
+
+
+def run() -> None:
+    argv = sys.argv[1:]
+
+    if argv[:1] == ["check"]:
+        sys.exit(run_check(argv[1:]))
+
+    from .main import run as serve
+
+    serve()
@@ -0,0 +1,277 @@
+"""Completion index over factory names.
+
+Items are rendered once per registry state, and filtered server-side: prefix
+matches first, then matches on a dotted segment (e.g. `scale` for
+`tests.scale`), then fuzzy (subsequence) matches. Documentation is left out of
+the items, and only rendered when the client resolves one.
+
+Within a factory table, argument keys are completed from per-factory templates,
+along with a snippet inserting every missing required argument at once.
+"""
+
+import re
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Iterable, Self, Sequence
+
+from lsprotocol.types import (
+    CompletionItem,
+    CompletionItemKind,
+    InsertTextFormat,
+    MarkupContent,
+    MarkupKind,
+)
+
+from .metadata import FactoryMetadata
+from .parsers import ElementPath
+
+SEPARATORS = re.compile(r"[._\-/:]")
+
+KEY_PREFIX = re.compile(r"\s*[\w-]*")
+"""Text before the cursor when typing a (bare) key."""
+
+HEADER = re.compile(r"\s*\[\[?([^\]]*)\]")
+HEADER_KEY = re.compile(r"\"([^\"]*)\"|'([^']*)'|([^.\s]+)")
+
+
+def detail(docstring: str | None) -> str:
+    docstring = docstring or "N/A"
+    first_line = docstring.strip().splitlines()[0] if docstring.strip() else "N/A"
+    return first_line[:50] + "..." if len(first_line) > 50 else first_line
+
+
+def documentation(name: str, metadata: FactoryMetadata) -> MarkupContent:
+    return MarkupContent(
+        kind=MarkupKind.Markdown,
+        value=f"**{name}**\n\n{metadata.docstring}",
+    )
+
+
+def snippet_escape(text: str) -> str:
+    return re.sub(r"([$}\\])", r"\\\1", text)
+
+
+def enclosing_table(lines: Sequence[str], line: int) -> ElementPath:
+    """Path of the table a line belongs to, from the closest header above it."""
+    for i in range(min(line, len(lines) - 1), -1, -1):
+        if (match := HEADER.match(lines[i])) is not None:
+            return tuple(
+                next(group for group in key.groups() if group is not None)
+                for key in HEADER_KEY.finditer(match.group(1))
+            )
+
+    return ()
+
+
+@dataclass
+class ArgumentTemplate:
+    """Pre-rendered argument completions for a factory."""
+
+    items: dict[str, CompletionItem]
+    """Argument key items, by argument name."""
+
+    required: list[str]
+    """Required arguments, in signature order."""
+
+    lines: dict[str, str]
+    """Snippet line for each required argument, without the tab stop."""
+
+    @classmethod
+    def build(cls, metadata: FactoryMetadata) -> Self:
+        items = dict[str, CompletionItem]()
+        required = list[str]()
+        lines = dict[str, str]()
+
+        for rank, (name, info) in enumerate(metadata.fields.items()):
+            items[name] = CompletionItem(
+                label=name,
+                kind=CompletionItemKind.Property,
+                detail=info.type_name
+                if info.required
+                else f"{info.type_name} = {info.default}",
+                insert_text=f"{name} = ",
+                insert_text_format=InsertTextFormat.PlainText,
+                # Required arguments first, in signature order.
+                sort_text=f"{not info.required:d}{rank:06d}",
+            )
+
+            if info.required:
+                required.append(name)
+                lines[name] = snippet_escape(info.type_name or name)
+
+        return cls(items=items, required=required, lines=lines)
+
+    def snippet(self, missing: list[str]) -> CompletionItem:
+        body = "\n".join(
+            f"{name} = ${{{i}:{self.lines[name]}}}"
+            for i, name in enumerate(missing, start=1)
+        )
+
+        return CompletionItem(
+            label="required arguments",
+            kind=CompletionItemKind.Snippet,
+            detail=", ".join(missing),
+            insert_text=body + "\n$0",
+            insert_text_format=InsertTextFormat.Snippet,
+            sort_text="0",
+        )
+
+    def complete(self, present: Iterable[str]) -> list[CompletionItem]:
+        """Items for the arguments that are not already set."""
+        present = set(present)
+
+        items = [item for name, item in self.items.items() if name not in present]
+        missing = [name for name in self.required if name not in present]
+
+        if missing:
+            items.insert(0, self.snippet(missing))
+
+        return items
+
+
+def fuzzy_score(query: str, name: str) -> int | None:
+    """Score a subsequence match, lower is better. `None` if there is no match."""
+    position = -1
+    score = 0
+
+    for char in query:
+        found = name.find(char, position + 1)
+        if found < 0:
+            return None
+        # Penalize gaps, and matches far from the start.
+        score += found - position - 1
+        position = found
+
+    return score
+
+
+@dataclass
+class CompletionIndex:
+    generation: int
+    """Registry generation the index was built for."""
+
+    items: dict[str, CompletionItem]
+    """Pre-rendered items, by factory name."""
+
+    names: list[str]
+    """Lower-cased factory names, sorted."""
+
+    originals: list[str]
+    """Factory names, in the same order as `names`."""
+
+    segments: list[tuple[str, str]]
+    """Lower-cased name suffixes starting at a segment, with the factory name."""
+
+    templates: dict[str, ArgumentTemplate]
+    """Argument completions, by factory name."""
+
+    @classmethod
+    def build(cls, factories: dict[str, FactoryMetadata], generation: int) -> Self:
+        items = {
+            name: CompletionItem(
+                label=name,
+                kind=CompletionItemKind.Value,
+                detail=detail(metadata.docstring),
+                insert_text=name,
+                insert_text_format=InsertTextFormat.PlainText,
+                data=dict(factory=name),
+            )
+            for name, metadata in factories.items()
+        }
+
+        originals = sorted(items, key=str.lower)
+        segments = sorted(
+            (name.lower()[match.end() :], name)
+            for name in items
+            for match in SEPARATORS.finditer(name)
+        )
+
+        return cls(
+            generation=generation,
+            items=items,
+            names=[name.lower() for name in originals],
+            originals=originals,
+            segments=segments,
+            templates={
+                name: ArgumentTemplate.build(metadata)
+                for name, metadata in factories.items()
+            },
+        )
+
+    def _prefixed(self, query: str) -> list[str]:
+        start = bisect_left(self.names, query)
+        result = list[str]()
+
+        for i in range(start, len(self.names)):
+            if not self.names[i].startswith(query):
+                break
+            result.append(self.originals[i])
+
+        return result
+
+    def _segment_prefixed(self, query: str) -> list[str]:
+        start = bisect_left(self.segments, (query, ""))
+        result = list[str]()
+
+        for i in range(start, len(self.segments)):
+            segment, name = self.segments[i]
+            if not segment.startswith(query):
+                break
+            result.append(name)
+
+        return result
+
+    def _fuzzy(self, query: str) -> list[str]:
+        scored = list[tuple[int, str]]()
+
+        for lowered, name in zip(self.names, self.originals):
+            if (score := fuzzy_score(query, lowered)) is not None:
+                scored.append((score, name))
+
+        scored.sort()
+        return [name for _, name in scored]
+
+    def search(self, query: str, limit: int) -> tuple[list[CompletionItem], bool]:
+        """Get the best matches for a query.
+
+        Returns the items, and whether the result is incomplete, i.e. the
+        client should query again as the user keeps typing.
+        """
+        query = query.lower()
+
+        if not query:
+            names = self.originals
+        else:
+            names = self._prefixed(query) + self._segment_prefixed(query)
+
+            # Fuzzy matching scans every name: only fill the remaining slots.
+            if len(names) < limit:
+                names += self._fuzzy(query)
+
+            names = list(dict.fromkeys(names))
+
+        items = list[CompletionItem]()
+
+        for rank, name in enumerate(names[:limit]):
+            item = self.items[name]
+            # Items are shared across requests: copy before setting the rank.
+            items.append(
+                CompletionItem(
+                    label=item.label,
+                    kind=item.kind,
+                    detail=item.detail,
+                    insert_text=item.insert_text,
+                    insert_text_format=item.insert_text_format,
+                    data=item.data,
+                    sort_text=f"{rank:06d}",
+                )
+            )
+
+        return items, len(names) > limit
+
+    def arguments(self, factory: str, present: Iterable[str]) -> list[CompletionItem]:
+        """Argument completions for a factory, skipping the keys already set."""
+        if (template := self.templates.get(factory)) is None:
+            return []
+
+        return template.complete(present)
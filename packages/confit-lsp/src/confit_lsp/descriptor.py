@@ -1,81 +1,116 @@
+from array import array
 from dataclasses import dataclass
 from functools import cached_property
+from itertools import compress
 import logging
-from typing import Any, Literal, Self, Sequence, assert_never
+import re
+from typing import Any, Callable, Iterator, Literal, Self, Sequence
 from lsprotocol.types import Position, Range
-import rtoml
 
 from collections import deque
 
 
-from .parsers import parse_toml
-from .parsers import ElementPath
+from .graph import DependencyGraph
+from .index import RangeIndex
+from .parsers import ElementPath, TomlParsingError, scan_columns
+from .ranges import MISSING, RangeTable, pack, patch_tables
+from .references import ReferenceIndex
 
 logger = logging.getLogger(__name__)
 
+TABLE_HEADER = re.compile(r"\s*\[")
+"""Lines matching this pattern open a new table, and delimit re-parsed regions."""
+
 
 @dataclass
 class ConfigurationView:
     data: dict[str, Any]
     """The actual data."""
 
-    keys: dict[ElementPath, Range]
+    keys: RangeTable
     """Key path to range lookup table."""
 
-    values: dict[ElementPath, Range]
-    """Value path to range lookup table."""
+    values: RangeTable
+    """Value path to range lookup table. Shares its paths with `keys`."""
 
     @cached_property
-    def path_range(self) -> list[tuple[ElementPath, Range]]:
-        result = list[tuple[ElementPath, Range]]()
-
-        for path, location in self.keys.items():
-            if (value := self.values.get(path)) is not None:
-                location = Range(start=location.start, end=value.end)
-                location.end = value.end
-            result.append((path, location))
+    def element_index(self) -> RangeIndex[ElementPath]:
+        """Position index over the elements, from key start to value end.
+
+        Array items have no key, and start with their value.
+        """
+        key_starts, key_ends = self.keys.points()
+        value_starts, value_ends = self.values.points()
+
+        starts = array(
+            "q",
+            (
+                value_start if key_start == MISSING else key_start
+                for key_start, value_start in zip(key_starts, value_starts)
+            ),
+        )
+        ends = array(
+            "q",
+            (
+                key_end if value_end == MISSING else value_end
+                for key_end, value_end in zip(key_ends, value_ends)
+            ),
+        )
 
-        return result
+        return RangeIndex.from_points(list(self.keys.rows), starts, ends)
 
     @cached_property
-    def references(self) -> dict[ElementPath, ElementPath]:
-        """In-document references."""
-        path2path = dict[ElementPath, ElementPath]()
+    def key_index(self) -> RangeIndex[ElementPath]:
+        """Position index over the keys. Array items have no key, and are left out."""
+        starts, ends = self.keys.points()
+        paths: list[ElementPath] = list(self.keys.rows)
 
-        to_visit = deque[tuple[ElementPath, dict[str, Any]]]()
-        to_visit.append(((), self.data))
+        if len(self.keys) < len(paths):
+            keyed = [start != MISSING for start in starts]
+            paths = list(compress(paths, keyed))
+            starts = array("q", compress(starts, keyed))
+            ends = array("q", compress(ends, keyed))
 
-        while len(to_visit) > 0:
-            path, data = to_visit.popleft()
+        return RangeIndex.from_points(paths, starts, ends)
+
+    @cached_property
+    def heads(self) -> dict[str, list[ElementPath]]:
+        """Paths by first component, to compare edited regions with the rest."""
+        heads = dict[str, list[ElementPath]]()
 
-            for key, value in data.items():
-                new_path = (*path, key)
-                if isinstance(value, dict):
-                    to_visit.append((new_path, value))
+        for path in self.keys.rows:
+            heads.setdefault(path[0], []).append(path)
 
-                if not isinstance(value, str):
-                    continue
+        return heads
 
-                if not value.startswith("$"):
-                    continue
+    @cached_property
+    def references(self) -> dict[ElementPath, ElementPath]:
+        """In-document references."""
+        return find_references(self.data)
 
-                path2path[new_path] = tuple(value[1:].split("."))
+    @cached_property
+    def reference_index(self) -> ReferenceIndex:
+        """Reverse lookup of the references, by target."""
+        return ReferenceIndex.build(self.references)
 
-        return path2path
+    @cached_property
+    def dependencies(self) -> DependencyGraph:
+        """Dependency graph induced by the references."""
+        return DependencyGraph.build(self.references)
 
     def get_element_from_position(
         self,
         position: Position,
     ) -> tuple[Literal["key", "value", "line"], ElementPath] | None:
-        for path, location in self.path_range:
-            if location.start <= position < location.end:
-                break
-        else:
-            return None
+        match self.element_index.at(position):
+            case (path, _):
+                pass
+            case None:
+                return None
 
-        key = self.keys[path]
+        key = self.keys.get(path)
 
-        if key.start <= position < key.end:
+        if key is not None and key.start <= position < key.end:
             return "key", path
 
         value = self.values.get(path)
@@ -87,6 +122,24 @@ class ConfigurationView:
 
         return "line", path
 
+    def get_target_from_position(self, position: Position) -> ElementPath | None:
+        """Path of the element under the cursor, or the target of a reference."""
+        match self.get_element_from_position(position):
+            case ("key", path):
+                return path
+            case ("value", path):
+                return self.references.get(path)
+            case _:
+                return None
+
+    def get_keys_in_range(
+        self,
+        start: Position,
+        end: Position,
+    ) -> Iterator[tuple[ElementPath, Range]]:
+        """Iterate over the keys that overlap a range, bounds included."""
+        return self.key_index.overlapping(start, end)
+
     def get_value(
         self,
         path: Sequence[str],
@@ -97,12 +150,15 @@ class ConfigurationView:
         self,
         path: Sequence[str],
     ) -> dict[str, Any]:
-        """Get the underlying object at a given path by recursively querying keys."""
+        """Get the underlying object at a given path by recursively querying keys.
+
+        Array items are queried by their index, as in references.
+        """
 
         d = self.data
 
         for key in path:
-            d = d[key]
+            d = d[int(key)] if isinstance(d, list) and key.isdigit() else d[key]
 
         return d
 
@@ -119,21 +175,328 @@ class ConfigurationView:
         cls,
         content: str,
     ) -> Self:
-        data = rtoml.loads(content)
+        data, rows, key_columns, value_columns = scan_columns(content)
+        keys, values = RangeTable.from_columns(rows, key_columns, value_columns)
 
-        keys = dict[ElementPath, Range]()
-        values = dict[ElementPath, Range]()
+        return cls(
+            data=data,
+            keys=keys,
+            values=values,
+        )
 
-        for kind, element in parse_toml(content):
-            if kind == "key":
-                keys[element.path] = element.location
-            elif kind == "value":
-                values[element.path] = element.location
-            else:
-                assert_never(kind)
+    def apply_change(
+        self,
+        source: str,
+        change: Range,
+        text: str,
+    ) -> Self:
+        """Create an updated view from an incremental edit.
 
-        return cls(
+        Only the tables touched by the edit are re-parsed. Elements located
+        before the edited region are kept as is, and elements after it are
+        shifted by the number of inserted/removed lines.
+
+        Args:
+            source: The full document content, *after* the edit.
+            change: The edited range, in the coordinates of the previous content.
+            text: The inserted text.
+
+        Returns:
+            A new view. The current view is left untouched.
+        """
+
+        lines = source.splitlines(keepends=True)
+
+        old_end = change.end.line
+        new_end = change.start.line + text.count("\n")
+        delta = new_end - old_end
+
+        start = 0
+        for lineno in range(min(change.start.line, len(lines) - 1), -1, -1):
+            if TABLE_HEADER.match(lines[lineno]):
+                start = lineno
+                break
+
+        stop = len(lines)
+        for lineno in range(new_end + 1, len(lines)):
+            if TABLE_HEADER.match(lines[lineno]):
+                stop = lineno
+                break
+
+        region = "".join(lines[start:stop])
+
+        if "[[" in region or "[[" in text:
+            # Arrays of tables cannot be merged table by table.
+            return type(self).from_source(source)
+
+        try:
+            region_data, rows, key_columns, value_columns = scan_columns(
+                region,
+                line_offset=start,
+            )
+        except TomlParsingError:
+            return type(self).from_source(source)
+
+        region = RangeTable.from_columns(rows, key_columns, value_columns)
+
+        keys, values, removed = patch_tables(
+            self.keys,
+            self.values,
+            region,
+            start,
+            stop - delta,
+            delta,
+        )
+        dropped = set(removed)
+
+        if conflicts(self.keys, self.values, region, dropped, self.heads):
+            # E.g. a table defined twice: let the full parse report it.
+            return type(self).from_source(source)
+
+        data = dict(self.data)
+        copied = {id(data)}
+
+        for path in sorted(removed, key=len, reverse=True):
+            remove_path(data, path, path in self.values, keys, copied)
+
+        merge_data(data, region_data, copied)
+
+        view = type(self)(
             data=data,
             keys=keys,
             values=values,
         )
+
+        # Carry over what was computed for the current view, patching the
+        # region rather than going over the whole document again.
+        region_view = type(self)(data=region_data, keys=region[0], values=region[1])
+
+        if keys.rows is self.keys.rows:
+            view.heads = self.heads
+        else:
+            view.heads = patch_heads(self.heads, dropped, region[0].rows)
+
+        for name in ("element_index", "key_index"):
+            if name in self.__dict__:
+                index: RangeIndex[ElementPath] = getattr(self, name)
+                spliced = index.splice(
+                    pack(start, 0),
+                    pack(stop - delta, 0),
+                    getattr(region_view, name),
+                    pack(delta, 0),
+                )
+                setattr(view, name, spliced)
+
+        if "references" in self.__dict__:
+            # Table headers are removed along with the region, but the
+            # sub-tables they hold are not, unlike inline tables.
+            values_dropped = {path for path in removed if path in self.values}
+            dropped_heads = {path[0] for path in values_dropped}
+            references = dict(self.references)
+
+            for path in [
+                path
+                for path in references
+                if path[0] in dropped_heads
+                and any(path[:i] in values_dropped for i in range(1, len(path) + 1))
+            ]:
+                del references[path]
+
+            references.update(region_view.references)
+            view.references = references
+
+        return view
+
+
+def find_references(data: dict[str, Any]) -> dict[ElementPath, ElementPath]:
+    """Find the `$path` references in the data, breadth-first.
+
+    Array items are named after their index.
+    """
+    path2path = dict[ElementPath, ElementPath]()
+
+    to_visit = deque[tuple[ElementPath, dict[str, Any] | list[Any]]]()
+    to_visit.append(((), data))
+
+    while len(to_visit) > 0:
+        path, data = to_visit.popleft()
+
+        items = data.items() if isinstance(data, dict) else enumerate(data)
+
+        for key, value in items:
+            new_path = (*path, str(key))
+            if isinstance(value, (dict, list)):
+                to_visit.append((new_path, value))
+
+            if not isinstance(value, str):
+                continue
+
+            if not value.startswith("$"):
+                continue
+
+            path2path[new_path] = tuple(value[1:].split("."))
+
+    return path2path
+
+
+def patch_heads(
+    heads: dict[str, list[ElementPath]],
+    removed: set[ElementPath],
+    region: dict[ElementPath, int],
+) -> dict[str, list[ElementPath]]:
+    """Paths by first component, once the removed paths are replaced by the region ones."""
+    patched = dict(heads)
+    added = dict[str, list[ElementPath]]()
+
+    for path in region:
+        added.setdefault(path[0], []).append(path)
+
+    for head in {path[0] for path in removed} | added.keys():
+        paths = [path for path in heads.get(head, ()) if path not in removed]
+        paths += added.get(head, ())
+
+        if paths:
+            patched[head] = paths
+        else:
+            patched.pop(head, None)
+
+    return patched
+
+
+def conflicts(
+    keys: RangeTable,
+    values: RangeTable,
+    region: tuple[RangeTable, RangeTable],
+    removed: set[ElementPath],
+    heads: dict[str, list[ElementPath]],
+) -> bool:
+    """Whether the re-parsed region clashes with the elements kept around it.
+
+    The region is valid on its own, but may define a key or a table that is
+    already defined outside of it. Table headers may extend the tables of the
+    other side, whereas key-value pairs may not - neither through their value
+    nor through the tables their dotted keys define. Only the elements that
+    share their first component with the region are compared, see `heads`.
+    """
+    region_keys, region_values = region
+
+    def kept(path: ElementPath) -> bool:
+        return path in keys.rows and path not in removed
+
+    def new(path: ElementPath) -> bool:
+        return path in region_keys.rows
+
+    def clashes(
+        path: ElementPath,
+        table: RangeTable,
+        own: Callable[[ElementPath], bool],
+        other: Callable[[ElementPath], bool],
+        other_table: RangeTable,
+    ) -> bool:
+        if other(path):
+            return True
+
+        # Tables below the header of a key-value pair are defined by its keys.
+        header = len(path)
+        if has_value(table, path):
+            header = 0
+            for depth in range(len(path) - 1, 0, -1):
+                if own(path[:depth]) and not has_value(table, path[:depth]):
+                    header = depth
+                    break
+
+        for depth in range(1, len(path)):
+            prefix = path[:depth]
+            if other(prefix) and (depth > header or has_value(other_table, prefix)):
+                return True
+
+        return False
+
+    region_heads = set[str]()
+
+    for path in region_keys.rows:
+        region_heads.add(path[0])
+        if clashes(path, region_values, new, kept, values):
+            return True
+
+    for head in region_heads:
+        for path in heads.get(head, ()):
+            if path not in removed and clashes(path, values, kept, new, region_values):
+                return True
+
+    return False
+
+
+def has_value(values: RangeTable, path: ElementPath) -> bool:
+    return values.columns[4 * values.rows[path]] != MISSING
+
+
+def writable(
+    data: dict[str, Any],
+    key: str,
+    copied: set[int],
+) -> dict[str, Any] | None:
+    """Get a child table that can be mutated without affecting previous views."""
+
+    child = data.get(key)
+
+    if not isinstance(child, dict):
+        return None
+
+    if id(child) not in copied:
+        child = dict(child)
+        data[key] = child
+        copied.add(id(child))
+
+    return child
+
+
+def remove_path(
+    data: dict[str, Any],
+    path: ElementPath,
+    is_value: bool,
+    keys: RangeTable,
+    copied: set[int],
+) -> None:
+    """Remove an element, and the tables that are left empty and undeclared.
+
+    Key-value pairs are always removed, whereas table headers are only dropped
+    if the table is empty and not declared anymore.
+    """
+
+    parents = [data]
+
+    for key in path[:-1]:
+        child = writable(parents[-1], key, copied)
+        if child is None:
+            return
+        parents.append(child)
+
+    parent = parents[-1]
+    value = parent.get(path[-1])
+
+    if value is None:
+        return
+
+    if is_value or (not value and path not in keys):
+        del parent[path[-1]]
+
+    for depth in range(len(path) - 1, 0, -1):
+        prefix = path[:depth]
+        if parents[depth] or prefix in keys:
+            break
+        del parents[depth - 1][path[depth - 1]]
+
+
+def merge_data(
+    data: dict[str, Any],
+    other: dict[str, Any],
+    copied: set[int],
+) -> None:
+    for key, value in other.items():
+        if isinstance(value, dict) and isinstance(data.get(key), dict):
+            child = writable(data, key, copied)
+            assert child is not None
+            merge_data(child, value, copied)
+        else:
+            data[key] = value
@@ -0,0 +1,551 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from os import PathLike
+from pathlib import Path
+from typing import Any, Callable
+
+from lsprotocol.types import Diagnostic, DiagnosticSeverity, Position, Range
+from pydantic import ValidationError
+
+from confit_lite.registry import REGISTRY
+
+from .capabilities import FunctionDescription, describe
+from .descriptor import ConfigurationView
+from .executor import RequestExecutor, checkpoint
+from .parsers import ElementPath
+from .stats import Stats
+
+logger = logging.getLogger(__name__)
+
+
+MISSING = object()
+
+
+@dataclass(frozen=True)
+class Problem:
+    """A diagnostic, located by element path rather than by range.
+
+    Problems survive edits that move elements around, which lets us re-use
+    them across versions of a document.
+    """
+
+    path: ElementPath
+    message: str
+    severity: DiagnosticSeverity = DiagnosticSeverity.Error
+    on_value: bool = False
+    """Whether the problem points to the value rather than the key."""
+
+    def to_diagnostic(self, view: ConfigurationView) -> Diagnostic:
+        return Diagnostic(
+            range=locate(view, self.path, self.on_value),
+            message=self.message,
+            severity=self.severity,
+            source="confit-lsp",
+        )
+
+
+def locate(view: ConfigurationView, path: ElementPath, on_value: bool) -> Range:
+    """Range of an element, or of the closest key if it has no range of its own.
+
+    Tables defined by dotted keys - e.g. `sub` in `sub.c = 2` - have no key,
+    and are located by their first nested key instead.
+    """
+    ranges = view.values if on_value else view.keys
+
+    if path in ranges:
+        return ranges[path]
+
+    depth = len(path)
+    for other in view.keys:
+        if other[:depth] == path:
+            return view.keys[other]
+
+    for depth in range(len(path) - 1, 0, -1):
+        if path[:depth] in view.keys:
+            return view.keys[path[:depth]]
+
+    origin = Position(line=0, character=0)
+    return Range(start=origin, end=origin)
+
+
+def check_factories(
+    view: ConfigurationView,
+) -> tuple[list[Problem], dict[ElementPath, FunctionDescription]]:
+    """Resolve the factories in the document.
+
+    Returns the problems with the factory names, and the description of
+    each valid factory by path.
+    """
+    problems = list[Problem]()
+    factories = dict[ElementPath, FunctionDescription]()
+
+    for path in view.factories():
+        checkpoint()
+
+        path = (*path, "factory")
+        factory_name = view.get_value(path)
+
+        if not isinstance(factory_name, str):
+            problems.append(
+                Problem(
+                    path=path,
+                    message=f"Element value must be a string, got {type(factory_name).__name__}",
+                    on_value=True,
+                )
+            )
+            continue
+
+        if factory_name not in REGISTRY:
+            problems.append(
+                Problem(
+                    path=path,
+                    message=f"Element '{factory_name}' not found in the registry.",
+                    on_value=True,
+                )
+            )
+            continue
+
+        factories[path[:-1]] = describe(
+            factory_name,
+            REGISTRY[factory_name],
+        )
+
+    return problems, factories
+
+
+def check_factory(
+    view: ConfigurationView,
+    path: ElementPath,
+    factory: FunctionDescription,
+    factories: dict[ElementPath, FunctionDescription],
+) -> list[Problem]:
+    """Validate the arguments of a single factory."""
+    problems = list[Problem]()
+
+    root = view.get_object(path).copy()
+    root_keys = set(root.keys()) - {"factory"}
+
+    model_keys = set(factory.input_model.model_fields.keys())
+    required_model_keys = set(
+        key
+        for key, info in factory.input_model.model_fields.items()
+        if info.is_required()
+    )
+
+    extra_keys = root_keys - model_keys
+    for key in extra_keys:
+        problems.append(
+            Problem(
+                path=(*path, key),
+                message=f"Argument `{key}` is not recognized by `{factory.name}` and will be ignored.",
+                severity=DiagnosticSeverity.Warning,
+            )
+        )
+
+    factory_element = (*path, "factory")
+    missing_keys = required_model_keys - root_keys
+    for key in missing_keys:
+        problems.append(
+            Problem(
+                path=factory_element,
+                message=f"Argument `{key}` is missing.",
+            )
+        )
+
+    # Literal arguments, along with the path of the element they are defined at.
+    literals = dict[str, tuple[Any, ElementPath]]()
+
+    for key in root_keys & model_keys:
+        info = factory.input_model.model_fields[key]
+        value = root[key]
+
+        total_path = (*path, key)
+
+        target = view.references.get(total_path)
+
+        if target is not None:
+            try:
+                value = view.get_value(target)
+            except (KeyError, TypeError, IndexError):
+                problems.append(
+                    Problem(
+                        path=total_path,
+                        message="No element with this key exists.",
+                    )
+                )
+                continue
+            total_path = target
+
+        if (sub_factory_descriptor := factories.get(total_path)) is not None:
+            if sub_factory_descriptor.return_type is None:
+                continue
+            if info.annotation == Any:
+                continue
+
+            if sub_factory_descriptor.return_type != info.annotation:
+                problems.append(
+                    Problem(
+                        path=factory_element,
+                        message=(
+                            f"Argument `{key}` is provided by a factory with incompatible type.\n"
+                            f"Expected `{info.annotation.__qualname__}`, got `{sub_factory_descriptor.return_type.__qualname__}`."
+                        ),
+                    )
+                )
+            continue
+
+        literals[key] = (value, total_path)
+
+    if not literals:
+        return problems
+
+    # Validate all literal arguments at once, re-using the input model's
+    # validator rather than building a schema per argument.
+    try:
+        factory.input_model.model_validate(
+            {key: value for key, (value, _) in literals.items()}
+        )
+    except ValidationError as e:
+        for error in e.errors():
+            loc = error["loc"]
+
+            # Missing arguments were already reported above.
+            if not loc or loc[0] not in literals:
+                continue
+
+            key = str(loc[0])
+            _, total_path = literals[key]
+            msg = error["msg"]
+            problems.append(
+                Problem(
+                    path=total_path,
+                    message=f"Argument `{key}` has incompatible type.\n{msg}",
+                )
+            )
+
+    return problems
+
+
+def check_cycles(view: ConfigurationView) -> list[Problem]:
+    """Report references that can never be resolved, since they depend on themselves."""
+    problems = list[Problem]()
+
+    for cycle in view.dependencies.cycles():
+        members = ", ".join(f"`{'.'.join(path)}`" for path in cycle)
+        for path in cycle:
+            problems.append(
+                Problem(
+                    path=path,
+                    message=f"Circular reference between {members}.",
+                )
+            )
+
+    return problems
+
+
+def validate_config(view: ConfigurationView) -> list[Diagnostic]:
+    """Validate .toml and return diagnostics"""
+
+    problems, factories = check_factories(view)
+
+    for path, factory in factories.items():
+        checkpoint()
+        problems.extend(check_factory(view, path, factory, factories))
+
+    problems.extend(check_cycles(view))
+
+    return [problem.to_diagnostic(view) for problem in problems]
+
+
+def parse_error(error: Exception) -> Diagnostic:
+    """Report a document that could not be parsed.
+
+    Parsing errors carry their own position in the message.
+    """
+    origin = Position(line=0, character=0)
+    return Diagnostic(
+        range=Range(start=origin, end=origin),
+        message=str(error),
+        severity=DiagnosticSeverity.Error,
+        source="confit-lsp",
+    )
+
+
+def internal_error(error: Exception) -> Diagnostic:
+    """Report a document whose validation failed unexpectedly."""
+    origin = Position(line=0, character=0)
+    return Diagnostic(
+        range=Range(start=origin, end=origin),
+        message=f"Could not validate the document: {type(error).__name__}: {error}",
+        severity=DiagnosticSeverity.Error,
+        source="confit-lsp",
+    )
+
+
+def check_source(source: str) -> list[Diagnostic]:
+    """Parse and validate a document from scratch."""
+    try:
+        view = ConfigurationView.from_source(source)
+    except ValueError as e:
+        return [parse_error(e)]
+
+    return validate_config(view)
+
+
+def check_path(path: str | PathLike) -> list[Diagnostic]:
+    """Parse and validate a file from scratch."""
+    try:
+        source = Path(path).read_text(encoding="utf-8")
+    except (OSError, ValueError) as e:
+        return [parse_error(e)]
+
+    return check_source(source)
+
+
+def resolve(view: ConfigurationView, path: ElementPath) -> Any:
+    try:
+        return view.get_value(path)
+    except (KeyError, TypeError, IndexError):
+        return MISSING
+
+
+class IncrementalValidator:
+    """Validate successive versions of a document, re-using previous results.
+
+    A factory is only validated again if its own object changed, if the
+    factories it is built from were re-registered, or if an element it
+    references (transitively) changed.
+    """
+
+    def __init__(self):
+        self.view: ConfigurationView | None = None
+        """Last validated version of the document."""
+
+        self.factories = dict[ElementPath, FunctionDescription]()
+        self.problems = dict[ElementPath, list[Problem]]()
+        """Problems by factory path."""
+
+    def dirty(
+        self,
+        view: ConfigurationView,
+        factories: dict[ElementPath, FunctionDescription],
+    ) -> set[ElementPath]:
+        """Factories whose problems may have changed since the last run."""
+        previous = self.view
+
+        if previous is None:
+            return set(factories)
+
+        graph = view.dependencies
+        result = factories.keys() - self.problems.keys()
+
+        for path in factories.keys() & self.problems.keys():
+            obj = view.get_object(path)
+            if resolve(previous, path) != obj:
+                result.add(path)
+                continue
+
+            # Sub-factories provide arguments, either directly or by reference.
+            children = [(*path, key) for key in obj]
+            targets = [graph.references[c] for c in children if c in graph.references]
+
+            for related in (path, *children, *targets):
+                if factories.get(related) is not self.factories.get(related):
+                    result.add(path)
+                    break
+
+        changed = [
+            target
+            for target in graph.dependents
+            if resolve(view, target) != resolve(previous, target)
+        ]
+
+        for source in graph.affected(changed):
+            if source[:-1] in factories:
+                result.add(source[:-1])
+
+        return result
+
+    def __call__(self, view: ConfigurationView) -> list[Diagnostic]:
+        problems, factories = check_factories(view)
+
+        dirty = self.dirty(view, factories)
+
+        results = dict[ElementPath, list[Problem]]()
+
+        for path, factory in factories.items():
+            if path in dirty:
+                checkpoint()
+                results[path] = check_factory(view, path, factory, factories)
+            else:
+                results[path] = self.problems[path]
+
+        self.problems = results
+        self.factories = factories
+        self.view = view
+
+        for factory_problems in self.problems.values():
+            problems.extend(factory_problems)
+
+        problems.extend(check_cycles(view))
+
+        return [problem.to_diagnostic(view) for problem in problems]
+
+
+Publisher = Callable[[str, int | None, list[Diagnostic]], None]
+Validator = Callable[[ConfigurationView], list[Diagnostic]]
+
+
+class DiagnosticsScheduler:
+    """Run validations in the background, away from the event loop.
+
+    Bursts of requests for the same document are debounced, and runs that are
+    superseded by a newer version of the document are cancelled, stopping at
+    the next checkpoint of the validation. Results are only published if they
+    match the latest known version of the document.
+    """
+
+    def __init__(
+        self,
+        publish: Publisher,
+        delay: float = 0.3,
+        executor: RequestExecutor | None = None,
+        validate: Validator | None = None,
+        stats: Stats | None = None,
+    ):
+        self.publish = publish
+        self.delay = delay
+        self.executor = executor or RequestExecutor(
+            max_workers=1,
+            thread_name_prefix="confit-diagnostics",
+        )
+        self.validate = validate
+        """Validation function. By default, each document is validated incrementally."""
+
+        self.stats = stats
+
+        self._validators = dict[str, IncrementalValidator]()
+        self._tasks = dict[str, asyncio.Task]()
+        self._versions = dict[str, int | None]()
+
+    def schedule(
+        self,
+        uri: str,
+        version: int | None,
+        view: ConfigurationView,
+        delay: float | None = None,
+    ) -> asyncio.Task:
+        """Schedule the validation of a document, superseding previous runs.
+
+        Must be called from within the event loop.
+        """
+        self.cancel(uri)
+
+        self._versions[uri] = version
+
+        task = asyncio.get_running_loop().create_task(
+            self._run(uri, version, view, self.delay if delay is None else delay)
+        )
+        self._tasks[uri] = task
+        task.add_done_callback(lambda t: self._forget(uri, t))
+
+        return task
+
+    def cancel(self, uri: str) -> None:
+        """Cancel the pending validation of a document, if any."""
+        task = self._tasks.pop(uri, None)
+        if task is not None:
+            task.cancel()
+
+    def discard(self, uri: str) -> None:
+        """Cancel pending runs and forget about a document altogether."""
+        self.cancel(uri)
+        self._versions.pop(uri, None)
+        self._validators.pop(uri, None)
+
+    def validator(self, uri: str) -> Validator:
+        if self.validate is not None:
+            return self.validate
+
+        if (validator := self._validators.get(uri)) is None:
+            validator = self._validators[uri] = IncrementalValidator()
+
+        return validator
+
+    def is_current(self, uri: str, version: int | None) -> bool:
+        return uri in self._versions and self._versions[uri] == version
+
+    def _forget(self, uri: str, task: asyncio.Task) -> None:
+        if self._tasks.get(uri) is task:
+            del self._tasks[uri]
+
+    async def run[**P](
+        self,
+        uri: str,
+        validate: Callable[P, list[Diagnostic]],
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> list[Diagnostic]:
+        """Run a validation function in the executor, right away.
+
+        Cancelling the awaiting task stops the validation at its next checkpoint.
+        """
+        start = time.perf_counter()
+
+        diagnostics = await self.executor.run(validate, *args, **kwargs)
+
+        if self.stats is not None:
+            elapsed = time.perf_counter() - start
+            self.stats.record("diagnostics", elapsed)
+            self.stats.record_document(uri, "validate", elapsed)
+
+        return diagnostics
+
+    async def _run(
+        self,
+        uri: str,
+        version: int | None,
+        view: ConfigurationView,
+        delay: float,
+    ) -> None:
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        try:
+            diagnostics = await self.run(uri, self.validator(uri), view)
+        except Exception:
+            logger.exception("Validation of %s failed", uri)
+            return
+
+        if not self.is_current(uri, version):
+            logger.debug("Dropping stale diagnostics for %s (v%s)", uri, version)
+            return
+
+        self.publish(uri, version, diagnostics)
+
+
+class ReportCache:
+    """Last diagnostics computed for each document, along with their result ID.
+
+    Result IDs identify the state the diagnostics were computed from, e.g. the
+    document version and the registry generation. Pull requests for an
+    unchanged state are answered without validating again.
+    """
+
+    def __init__(self):
+        self._reports = dict[str, tuple[str, list[Diagnostic]]]()
+
+    def get(self, uri: str, result_id: str) -> list[Diagnostic] | None:
+        match self._reports.get(uri):
+            case (cached_id, diagnostics) if cached_id == result_id:
+                return diagnostics
+            case _:
+                return None
+
+    def put(self, uri: str, result_id: str, diagnostics: list[Diagnostic]) -> None:
+        self._reports[uri] = (result_id, diagnostics)
+
+    def pop(self, uri: str) -> None:
+        self._reports.pop(uri, None)
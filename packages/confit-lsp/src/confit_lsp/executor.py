@@ -0,0 +1,94 @@
+"""Run CPU-heavy request work away from the event loop.
+
+Parsing and factory introspection run on a thread pool, such that a slow
+request does not stall the others. Threads rather than processes: the work
+reads and fills in-memory caches (views, metadata) shared with the loop.
+
+When the client cancels a request through `$/cancelRequest`, pygls cancels the
+handler task. The work it was waiting for is then told to stop, and does so at
+its next `checkpoint`.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+DEFAULT_WORKERS = 2
+
+
+class Cancelled(Exception):
+    """Raised at a checkpoint of work whose request was cancelled."""
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise Cancelled()
+
+
+TOKEN = contextvars.ContextVar[CancellationToken | None]("token", default=None)
+"""Token of the request being worked on in the current thread."""
+
+
+def checkpoint() -> None:
+    """Stop the current work if its request was cancelled.
+
+    Does nothing outside of a `RequestExecutor`.
+    """
+    if (token := TOKEN.get()) is not None:
+        token.check()
+
+
+class RequestExecutor:
+    """Thread pool running the expensive parts of request handlers."""
+
+    def __init__(
+        self,
+        max_workers: int | None = DEFAULT_WORKERS,
+        thread_name_prefix: str = "confit-requests",
+    ):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=thread_name_prefix,
+        )
+
+    async def run[**P, T](
+        self,
+        func: Callable[P, T],
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> T:
+        """Run a function on the pool, cancelling it along with the awaiting task."""
+        token = CancellationToken()
+
+        context = contextvars.copy_context()
+        context.run(TOKEN.set, token)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.executor,
+            functools.partial(context.run, func, *args, **kwargs),
+        )
+
+        try:
+            return await future
+        except asyncio.CancelledError:
+            token.cancel()
+            raise
+
+    def shutdown(self) -> None:
+        """Stop accepting work. Running work completes in the background."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,134 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Self
+
+from .parsers import ElementPath
+
+
+@dataclass
+class DependencyGraph:
+    """Dependencies between elements, induced by in-document references.
+
+    Resolving a reference requires resolving its target, and resolving a table
+    (e.g. a factory) requires resolving every reference nested within it.
+    """
+
+    references: dict[ElementPath, ElementPath]
+    """Reference path to target path."""
+
+    dependents: dict[ElementPath, set[ElementPath]]
+    """Target path to the references pointing to it (reverse edges)."""
+
+    contained: dict[ElementPath, list[ElementPath]]
+    """Path to the references nested within it."""
+
+    targets: dict[ElementPath, list[ElementPath]]
+    """Path to the reference targets nested within it."""
+
+    @classmethod
+    def build(cls, references: dict[ElementPath, ElementPath]) -> Self:
+        dependents = dict[ElementPath, set[ElementPath]]()
+        contained = dict[ElementPath, list[ElementPath]]()
+        targets = dict[ElementPath, list[ElementPath]]()
+
+        for source, target in references.items():
+            dependents.setdefault(target, set()).add(source)
+            for i in range(len(source)):
+                contained.setdefault(source[:i], []).append(source)
+
+        for target in dependents:
+            for i in range(len(target)):
+                targets.setdefault(target[:i], []).append(target)
+
+        return cls(
+            references=references,
+            dependents=dependents,
+            contained=contained,
+            targets=targets,
+        )
+
+    def successors(self, path: ElementPath) -> list[ElementPath]:
+        """Elements that must be resolved before `path` can be."""
+        if (target := self.references.get(path)) is not None:
+            return [target]
+
+        # An element below a reference is resolved from the referenced element.
+        for i in range(len(path) - 1, 0, -1):
+            if (target := self.references.get(path[:i])) is not None:
+                return [target + path[i:]]
+
+        return self.contained.get(path, [])
+
+    def affected(self, changed: Iterable[ElementPath]) -> set[ElementPath]:
+        """References whose resolved value depends on changed elements, transitively."""
+        result = set[ElementPath]()
+        queue = deque(changed)
+
+        while queue:
+            path = queue.popleft()
+
+            # Targets holding the changed element, or nested within it.
+            targets = [path[:i] for i in range(len(path) + 1)]
+            targets.extend(self.targets.get(path, []))
+
+            for target in targets:
+                for source in self.dependents.get(target, ()):
+                    if source not in result:
+                        result.add(source)
+                        queue.append(source)
+
+        return result
+
+    def cycles(self) -> Iterator[list[ElementPath]]:
+        """Yield the references that are part of a cycle, grouped by cycle.
+
+        Uses Tarjan's algorithm, without recursion.
+        """
+        index = dict[ElementPath, int]()
+        lowlink = dict[ElementPath, int]()
+        stack = list[ElementPath]()
+        on_stack = set[ElementPath]()
+
+        for root in self.references:
+            if root in index:
+                continue
+
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.successors(root)))]
+
+            while work:
+                node, successors = work[-1]
+
+                for successor in successors:
+                    if successor not in index:
+                        index[successor] = lowlink[successor] = len(index)
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, iter(self.successors(successor))))
+                        break
+                    if successor in on_stack:
+                        lowlink[node] = min(lowlink[node], index[successor])
+                else:
+                    work.pop()
+
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                    if lowlink[node] != index[node]:
+                        continue
+
+                    component = list[ElementPath]()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+
+                    if len(component) == 1 and node not in self.successors(node):
+                        continue
+
+                    yield sorted(p for p in component if p in self.references)
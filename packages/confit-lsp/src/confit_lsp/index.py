@@ -0,0 +1,155 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from itertools import accumulate, islice
+from typing import Iterable, Iterator, Self
+
+from lsprotocol.types import Position, Range
+
+Point = int
+"""A `(line, character)` position packed in an integer, see `ranges.pack`.
+
+Compares much faster than `Position`, and fits in an `array`.
+"""
+
+
+def point(position: Position) -> Point:
+    return position.line << 32 | position.character
+
+
+def unpack(point: Point) -> Position:
+    return Position(line=point >> 32, character=point & 0xFFFFFFFF)
+
+
+@dataclass
+class RangeIndex[T]:
+    """Sorted index of ranged items, for logarithmic position lookups.
+
+    Items are sorted by start position. Alongside, we keep the running maximum
+    of end positions, which lets range queries skip every item that ends
+    before the queried range, even if ranges overlap.
+    """
+
+    starts: array
+    ends: array
+    max_ends: array
+    items: list[T]
+
+    @classmethod
+    def build(cls, elements: Iterable[tuple[T, Range]]) -> Self:
+        items = list[T]()
+        starts = array("q")
+        ends = array("q")
+
+        for item, location in elements:
+            items.append(item)
+            starts.append(point(location.start))
+            ends.append(point(location.end))
+
+        return cls.from_points(items, starts, ends)
+
+    @classmethod
+    def from_points(cls, items: list[T], starts: array, ends: array) -> Self:
+        """Build the index from packed positions, without going through `Range`."""
+        # Elements usually come in document order already.
+        if any(a > b for a, b in zip(starts, islice(starts, 1, None))):
+            order = sorted(range(len(starts)), key=starts.__getitem__)
+            starts = array("q", (starts[i] for i in order))
+            ends = array("q", (ends[i] for i in order))
+            items = [items[i] for i in order]
+
+        return cls(
+            starts=starts,
+            ends=ends,
+            max_ends=array("q", accumulate(ends, max)),
+            items=items,
+        )
+
+    def splice(self, start: Point, stop: Point, other: Self, shift: int) -> Self:
+        """Replace the items starting within `[start, stop)` by those of another index.
+
+        The items that follow are moved by `shift`, e.g. a number of lines as a
+        point. The other items are expected to fit in between.
+        """
+        lo = bisect_left(self.starts, start)
+        hi = bisect_left(self.starts, stop, lo)
+
+        starts = self.starts[:lo] + other.starts
+        ends = self.ends[:lo] + other.ends
+        max_ends = self.max_ends[:lo]
+        max_ends.extend(running_max(other.ends, max_ends[-1] if lo else None))
+
+        following = slice(hi, None)
+
+        starts += moved(self.starts[following], shift)
+        ends += moved(self.ends[following], shift)
+
+        # The following items end past `stop`. Unless an item before them ends
+        # even later, they hold their own running maximums, which move along.
+        if (not hi or self.max_ends[hi - 1] <= stop) and (
+            not max_ends or max_ends[-1] <= stop + shift
+        ):
+            max_ends += moved(self.max_ends[following], shift)
+        else:
+            initial = max_ends[-1] if max_ends else None
+            max_ends.extend(running_max(ends[len(max_ends) :], initial))
+
+        return type(self)(
+            starts=starts,
+            ends=ends,
+            max_ends=max_ends,
+            items=self.items[:lo] + other.items + self.items[hi:],
+        )
+
+    def location(self, i: int) -> Range:
+        return Range(start=unpack(self.starts[i]), end=unpack(self.ends[i]))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def at(self, position: Position) -> tuple[T, Range] | None:
+        """Get the item whose range contains the position (end excluded).
+
+        If several ranges contain the position, the one that starts last wins.
+        """
+        p = point(position)
+
+        i = bisect_right(self.starts, p) - 1
+
+        while i >= 0 and self.max_ends[i] > p:
+            if self.ends[i] > p:
+                return self.items[i], self.location(i)
+            i -= 1
+
+        return None
+
+    def indices(self, start: Position, end: Position) -> Iterator[int]:
+        """Iterate over the indices of the items that overlap the `[start, end]` range."""
+        lo = point(start)
+        hi = point(end)
+
+        first = bisect_left(self.max_ends, lo)
+        stop = bisect_right(self.starts, hi)
+
+        for i in range(first, stop):
+            if self.ends[i] >= lo:
+                yield i
+
+    def overlapping(self, start: Position, end: Position) -> Iterator[tuple[T, Range]]:
+        """Iterate over the items that overlap the `[start, end]` range, bounds included."""
+        for i in self.indices(start, end):
+            yield self.items[i], self.location(i)
+
+
+def moved(points: array, shift: int) -> array:
+    """Points moved by a shift. Faster with a list than with `map`."""
+    if not shift:
+        return points
+    return array("q", [point + shift for point in points])
+
+
+def running_max(points: Iterable[int], initial: int | None = None) -> Iterator[int]:
+    """Running maximum of the points, following an initial maximum if any."""
+    if initial is None:
+        return accumulate(points, max)
+    return islice(accumulate(points, max, initial=initial), 1, None)
@@ -1,2 +1,3 @@
+from confit_lite.signatures import get_pydantic_input_model
+
 from .location import get_function_location
-from .pydantic import get_pydantic_input_model
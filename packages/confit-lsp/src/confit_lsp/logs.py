@@ -0,0 +1,129 @@
+"""Logging configuration, kept off the request hot path.
+
+Handlers only push records to a queue: formatting beyond message interpolation,
+file I/O and forwarding to the client happen on a background thread.
+"""
+
+import asyncio
+import logging
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
+from typing import Any
+
+from lsprotocol.types import LogMessageParams, MessageType
+
+from .settings import Settings
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def message_type(level: int) -> MessageType:
+    if level >= logging.ERROR:
+        return MessageType.Error
+    if level >= logging.WARNING:
+        return MessageType.Warning
+    if level >= logging.INFO:
+        return MessageType.Info
+    return MessageType.Log
+
+
+def parse_level(level: str) -> int:
+    value = logging.getLevelNamesMapping().get(level.upper())
+
+    if value is None:
+        logging.getLogger(__name__).warning("Unknown log level %r", level)
+        return logging.WARNING
+
+    return value
+
+
+class ClientHandler(logging.Handler):
+    """Forward records to the client through `window/logMessage`.
+
+    Runs on the listener thread, hence hands messages over to the event loop.
+    """
+
+    def __init__(self, server: Any, loop: asyncio.AbstractEventLoop):
+        super().__init__()
+        self.server = server
+        self.loop = loop
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # pygls logs the messages it sends, which would loop forever.
+        if record.name.startswith("pygls"):
+            return
+
+        params = LogMessageParams(
+            type=message_type(record.levelno),
+            message=self.format(record),
+        )
+
+        try:
+            self.loop.call_soon_threadsafe(self.server.window_log_message, params)
+        except RuntimeError:
+            # The event loop is closed, i.e. the server is shutting down.
+            pass
+
+
+class LogConfiguration:
+    """Owns the queue listener, such that logging can be reconfigured at runtime."""
+
+    def __init__(self):
+        self.handler: QueueHandler | None = None
+        self.listener: QueueListener | None = None
+
+    def configure(self, settings: Settings, server: Any = None) -> None:
+        """(Re)configure the root logger.
+
+        Args:
+            settings: Level and destinations.
+            server: Language server to forward records to, if enabled in the
+                settings. Must be called from within the event loop.
+        """
+        self.stop()
+
+        formatter = logging.Formatter(FORMAT)
+        handlers = list[logging.Handler]()
+
+        if settings.log_file is not None:
+            handler = RotatingFileHandler(
+                settings.log_file,
+                maxBytes=settings.log_max_bytes,
+                backupCount=settings.log_backups,
+                encoding="utf-8",
+            )
+        else:
+            # Stdout carries the protocol itself.
+            handler = logging.StreamHandler(sys.stderr)
+
+        handler.setFormatter(formatter)
+        handlers.append(handler)
+
+        if settings.log_to_client and server is not None:
+            client = ClientHandler(server, asyncio.get_running_loop())
+            client.setFormatter(logging.Formatter("%(name)s: %(message)s"))
+            handlers.append(client)
+
+        queue = SimpleQueue[logging.LogRecord]()
+
+        self.handler = QueueHandler(queue)
+        self.listener = QueueListener(queue, *handlers, respect_handler_level=True)
+
+        root = logging.getLogger()
+        root.addHandler(self.handler)
+        root.setLevel(parse_level(settings.log_level))
+
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Flush pending records, and detach from the root logger."""
+        if self.handler is not None:
+            logging.getLogger().removeHandler(self.handler)
+            self.handler = None
+
+        if self.listener is not None:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
@@ -2,57 +2,113 @@
 TOML LSP Server with element validation and hover support.
 """
 
+import asyncio
 import logging
-from typing import Any, Optional
+import time
+import uuid
+from typing import Any, Optional, Sequence
 
-from pydantic import TypeAdapter, ValidationError
 from pygls.lsp.server import LanguageServer
 from lsprotocol.types import (
+    COMPLETION_ITEM_RESOLVE,
     TEXT_DOCUMENT_COMPLETION,
+    TEXT_DOCUMENT_DIAGNOSTIC,
+    TEXT_DOCUMENT_DID_CHANGE,
+    TEXT_DOCUMENT_DID_CLOSE,
     TEXT_DOCUMENT_DID_OPEN,
     TEXT_DOCUMENT_DID_SAVE,
     INITIALIZE,
+    INITIALIZED,
+    WORKSPACE_DIAGNOSTIC,
+    WORKSPACE_DID_CHANGE_WATCHED_FILES,
     TEXT_DOCUMENT_HOVER,
     TEXT_DOCUMENT_DEFINITION,
     TEXT_DOCUMENT_INLAY_HINT,
+    TEXT_DOCUMENT_REFERENCES,
+    TEXT_DOCUMENT_RENAME,
+    TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL,
+    TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL_DELTA,
+    TEXT_DOCUMENT_SEMANTIC_TOKENS_RANGE,
     CompletionItem,
-    CompletionItemKind,
     CompletionList,
+    CompletionOptions,
     CompletionParams,
+    DidChangeTextDocumentParams,
+    DidChangeWatchedFilesParams,
+    DidChangeWatchedFilesRegistrationOptions,
+    DidCloseTextDocumentParams,
     DidOpenTextDocumentParams,
     DidSaveTextDocumentParams,
     Diagnostic,
-    DiagnosticSeverity,
+    DiagnosticOptions,
+    DocumentDiagnosticParams,
+    FileSystemWatcher,
     InlayHint,
     InlayHintKind,
     InlayHintParams,
-    InsertTextFormat,
+    ProgressParams,
+    ReferenceParams,
+    RenameParams,
+    SemanticTokens,
+    SemanticTokensDelta,
+    SemanticTokensDeltaParams,
+    SemanticTokensParams,
+    SemanticTokensRangeParams,
     PublishDiagnosticsParams,
+    RelatedFullDocumentDiagnosticReport,
+    RelatedUnchangedDocumentDiagnosticReport,
     Hover,
     MarkupContent,
     MarkupKind,
     Location,
     HoverParams,
+    Position,
     DefinitionParams,
     InitializeParams,
+    InitializedParams,
+    Registration,
+    RegistrationParams,
+    TextDocumentContentChangeEvent,
+    TextDocumentContentChangePartial,
+    WorkDoneProgressBegin,
+    WorkDoneProgressEnd,
+    WorkDoneProgressReport,
+    WorkspaceDiagnosticParams,
+    WorkspaceDiagnosticReport,
+    WorkspaceDiagnosticReportPartialResult,
+    WorkspaceDocumentDiagnosticReport,
+    WorkspaceEdit,
+    WorkspaceFullDocumentDiagnosticReport,
+    WorkspaceUnchangedDocumentDiagnosticReport,
 )
+from pygls.exceptions import JsonRpcInvalidParams
+from pygls.uris import to_fs_path
 from pygls.workspace import TextDocument
 from confit_lite.registry import REGISTRY
 
+from . import capabilities
+from .completion import KEY_PREFIX, CompletionIndex, documentation, enclosing_table
 from .descriptor import ConfigurationView
+from .diagnostics import (
+    DiagnosticsScheduler,
+    ReportCache,
+    check_path,
+    parse_error,
+)
+from .executor import RequestExecutor, checkpoint
+from .metadata import FactoryMetadata, MetadataStore, default_cache_path
 from .parsers.types import ElementPath
-from .capabilities import FunctionDescription
-
+from .references import BARE_KEY, rename_edits
+from .reload import FactoryReloader, RegistryDiff, factory_names
+from .logs import LogConfiguration
+from .settings import Settings
+from .stats import Stats, deep_size, export, instrument
+from .tokens import LEGEND, TokenCache, encode, token_edits
+from .views import ViewCache
+from .workspace import FileIndex, WorkspaceIndex, discover
 
-logging.basicConfig(
-    filename="/tmp/config-lsp.log",
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
 
-# In your server code
 logger = logging.getLogger(__name__)
-logger.info("LSP server started")
 
 
 class ConfitLanguageServer(LanguageServer):
@@ -60,231 +116,602 @@ class ConfitLanguageServer(LanguageServer):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._views = dict[str, tuple[int, ConfigurationView]]()
+        self.settings = Settings()
+        self.views = ViewCache(self.settings.max_views)
+        self.metadata = MetadataStore(default_cache_path())
+        self.stats = Stats()
+        self.logs = LogConfiguration()
+        self.diagnostics = DiagnosticsScheduler(
+            self.publish_diagnostics,
+            stats=self.stats,
+        )
+        self.index = WorkspaceIndex()
+        self.requests = RequestExecutor(self.settings.request_workers)
+        """Runs parsing and introspection off the event loop."""
+
+        self.reloader = FactoryReloader()
+        self._reloading: asyncio.Task | None = None
+
+        self.reports = ReportCache()
+        self.tokens = TokenCache()
+        self._completions: CompletionIndex | None = None
+        self.pull_diagnostics = False
+        """Whether the client pulls diagnostics, in which case they are not pushed."""
+
+    def publish_diagnostics(
+        self,
+        uri: str,
+        version: int | None,
+        diagnostics: list[Diagnostic],
+    ) -> None:
+        payload = PublishDiagnosticsParams(
+            uri=uri,
+            version=version,
+            diagnostics=diagnostics,
+        )
+        self.text_document_publish_diagnostics(payload)
+
+    def result_id(self, text_document: TextDocument) -> str:
+        """Identify the state diagnostics are computed from.
+
+        Versions are not unique across re-opened documents, hence the content
+        hash - which Python caches on the string.
+        """
+        version = text_document.version
+        content = hash(text_document.source)
+        return f"{REGISTRY.generation}-{version}-{content:x}"
+
+    def completion_index(self) -> CompletionIndex:
+        """Get the completion index, rebuilding it if the registry changed."""
+        generation = REGISTRY.generation
+
+        if self._completions is None or self._completions.generation != generation:
+            self._completions = CompletionIndex.build(self.metadata.all(), generation)
+
+        return self._completions
+
+    async def completion_index_async(self) -> CompletionIndex:
+        """Like `completion_index`, rebuilding the index on the request pool."""
+        completions = self._completions
+
+        if completions is not None and completions.generation == REGISTRY.generation:
+            return completions
+
+        return await self.requests.run(self.completion_index)
+
+    async def metadata_async(self, name: Any) -> FactoryMetadata | None:
+        """Get the metadata of a factory, describing it on the request pool."""
+        if (metadata := self.metadata.peek(name)) is not None:
+            return metadata
+
+        return await self.requests.run(self.metadata.get, name)
+
+    def schedule_diagnostics(
+        self,
+        text_document: TextDocument,
+        view: ConfigurationView,
+        delay: float | None = None,
+    ) -> None:
+        """Validate and push diagnostics, unless the client pulls them."""
+        if self.pull_diagnostics:
+            return
+
+        self.diagnostics.schedule(
+            text_document.uri,
+            text_document.version,
+            view,
+            delay=delay,
+        )
 
     def parse(
         self,
         text_document: TextDocument,
     ) -> ConfigurationView | None:
         uri = text_document.uri
+        version = text_document.version
         source = text_document.source
-        source_hash = hash(source)
 
-        if uri in self._views:
-            h, view = self._views[uri]
-            if h == source_hash:
-                return view
+        if (view := self.views.lookup(uri, version, source)) is not None:
+            return view
 
         if not uri.endswith(".toml"):
             return None
 
-        view = ConfigurationView.from_source(text_document.source)
+        return self.parse_source(uri, version, source)
 
-        self._views[uri] = (source_hash, view)
+    async def parse_async(
+        self,
+        text_document: TextDocument,
+    ) -> ConfigurationView | None:
+        """Like `parse`, parsing on the request pool on cache misses."""
+        uri = text_document.uri
+        version = text_document.version
+        source = text_document.source
 
-        return view
+        if (view := self.views.lookup(uri, version, source)) is not None:
+            return view
+
+        if not uri.endswith(".toml"):
+            return None
 
+        return await self.requests.run(self.parse_source, uri, version, source)
 
-server = ConfitLanguageServer("confit-lsp", "v0.1")
+    def parse_source(
+        self,
+        uri: str,
+        version: int | None,
+        source: str,
+    ) -> ConfigurationView:
+        start = time.perf_counter()
+        view = ConfigurationView.from_source(source)
+        self.stats.record_document(uri, "parse", time.perf_counter() - start)
+
+        self.views.put(uri, version, source, view)
 
+        return view
 
-def validate_config(view: ConfigurationView) -> list[Diagnostic]:
-    """Validate .toml and return diagnostics"""
+    def update(
+        self,
+        text_document: TextDocument,
+        changes: Sequence[TextDocumentContentChangeEvent],
+    ) -> ConfigurationView | None:
+        """Patch the cached view with incremental changes.
 
-    diagnostics = []
+        The changes are replayed on the previous content, such that each edit
+        only re-parses the tables it touches. Falls back to a full parse
+        whenever the edits cannot be applied incrementally.
+        """
+        uri = text_document.uri
 
-    factories = dict[ElementPath, FunctionDescription]()
+        if (cached := self.views.get(uri)) is None:
+            return self.parse(text_document)
 
-    for path in view.factories():
-        path = (*path, "factory")
-        location = view.values[path]
-        factory_name = view.get_value(path)
+        view = cached.view
+        start = time.perf_counter()
 
-        if not isinstance(factory_name, str):
-            diagnostics.append(
-                Diagnostic(
-                    range=location,
-                    message=f"Element value must be a string, got {type(factory_name).__name__}",
-                    severity=DiagnosticSeverity.Error,
-                    source="confit-lsp",
-                )
-            )
-            continue
+        scratch = TextDocument(
+            uri,
+            source=cached.source,
+            position_codec=text_document.position_codec,
+        )
 
-        if factory_name not in REGISTRY:
-            diagnostics.append(
-                Diagnostic(
-                    range=location,
-                    message=f"Element '{factory_name}' not found in the registry.",
-                    severity=DiagnosticSeverity.Error,
-                    source="confit-lsp",
-                )
+        for change in changes:
+            if not isinstance(change, TextDocumentContentChangePartial):
+                return self.parse(text_document)
+
+            change_range = scratch.position_codec.range_from_client_units(
+                scratch.lines,
+                change.range,
             )
-            continue
+            scratch.apply_change(change)
+            view = view.apply_change(scratch.source, change_range, change.text)
 
-        factories[path[:-1]] = FunctionDescription.from_function(
-            factory_name,
-            REGISTRY[factory_name],
-        )
+        if scratch.source != text_document.source:
+            logger.warning("Incremental update diverged for %s, re-parsing.", uri)
+            return self.parse(text_document)
 
-    for path, factory in factories.items():
-        root = view.get_object(path).copy()
-        root_keys = set(root.keys()) - {"factory"}
+        self.views.put(uri, text_document.version, scratch.source, view)
+        self.stats.record_document(uri, "update", time.perf_counter() - start)
 
-        model_keys = set(factory.input_model.model_fields.keys())
-        required_model_keys = set(
-            key
-            for key, info in factory.input_model.model_fields.items()
-            if info.is_required()
+        return view
+
+    def snapshot(self) -> dict[str, Any]:
+        """Statistics, along with cache hit rates and the memory held by views."""
+        return self.stats.snapshot(
+            caches=dict(
+                views=self.views.counter.summary(),
+                metadata=self.metadata.counter.summary(),
+            ),
+            views=dict(
+                count=len(self.views),
+                memory_bytes=deep_size([entry.view for entry in self.views.entries()]),
+            ),
         )
 
-        extra_keys = root_keys - model_keys
-        for key in extra_keys:
-            diagnostics.append(
-                Diagnostic(
-                    range=view.keys[(*path, key)],
-                    message=f"Argument `{key}` is not recognized by `{factory.name}` and will be ignored.",
-                    severity=DiagnosticSeverity.Warning,
-                    source="confit-lsp",
-                )
-            )
+    def refresh_factories(self, diff: RegistryDiff) -> None:
+        """Drop what depends on reloaded factories, and validate affected documents."""
+        if not diff:
+            return
 
-        factory_element = view.keys[(*path, "factory")]
-        missing_keys = required_model_keys - root_keys
-        for key in missing_keys:
-            diagnostics.append(
-                Diagnostic(
-                    range=factory_element,
-                    message=f"Argument `{key}` is missing.",
-                    severity=DiagnosticSeverity.Error,
-                    source="confit-lsp",
-                )
+        self.metadata.invalidate(*diff.names)
+        capabilities.invalidate(*diff.names)
+
+        if not (names := diff.validation):
+            return
+
+        # Open documents that dropped out of the view cache are parsed again.
+        affected = list[tuple[TextDocument, ConfigurationView]]()
+
+        for doc in list(self.workspace.text_documents.values()):
+            try:
+                view = self.parse(doc)
+            except ValueError:
+                # Invalid documents already report their parsing error.
+                continue
+
+            if view is not None and factory_names(view) & names:
+                affected.append((doc, view))
+
+        if self.pull_diagnostics:
+            workspace = self.client_capabilities.workspace
+            diagnostics = workspace and workspace.diagnostics
+
+            if not (diagnostics and diagnostics.refresh_support):
+                return
+
+            indexed = any(
+                names.intersection(file.factories.values())
+                for file in self.index.files.values()
             )
+            if affected or indexed:
+                self.workspace_diagnostic_refresh(None)
+            return
 
-        for key in root_keys & model_keys:
-            info = factory.input_model.model_fields[key]
-            value = root[key]
-
-            total_path = (*path, key)
-
-            target = view.references.get(total_path)
-
-            if target is not None:
-                element = view.keys[total_path]
-                try:
-                    view.get_value(target)
-                except KeyError:
-                    diagnostics.append(
-                        Diagnostic(
-                            range=element,
-                            message="No element with this key exists.",
-                            severity=DiagnosticSeverity.Error,
-                            source="confit-lsp",
-                        )
-                    )
-                    continue
-                total_path = target
-
-            if (sub_factory_descriptor := factories.get(total_path)) is not None:
-                if sub_factory_descriptor.return_type is None:
-                    continue
-                if info.annotation == Any:
-                    continue
-
-                if sub_factory_descriptor.return_type != info.annotation:
-                    diagnostics.append(
-                        Diagnostic(
-                            range=factory_element,
-                            message=(
-                                f"Argument `{key}` is provided by a factory with incompatible type.\n"
-                                f"Expected `{info.annotation.__qualname__}`, got `{sub_factory_descriptor.return_type.__qualname__}`."
-                            ),
-                            severity=DiagnosticSeverity.Error,
-                            source="confit-lsp",
-                        )
-                    )
+        for doc, view in affected:
+            self.schedule_diagnostics(doc, view, delay=0)
+
+    async def factory_usages(self, name: str) -> list[Location]:
+        """Locations of the values that instantiate a factory, across the workspace.
+
+        Open documents are read from their current content, other files from
+        the workspace index.
+        """
+        locations = list[Location]()
+        documents = self.workspace.text_documents
+
+        for uri, doc in list(documents.items()):
+            try:
+                view = await self.parse_async(doc)
+            except ValueError:
                 continue
 
+            if view is None:
+                continue
+
+            locations.extend(FileIndex.from_view(uri, view).usages(name))
+
+        locations.extend(
+            location
+            for location in self.index.usages(name)
+            if location.uri not in documents
+        )
+
+        return locations
+
+    async def reload_factories(self) -> None:
+        """Reload the modules of factories whose source changed."""
+        for module in await asyncio.to_thread(self.reloader.poll):
+            try:
+                diff = await asyncio.to_thread(self.reloader.reload, module)
+            except Exception:
+                logger.warning("Could not reload %s", module, exc_info=True)
+                continue
+
+            logger.info("Reloaded %s: %s", module, sorted(diff.names))
+            self.refresh_factories(diff)
+
+    async def watch_factories(self, interval: float) -> None:
+        """Reload the modules of factories whose source changes, until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+
+            # A failed refresh must not stop watching.
+            try:
+                await self.reload_factories()
+            except Exception:
+                logger.warning("Could not refresh reloaded factories", exc_info=True)
+
+    async def index_workspace(self) -> None:
+        """Index the configuration files in the workspace folders, reporting progress."""
+        roots = [to_fs_path(folder.uri) for folder in self.workspace.folders.values()]
+        roots = [root for root in roots if root is not None]
+
+        if not roots and self.workspace.root_path is not None:
+            roots = [self.workspace.root_path]
+
+        paths = await asyncio.to_thread(discover, roots)
+
+        if not paths:
+            return
+
+        window = self.client_capabilities.window
+        token = None
+
+        if window is not None and window.work_done_progress:
+            token = str(uuid.uuid4())
             try:
-                adapter = TypeAdapter(info.annotation)
-                adapter.validate_python(value)
-            except ValidationError as e:
-                element = view.keys[total_path]
-                for error in e.errors():
-                    msg = error["msg"]
-                    diagnostics.append(
-                        Diagnostic(
-                            range=element,
-                            message=f"Argument `{key}` has incompatible type.\n{msg}",
-                            severity=DiagnosticSeverity.Error,
-                            source="confit-lsp",
-                        )
-                    )
-
-    return diagnostics
+                await self.work_done_progress.create_async(token)
+            except Exception:
+                logger.debug("Could not create progress token", exc_info=True)
+                token = None
+
+        if token is None:
+            self.index.update(await asyncio.to_thread(self.index.index, paths))
+            return
+
+        loop = asyncio.get_running_loop()
+
+        def report(done: int, total: int) -> None:
+            value = WorkDoneProgressReport(
+                message=f"{done}/{total}",
+                percentage=done * 100 // total,
+            )
+            loop.call_soon_threadsafe(self.work_done_progress.report, token, value)
+
+        self.work_done_progress.begin(
+            token,
+            WorkDoneProgressBegin(
+                title="Indexing configurations",
+                message=f"0/{len(paths)}",
+                percentage=0,
+            ),
+        )
+
+        try:
+            files = await asyncio.to_thread(self.index.index, paths, report)
+            self.index.update(files)
+        finally:
+            self.work_done_progress.end(
+                token,
+                WorkDoneProgressEnd(message=f"Indexed {len(self.index.files)} files"),
+            )
+
+
+server = ConfitLanguageServer("confit-lsp", "v0.1")
 
 
 @server.feature(INITIALIZE)
-async def initialize(params: InitializeParams) -> None:
+async def initialize(ls: ConfitLanguageServer, params: InitializeParams) -> None:
     """Initialize the server."""
-    return
+    ls.settings = Settings.from_options(params.initialization_options)
+    ls.logs.configure(ls.settings, ls)
+    ls.views.resize(ls.settings.max_views)
+
+    if not ls.settings.metadata_cache:
+        ls.metadata = MetadataStore(None)
+
+    ls.index.max_workers = ls.settings.index_workers
+
+    ls.requests.shutdown()
+    ls.requests = RequestExecutor(ls.settings.request_workers)
+
+    text_document = params.capabilities.text_document
+    ls.pull_diagnostics = (
+        text_document is not None and text_document.diagnostic is not None
+    )
+
+
+@server.feature(INITIALIZED)
+async def initialized(ls: ConfitLanguageServer, params: InitializedParams) -> None:
+    """Index the workspace, and watch configuration files to keep the index fresh.
+
+    Also starts watching the source of factories, if enabled.
+    """
+    if ls.settings.reload_interval and ls._reloading is None:
+        ls._reloading = asyncio.create_task(
+            ls.watch_factories(ls.settings.reload_interval)
+        )
+
+    if not ls.settings.workspace_index:
+        return
+
+    workspace = ls.client_capabilities.workspace
+    watched = workspace and workspace.did_change_watched_files
+
+    if watched and watched.dynamic_registration:
+        registration = Registration(
+            id=str(uuid.uuid4()),
+            method=WORKSPACE_DID_CHANGE_WATCHED_FILES,
+            register_options=DidChangeWatchedFilesRegistrationOptions(
+                watchers=[FileSystemWatcher(glob_pattern="**/*.toml")]
+            ),
+        )
+        try:
+            await ls.client_register_capability_async(
+                RegistrationParams(registrations=[registration])
+            )
+        except Exception:
+            logger.warning("Could not watch configuration files", exc_info=True)
+
+    try:
+        await ls.index_workspace()
+    except Exception:
+        logger.exception("Could not index the workspace")
+
+
+@server.feature(WORKSPACE_DID_CHANGE_WATCHED_FILES)
+async def did_change_watched_files(
+    ls: ConfitLanguageServer,
+    params: DidChangeWatchedFilesParams,
+) -> None:
+    """Keep the workspace index fresh."""
+    if not ls.settings.workspace_index:
+        return
+
+    files = await asyncio.to_thread(ls.index.refresh, params.changes)
+    ls.index.update(files)
 
 
 @server.feature(TEXT_DOCUMENT_DID_OPEN)
+@instrument("textDocument/didOpen")
 async def did_open(ls: ConfitLanguageServer, params: DidOpenTextDocumentParams):
     """Handle document open event"""
 
     doc = ls.workspace.get_text_document(params.text_document.uri)
-    view = ls.parse(doc)
+    view = await ls.parse_async(doc)
 
     if view is None:
         return
 
-    diagnostics = validate_config(view)
-    payload = PublishDiagnosticsParams(
-        uri=doc.uri,
-        diagnostics=diagnostics,
-    )
-    ls.text_document_publish_diagnostics(payload)
+    ls.schedule_diagnostics(doc, view, delay=0)
 
 
 @server.feature(TEXT_DOCUMENT_DID_SAVE)
+@instrument("textDocument/didSave")
 async def did_save(ls: ConfitLanguageServer, params: DidSaveTextDocumentParams):
     """Handle document save event"""
     doc = ls.workspace.get_text_document(params.text_document.uri)
-    view = ls.parse(doc)
+    view = await ls.parse_async(doc)
 
     if view is None:
         return
 
-    diagnostics = validate_config(view)
-    payload = PublishDiagnosticsParams(
-        uri=doc.uri,
-        diagnostics=diagnostics,
-    )
-    ls.text_document_publish_diagnostics(payload)
+    ls.schedule_diagnostics(doc, view, delay=0)
+
+
+@server.feature(TEXT_DOCUMENT_DID_CHANGE)
+@instrument("textDocument/didChange")
+async def did_change(ls: ConfitLanguageServer, params: DidChangeTextDocumentParams):
+    """Handle document change event"""
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+
+    if not doc.uri.endswith(".toml"):
+        return
+
+    try:
+        view = ls.update(doc, params.content_changes)
+    except Exception:
+        # The document is most likely being edited and is temporarily invalid.
+        logger.debug("Could not parse %s", doc.uri, exc_info=True)
+        ls.views.pop(doc.uri)
+        return
+
+    if view is None:
+        return
+
+    ls.schedule_diagnostics(doc, view)
+
+
+@server.feature(TEXT_DOCUMENT_DID_CLOSE)
+async def did_close(ls: ConfitLanguageServer, params: DidCloseTextDocumentParams):
+    """Handle document close event"""
+    ls.views.pop(params.text_document.uri)
+    ls.diagnostics.discard(params.text_document.uri)
+    ls.stats.forget(params.text_document.uri)
+    ls.reports.pop(params.text_document.uri)
+    ls.tokens.pop(params.text_document.uri)
+
+
+@server.feature(
+    TEXT_DOCUMENT_DIAGNOSTIC,
+    DiagnosticOptions(
+        identifier="confit-lsp",
+        inter_file_dependencies=False,
+        workspace_diagnostics=True,
+    ),
+)
+@instrument("textDocument/diagnostic")
+async def document_diagnostic(
+    ls: ConfitLanguageServer,
+    params: DocumentDiagnosticParams,
+) -> RelatedFullDocumentDiagnosticReport | RelatedUnchangedDocumentDiagnosticReport:
+    """Pull diagnostics for an open document."""
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    result_id = ls.result_id(doc)
+
+    if params.previous_result_id == result_id:
+        return RelatedUnchangedDocumentDiagnosticReport(result_id=result_id)
+
+    diagnostics = ls.reports.get(doc.uri, result_id)
+
+    if diagnostics is None:
+        try:
+            view = await ls.parse_async(doc)
+        except ValueError as e:
+            view, diagnostics = None, [parse_error(e)]
+
+        if view is not None:
+            validator = ls.diagnostics.validator(doc.uri)
+            diagnostics = await ls.diagnostics.run(doc.uri, validator, view)
 
+        diagnostics = diagnostics or []
+        ls.reports.put(doc.uri, result_id, diagnostics)
 
-# @server.feature(TEXT_DOCUMENT_DID_CHANGE)
-# async def did_change(ls: LanguageServer, params: DidChangeTextDocumentParams):
-#     """Handle document change event"""
-#     doc = ls.workspace.get_text_document(params.text_document.uri)
-#
-#     if doc.uri.endswith(".toml"):
-#         diagnostics = validate_config(doc)
-#         payload = PublishDiagnosticsParams(
-#             uri=doc.uri,
-#             diagnostics=diagnostics,
-#         )
-#         ls.text_document_publish_diagnostics(payload)
+    return RelatedFullDocumentDiagnosticReport(items=diagnostics, result_id=result_id)
+
+
+WORKSPACE_DIAGNOSTIC_BATCH = 50
+"""Number of document reports sent per partial result."""
+
+
+@server.feature(WORKSPACE_DIAGNOSTIC)
+@instrument("workspace/diagnostic")
+async def workspace_diagnostic(
+    ls: ConfitLanguageServer,
+    params: WorkspaceDiagnosticParams,
+) -> WorkspaceDiagnosticReport:
+    """Pull diagnostics for the indexed configurations that are not open.
+
+    Reports are streamed as partial results if the client provides a token.
+    """
+    previous = {result.uri: result.value for result in params.previous_result_ids}
+    token = params.partial_result_token
+
+    items = list[WorkspaceDocumentDiagnosticReport]()
+
+    def send(batch: list[WorkspaceDocumentDiagnosticReport]) -> None:
+        assert token is not None
+        ls.progress(
+            ProgressParams(
+                token=token,
+                value=WorkspaceDiagnosticReportPartialResult(items=batch),
+            )
+        )
+
+    for uri, file in list(ls.index.files.items()):
+        # Open documents are reported through document pulls.
+        if uri in ls.workspace.text_documents:
+            continue
+
+        # Skip TOML files that are not configurations.
+        if not file.factories and file.error is None:
+            continue
+
+        result_id = f"{REGISTRY.generation}-m{file.mtime_ns}"
+
+        if previous.get(uri) == result_id:
+            items.append(
+                WorkspaceUnchangedDocumentDiagnosticReport(
+                    uri=uri,
+                    version=None,
+                    result_id=result_id,
+                )
+            )
+        else:
+            diagnostics = ls.reports.get(uri, result_id)
+
+            if diagnostics is None and (path := to_fs_path(uri)) is not None:
+                diagnostics = await ls.diagnostics.run(uri, check_path, path)
+                ls.reports.put(uri, result_id, diagnostics)
+
+            items.append(
+                WorkspaceFullDocumentDiagnosticReport(
+                    uri=uri,
+                    version=None,
+                    items=diagnostics or [],
+                    result_id=result_id,
+                )
+            )
+
+        if token is not None and len(items) >= WORKSPACE_DIAGNOSTIC_BATCH:
+            send(items)
+            items = []
+
+    # Once partial results were sent, the response itself must be empty.
+    if token is not None and items:
+        send(items)
+        items = []
+
+    return WorkspaceDiagnosticReport(items=items)
 
 
 @server.feature(TEXT_DOCUMENT_HOVER)
+@instrument("textDocument/hover")
 async def hover(ls: ConfitLanguageServer, params: HoverParams) -> Optional[Hover]:
     """Provide hover information for factories"""
 
     doc = ls.workspace.get_text_document(params.text_document.uri)
-    view = ls.parse(doc)
+    view = await ls.parse_async(doc)
 
     if view is None:
         return None
@@ -299,46 +726,49 @@ async def hover(ls: ConfitLanguageServer, params: HoverParams) -> Optional[Hover
     *path, key = path
     root = view.get_object(path)
 
+    # Array items have no argument to describe.
+    if not isinstance(root, dict):
+        return None
+
     factory_name = root.get("factory")
 
     if factory_name is None:
         return None
 
-    factory = REGISTRY.get(factory_name)
+    metadata = await ls.metadata_async(factory_name)
 
-    if factory is None:
+    if metadata is None:
         return None
 
-    description = FunctionDescription.from_function(factory_name, factory)
-
     if key == "factory":
         return Hover(
             contents=MarkupContent(
                 kind=MarkupKind.Markdown,
-                value=f"**Factory: {factory_name}**\n\n{description.docstring}",
+                value=f"**Factory: {factory_name}**\n\n{metadata.docstring}",
             )
         )
 
-    field_info = description.input_model.model_fields.get(key)
+    field = metadata.fields.get(key)
 
-    if field_info is None:
+    if field is None:
         return None
 
     return Hover(
         contents=MarkupContent(
             kind=MarkupKind.Markdown,
-            value=f"**Field: {key}**\n\n{field_info.annotation}",
+            value=f"**Field: {key}**\n\n{field.annotation}",
         )
     )
 
 
 @server.feature(TEXT_DOCUMENT_DEFINITION)
+@instrument("textDocument/definition")
 async def definition(
     ls: ConfitLanguageServer,
     params: DefinitionParams,
 ) -> Location | None:
     doc = ls.workspace.get_text_document(params.text_document.uri)
-    view = ls.parse(doc)
+    view = await ls.parse_async(doc)
 
     if view is None:
         return None
@@ -354,6 +784,8 @@ async def definition(
 
     target = view.references.get(path)
     if target is not None:
+        if target not in view.keys:
+            return None
         return Location(uri=doc.uri, range=view.keys[target])
 
     if path[-1] != "factory":
@@ -365,29 +797,142 @@ async def definition(
     if factory_name is None:
         return None
 
-    factory = REGISTRY.get(factory_name)
+    metadata = await ls.metadata_async(factory_name)
+
+    if metadata is None:
+        return None
+
+    return metadata.location
+
+
+@server.feature(TEXT_DOCUMENT_REFERENCES)
+@instrument("textDocument/references")
+async def references(
+    ls: ConfitLanguageServer,
+    params: ReferenceParams,
+) -> list[Location] | None:
+    """Find the references to an element, or to the target of a reference.
+
+    On a factory name, find where the factory is used across the workspace.
+    """
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    view = await ls.parse_async(doc)
+
+    if view is None:
+        return None
+
+    match view.get_element_from_position(params.position):
+        case ("value", (*_, "factory") as path):
+            if isinstance(name := view.get_value(path), str):
+                return await ls.factory_usages(name)
+
+    target = view.get_target_from_position(params.position)
+
+    if target is None:
+        return None
+
+    locations = [
+        Location(uri=doc.uri, range=view.values[source])
+        for source in view.reference_index.referencing(target)
+    ]
+
+    if params.context.include_declaration and target in view.keys:
+        locations.insert(0, Location(uri=doc.uri, range=view.keys[target]))
+
+    return locations
+
+
+@server.feature(TEXT_DOCUMENT_RENAME)
+@instrument("textDocument/rename")
+async def rename(
+    ls: ConfitLanguageServer,
+    params: RenameParams,
+) -> WorkspaceEdit | None:
+    """Rename an element, along with the references pointing to or within it."""
+    if not BARE_KEY.fullmatch(params.new_name):
+        raise JsonRpcInvalidParams(f"`{params.new_name}` is not a valid bare key")
+
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    view = await ls.parse_async(doc)
+
+    if view is None:
+        return None
+
+    target = view.get_target_from_position(params.position)
 
-    if factory is None:
+    if target is None:
         return None
 
-    description = FunctionDescription.from_function(factory_name, factory)
+    edits = rename_edits(
+        view.keys,
+        view.values,
+        view.reference_index,
+        doc.lines,
+        target,
+        params.new_name,
+    )
 
-    return description.location
+    return WorkspaceEdit(changes={doc.uri: edits})
 
 
-@server.feature(TEXT_DOCUMENT_COMPLETION)
+def argument_completion(
+    index: CompletionIndex,
+    view: ConfigurationView,
+    lines: Sequence[str],
+    line: int,
+) -> Optional[CompletionList]:
+    """Complete the argument keys of the factory table enclosing a line."""
+    try:
+        table = view.get_object(enclosing_table(lines, line))
+    except (KeyError, TypeError):
+        return None
+
+    if not isinstance(table, dict) or not isinstance(
+        factory := table.get("factory"), str
+    ):
+        return None
+
+    items = index.arguments(factory, table.keys())
+
+    if not items:
+        return None
+
+    return CompletionList(is_incomplete=False, items=items)
+
+
+@server.feature(TEXT_DOCUMENT_COMPLETION, CompletionOptions(resolve_provider=True))
+@instrument("textDocument/completion")
 async def completion(
     ls: ConfitLanguageServer,
     params: CompletionParams,
 ) -> Optional[CompletionList]:
-    """Provide auto-completion for element values"""
+    """Provide auto-completion for factory names and argument keys"""
     doc = ls.workspace.get_text_document(params.text_document.uri)
-    view = ls.parse(doc)
+
+    stale = False
+
+    try:
+        view = await ls.parse_async(doc)
+    except ValueError:
+        # A key being typed is not valid TOML yet: use the last valid state.
+        cached = ls.views.get(doc.uri)
+        if cached is None:
+            return None
+        view, stale = cached.view, True
 
     if view is None:
         return None
 
     cursor = params.position
+    line = doc.lines[cursor.line] if cursor.line < len(doc.lines) else ""
+
+    if KEY_PREFIX.fullmatch(line[: cursor.character]):
+        index = await ls.completion_index_async()
+        return argument_completion(index, view, doc.lines, cursor.line)
+
+    if stale:
+        return None
+
     element = view.get_element_from_position(cursor)
 
     match element:
@@ -401,81 +946,72 @@ async def completion(
     if key != "factory":
         return None
 
-    # Create completion items for all elements
-    items = []
-    for factory_name, factory in REGISTRY.items():
-        description = FunctionDescription.from_function(factory_name, factory)
-
-        docstring = description.docstring or "N/A"
-
-        items.append(
-            CompletionItem(
-                label=factory_name,
-                kind=CompletionItemKind.Value,
-                detail=docstring[:50] + "..."
-                if len(docstring) > 50
-                else description.docstring,
-                documentation=MarkupContent(
-                    kind=MarkupKind.Markdown,
-                    value=f"**{factory_name}**\n\n{description.docstring}",
-                ),
-                insert_text=f"{factory_name}",
-                insert_text_format=InsertTextFormat.PlainText,
-            )
-        )
+    # The typed prefix, without the opening quote.
+    value = view.values[path]
+    start = value.start.character if value.start.line == cursor.line else 0
+    prefix = line[start : cursor.character].lstrip("\"'")
 
-    return CompletionList(is_incomplete=False, items=items)
+    index = await ls.completion_index_async()
+    items, is_incomplete = index.search(
+        prefix,
+        ls.settings.max_completions,
+    )
 
+    return CompletionList(is_incomplete=is_incomplete, items=items)
 
-@server.feature(TEXT_DOCUMENT_INLAY_HINT)
-def inlay_hints(
+
+@server.feature(COMPLETION_ITEM_RESOLVE)
+@instrument("completionItem/resolve")
+async def completion_resolve(
     ls: ConfitLanguageServer,
-    params: InlayHintParams,
-):
-    doc = ls.workspace.get_text_document(params.text_document.uri)
-    view = ls.parse(doc)
+    item: CompletionItem,
+) -> CompletionItem:
+    """Add the documentation to a completion item."""
+    if not isinstance(item.data, dict) or "factory" not in item.data:
+        return item
 
-    if view is None:
-        return None
+    name = item.data["factory"]
 
-    hints = list[InlayHint]()
+    if (metadata := await ls.metadata_async(name)) is not None:
+        item.documentation = documentation(name, metadata)
 
-    start = params.range.start
-    end = params.range.end
+    return item
 
-    factories = dict[ElementPath, FunctionDescription]()
-    for path in view.factories():
-        factory_name = view.get_value((*path, "factory"))
-        factory = REGISTRY.get(factory_name)
 
-        if factory is None:
-            continue
+def type_hints(
+    view: ConfigurationView,
+    metadata: MetadataStore,
+    start: Position,
+    end: Position,
+) -> list[InlayHint]:
+    """Type hints of the factory arguments within a range."""
+    hints = list[InlayHint]()
 
-        factories[path] = FunctionDescription.from_function(factory_name, factory)
+    factories = dict[ElementPath, FactoryMetadata | None]()
 
-    for path, location in view.keys.items():
-        if location.start > end or start > location.end:
-            continue
+    for path, location in view.get_keys_in_range(start, end):
+        checkpoint()
 
         path, key = path[:-1], path[-1]
 
         if key == "factory":
             continue
 
-        factory = factories.get(path)
+        if path not in factories:
+            factory_name = view.get_object(path).get("factory")
+            factories[path] = metadata.get(factory_name)
+
+        factory = factories[path]
 
         if factory is None:
             continue
 
-        field_info = factory.input_model.model_fields.get(key)
+        field = factory.fields.get(key)
 
-        if field_info is None:
+        if field is None:
             continue
 
-        annotation = getattr(field_info.annotation, "__name__", None)
-
-        if annotation is None:
-            annotation = field_info.annotation and str(field_info.annotation) or None
+        annotation = field.type_name
 
         if annotation is None:
             continue
@@ -493,8 +1029,124 @@ def inlay_hints(
     return hints
 
 
+@server.feature(TEXT_DOCUMENT_INLAY_HINT)
+@instrument("textDocument/inlayHint")
+async def inlay_hints(
+    ls: ConfitLanguageServer,
+    params: InlayHintParams,
+):
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    view = await ls.parse_async(doc)
+
+    if view is None:
+        return None
+
+    return await ls.requests.run(
+        type_hints,
+        view,
+        ls.metadata,
+        params.range.start,
+        params.range.end,
+    )
+
+
+@server.feature(TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL, LEGEND)
+@instrument("textDocument/semanticTokens/full")
+async def semantic_tokens_full(
+    ls: ConfitLanguageServer,
+    params: SemanticTokensParams,
+) -> SemanticTokens | None:
+    """Color factory names, arguments and references."""
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    view = await ls.parse_async(doc)
+
+    if view is None:
+        return None
+
+    data = await ls.requests.run(encode, view, ls.metadata)
+
+    return SemanticTokens(data=data, result_id=ls.tokens.put(doc.uri, data))
+
+
+@server.feature(TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL_DELTA, LEGEND)
+@instrument("textDocument/semanticTokens/full/delta")
+async def semantic_tokens_delta(
+    ls: ConfitLanguageServer,
+    params: SemanticTokensDeltaParams,
+) -> SemanticTokens | SemanticTokensDelta | None:
+    """Send the tokens that changed since the previous result, if it is cached."""
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    view = await ls.parse_async(doc)
+
+    if view is None:
+        return None
+
+    previous = ls.tokens.get(doc.uri, params.previous_result_id)
+    data = await ls.requests.run(encode, view, ls.metadata)
+    result_id = ls.tokens.put(doc.uri, data)
+
+    if previous is None:
+        return SemanticTokens(data=data, result_id=result_id)
+
+    edits = await ls.requests.run(token_edits, previous, data)
+
+    return SemanticTokensDelta(edits=edits, result_id=result_id)
+
+
+@server.feature(TEXT_DOCUMENT_SEMANTIC_TOKENS_RANGE, LEGEND)
+@instrument("textDocument/semanticTokens/range")
+async def semantic_tokens_range(
+    ls: ConfitLanguageServer,
+    params: SemanticTokensRangeParams,
+) -> SemanticTokens | None:
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    view = await ls.parse_async(doc)
+
+    if view is None:
+        return None
+
+    data = await ls.requests.run(
+        encode,
+        view,
+        ls.metadata,
+        params.range.start,
+        params.range.end,
+    )
+
+    return SemanticTokens(data=data)
+
+
+@server.command("confit.stats")
+def stats(ls: ConfitLanguageServer, *arguments: Any) -> dict[str, Any]:
+    """Report latency statistics and cache usage.
+
+    Pass `{"reset": true}` as argument to start afresh after the report.
+    Snapshots are also appended to the `statsFile`, if configured.
+    """
+    snapshot = ls.snapshot()
+
+    if ls.settings.stats_file is not None:
+        try:
+            export(snapshot, ls.settings.stats_file)
+        except OSError:
+            logger.warning("Could not export statistics", exc_info=True)
+
+    options = arguments[0] if arguments and isinstance(arguments[0], dict) else {}
+
+    if options.get("reset"):
+        ls.stats.reset()
+
+    return snapshot
+
+
 def run():
-    server.start_io()
+    server.logs.configure(Settings())
+    logger.info("LSP server started")
+
+    try:
+        server.start_io()
+    finally:
+        server.logs.stop()
 
 
 if __name__ == "__main__":
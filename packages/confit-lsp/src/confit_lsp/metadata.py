@@ -0,0 +1,360 @@
+"""Persistent factory metadata, to serve requests without importing plugins.
+
+Everything hover, completion, definition and inlay hints need to know about a
+factory is serialized to the user cache directory. Entries are keyed on the
+source file they were extracted from (modification time and size) and on the
+version of the distribution that provides them, such that they can be trusted
+without importing anything. Only validation needs the actual factories.
+"""
+
+import hashlib
+import logging
+import os
+import sys
+from dataclasses import dataclass, field
+from functools import cache
+from importlib.metadata import entry_points, packages_distributions, version
+from pathlib import Path
+from threading import RLock
+from typing import Any, Callable, Self
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from lsprotocol.types import Location, Position, Range
+from pydantic import TypeAdapter, ValidationError
+
+from confit_lite.registry import REGISTRY, Registry
+
+from .capabilities import FunctionDescription, describe
+from .executor import checkpoint
+from .stats import CacheCounter
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+
+def display_annotation(annotation: Any) -> str | None:
+    """Short representation of an annotation, e.g. for inlay hints."""
+    name = getattr(annotation, "__name__", None)
+
+    if name is None:
+        name = annotation and str(annotation) or None
+
+    return name
+
+
+@cache
+def distribution_version(module: str) -> str | None:
+    """`name==version` of the distribution providing a top-level module."""
+    distributions = packages_distributions().get(module.partition(".")[0])
+
+    if not distributions:
+        return None
+
+    name = distributions[0]
+    return f"{name}=={version(name)}"
+
+
+@dataclass
+class SourceFile:
+    path: str
+    mtime_ns: int
+    size: int
+
+    @classmethod
+    def from_path(cls, path: str) -> Self | None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        return cls(path=path, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+    def is_fresh(self) -> bool:
+        return SourceFile.from_path(self.path) == self
+
+
+@dataclass
+class FieldMetadata:
+    annotation: str
+    """Full representation of the annotation."""
+
+    type_name: str | None
+    """Short representation of the annotation."""
+
+    required: bool
+
+    default: str | None
+    """Representation of the default value, if any."""
+
+
+@dataclass
+class FactoryMetadata:
+    name: str
+    docstring: str | None
+    uri: str
+    range: tuple[int, int, int, int]
+    """Start line, start character, end line, end character."""
+
+    fields: dict[str, FieldMetadata]
+    return_type: str | None
+    module: str | None = None
+    distribution: str | None = None
+    source: SourceFile | None = None
+
+    @property
+    def location(self) -> Location:
+        start_line, start_character, end_line, end_character = self.range
+        return Location(
+            uri=self.uri,
+            range=Range(
+                start=Position(line=start_line, character=start_character),
+                end=Position(line=end_line, character=end_character),
+            ),
+        )
+
+    def is_fresh(self) -> bool:
+        if self.source is None or not self.source.is_fresh():
+            return False
+
+        if self.module is not None:
+            return distribution_version(self.module) == self.distribution
+
+        return True
+
+    @classmethod
+    def from_description(
+        cls,
+        description: FunctionDescription,
+        func: Callable,
+    ) -> Self:
+        location = description.location
+        module = getattr(func, "__module__", None)
+
+        fields = {
+            name: FieldMetadata(
+                annotation=str(info.annotation),
+                type_name=display_annotation(info.annotation),
+                required=info.is_required(),
+                default=None if info.is_required() else repr(info.default),
+            )
+            for name, info in description.input_model.model_fields.items()
+        }
+
+        return cls(
+            name=description.name,
+            docstring=description.docstring,
+            uri=location.uri,
+            range=(
+                location.range.start.line,
+                location.range.start.character,
+                location.range.end.line,
+                location.range.end.character,
+            ),
+            fields=fields,
+            return_type=display_annotation(description.return_type),
+            module=module,
+            distribution=None if module is None else distribution_version(module),
+            source=SourceFile.from_path(url2pathname(urlparse(location.uri).path)),
+        )
+
+
+@dataclass
+class CacheFile:
+    version: int
+    environment: str
+    complete: bool = False
+    """Whether the cache lists every factory in the registry."""
+
+    factories: dict[str, FactoryMetadata] = field(default_factory=dict)
+
+
+CACHE_ADAPTER = TypeAdapter(CacheFile)
+
+
+def environment_fingerprint() -> str:
+    """Identify the interpreter and the set of installed plugins."""
+    plugins = sorted(
+        f"{ep.name}={ep.value}@{ep.dist.version if ep.dist else ''}"
+        for ep in entry_points(group="confit")
+    )
+
+    content = "\n".join(
+        [sys.prefix, os.environ.get("CONFIT_MANIFEST", ""), *plugins]
+    ).encode()
+
+    return hashlib.sha256(content).hexdigest()
+
+
+def default_cache_path() -> Path:
+    root = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    prefix = hashlib.sha256(sys.prefix.encode()).hexdigest()[:16]
+    return Path(root) / "confit-lsp" / f"factories-{prefix}.json"
+
+
+class MetadataStore:
+    """Factory metadata, read from disk when possible and from the registry otherwise.
+
+    Lookups may import and describe factories, and run on the request pool:
+    the store is guarded by a lock. Use `peek` on the event loop.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        registry: Registry = REGISTRY,
+    ):
+        self.path = path
+        """Cache location. The store lives in memory only if `None`."""
+
+        self.registry = registry
+
+        self._cache: CacheFile | None = None
+        self._checked = set[str]()
+        self._dirty = False
+        """Whether the cache changed since it was last written."""
+        self.counter = CacheCounter()
+        self._lock = RLock()
+
+    @property
+    def cache(self) -> CacheFile:
+        if self._cache is None:
+            self._cache = self.read()
+        return self._cache
+
+    def read(self) -> CacheFile:
+        environment = environment_fingerprint()
+        empty = CacheFile(version=CACHE_VERSION, environment=environment)
+
+        if self.path is None or not self.path.exists():
+            return empty
+
+        try:
+            cache = CACHE_ADAPTER.validate_json(self.path.read_bytes())
+        except (OSError, ValidationError):
+            logger.warning("Ignoring invalid metadata cache %s", self.path)
+            return empty
+
+        if cache.version != CACHE_VERSION or cache.environment != environment:
+            return empty
+
+        return cache
+
+    def save(self) -> None:
+        self._dirty = False
+
+        if self.path is None:
+            return
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_bytes(CACHE_ADAPTER.dump_json(self.cache))
+            os.replace(tmp, self.path)
+        except OSError:
+            logger.warning(
+                "Could not write metadata cache %s", self.path, exc_info=True
+            )
+
+    def peek(self, name: Any) -> FactoryMetadata | None:
+        """Get the metadata of a factory if it was checked already, without blocking."""
+        if not isinstance(name, str) or self._cache is None:
+            return None
+
+        if name not in self._checked:
+            return None
+
+        if (metadata := self._cache.factories.get(name)) is not None:
+            self.counter.hits += 1
+
+        return metadata
+
+    def get(self, name: Any, save: bool = True) -> FactoryMetadata | None:
+        """Get the metadata of a factory, importing it only if the cache is stale."""
+        if not isinstance(name, str):
+            return None
+
+        with self._lock:
+            return self._get(name, save)
+
+    def _get(self, name: str, save: bool) -> FactoryMetadata | None:
+        factories = self.cache.factories
+
+        if (metadata := factories.get(name)) is not None:
+            if name in self._checked:
+                self.counter.hits += 1
+                return metadata
+            if metadata.is_fresh():
+                self._checked.add(name)
+                self.counter.hits += 1
+                return metadata
+
+        self.counter.misses += 1
+
+        if (func := self.registry.get(name)) is None:
+            if factories.pop(name, None) is not None:
+                self.changed(save)
+            return None
+
+        try:
+            metadata = FactoryMetadata.from_description(describe(name, func), func)
+        except Exception:
+            logger.warning("Could not describe factory %s", name, exc_info=True)
+            return None
+
+        factories[name] = metadata
+        self._checked.add(name)
+        self.changed(save)
+
+        return metadata
+
+    def changed(self, save: bool) -> None:
+        """Write the cache now, or mark it for the next `save`."""
+        if save:
+            self.save()
+        else:
+            self._dirty = True
+
+    def names(self) -> list[str]:
+        if self.cache.complete:
+            # Trust the cache for plugins that were not imported yet.
+            return sorted(self.cache.factories.keys() | self.registry.names(load=False))
+        return list(self.registry)
+
+    def all(self) -> dict[str, FactoryMetadata]:
+        """Metadata of every factory in the registry."""
+        result = dict[str, FactoryMetadata]()
+
+        with self._lock:
+            names = self.names()
+
+        # Importing every factory takes a while: let other lookups in between.
+        for name in names:
+            checkpoint()
+            if (metadata := self.get(name, save=False)) is not None:
+                result[name] = metadata
+
+        with self._lock:
+            if not self.cache.complete:
+                self.cache.complete = True
+                self._dirty = True
+
+            # Every factory is usually fresh already: avoid rewriting the cache.
+            if self._dirty:
+                self.save()
+
+        return result
+
+    def invalidate(self, *names: str) -> None:
+        """Drop metadata from memory. Drops all of them if no name is given."""
+        with self._lock:
+            if not names:
+                self.cache.factories.clear()
+                self.cache.complete = False
+                self._checked.clear()
+                return
+
+            for name in names:
+                self.cache.factories.pop(name, None)
+                self._checked.discard(name)
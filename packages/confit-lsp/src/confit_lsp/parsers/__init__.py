@@ -1,2 +1,3 @@
 from .types import ConfigurationParser, Element, ElementPath
 from .toml import parse_toml
+from .scanner import TomlParsingError, scan, scan_columns
@@ -0,0 +1,447 @@
+"""Single-pass TOML scanner.
+
+Locates the keys and values of a document in a single sweep, using compiled
+regular expressions rather than parser combinators. The data itself is parsed
+by `rtoml`, which remains the reference for what is valid TOML.
+"""
+
+import logging
+import re
+from array import array
+from bisect import bisect_right
+from sys import intern
+from typing import Any
+
+import rtoml
+from lsprotocol.types import Position, Range
+
+from ..executor import checkpoint
+from .toml import parse_toml
+from .types import MISSING, CompactRange, Element, ElementPath, Kind
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = 1024
+"""Number of lines scanned between cancellation checks."""
+
+NO_RANGE = (MISSING, 0, 0, 0)
+"""Packed range of the rows without a key or a value: array items and table headers."""
+
+
+class TomlParsingError(ValueError):
+    """Raised when the document is not valid TOML."""
+
+
+WHITESPACE = re.compile(r"[ \t]*")
+WHITESPACE_NEWLINES = re.compile(r"(?:[ \t\r\n]+|#[^\n]*)*")
+END_OF_LINE = re.compile(r"[ \t]*(?:#[^\n]*)?(?:\r?\n|\Z)")
+DOT = re.compile(r"[ \t]*\.[ \t]*")
+EQUAL = re.compile(r"[ \t]*=[ \t]*")
+INLINE_EQUAL = re.compile(r"(?:[ \t\r\n]+|#[^\n]*)*=(?:[ \t\r\n]+|#[^\n]*)*")
+TABLE_END = re.compile(r"[ \t]*\]")
+ARRAY_TABLE_END = re.compile(r"[ \t]*\]\]")
+
+BARE_KEY = re.compile(r"[A-Za-z0-9_-]+")
+BASIC_STRING = re.compile(r'"((?:[^"\\\n]|\\.)*)"')
+LITERAL_STRING = re.compile(r"'([^'\n]*)'")
+MULTILINE_BASIC_STRING = re.compile(r'"""((?:[^"\\]|\\.|""?(?!"))*)("{0,2})"""', re.S)
+MULTILINE_LITERAL_STRING = re.compile(r"'''((?:[^']|''?(?!'))*)('{0,2})'''")
+ESCAPE = re.compile(
+    r"\\(?:([btnfre\"\\])|x([0-9a-fA-F]{2})|u([0-9a-fA-F]{4})|U([0-9a-fA-F]{8})|[ \t]*\r?\n[ \t\r\n]*|(.?))",
+    re.S,
+)
+ESCAPES = {
+    "b": "\b",
+    "t": "\t",
+    "n": "\n",
+    "f": "\f",
+    "r": "\r",
+    "e": "\x1b",
+    '"': '"',
+    "\\": "\\",
+}
+
+END_OF_VALUE = r"(?=[\s,\]}#]|\Z)"
+SCALAR = re.compile(
+    r"(?:\d{4}-\d{2}-\d{2}(?:[Tt ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:[Zz]|[+-]\d{2}:\d{2})?)?"
+    r"|\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?"
+    r"|[+-]?(?:inf|nan)|0x[0-9a-fA-F_]+|0o[0-7_]+|0b[01_]+|[+-]?[0-9_]+(?:\.[0-9_]+)?(?:[eE][+-]?[0-9_]+)?"
+    r"|true|false)" + END_OF_VALUE
+)
+"""Span of a date-time, number or boolean. Their validity is checked by `rtoml`."""
+
+SIMPLE_KEY_VALUE = re.compile(
+    r"""
+    [ \t]*
+    (?P<key>[A-Za-z0-9_-]+(?:\.[A-Za-z0-9_-]+)*)
+    [ \t]*=[ \t]*
+    (?P<value>
+        "(?:[^"\\\n]|\\.)*"
+        | '[^'\n]*'
+        | [+-]?[0-9][0-9_.eE+-]*
+        | true | false
+    )
+    [ \t]*(?:\#[^\n]*)?(?:\r?\n|\Z)
+    """,
+    re.X,
+)
+"""Fast path for the most common lines: a bare key, a scalar value and nothing else."""
+
+
+def unescape(content: str) -> str:
+    def replace(match: re.Match[str]) -> str:
+        simple, byte, short, long, invalid = match.groups()
+        if simple is not None:
+            return ESCAPES[simple]
+        if byte is not None:
+            return chr(int(byte, 16))
+        if short is not None:
+            return chr(int(short, 16))
+        if long is not None:
+            return chr(int(long, 16))
+        if invalid is not None:
+            raise TomlParsingError(f"Invalid escape sequence `\\{invalid}`")
+        # Line ending backslash
+        return ""
+
+    if "\\" not in content:
+        return content
+
+    return ESCAPE.sub(replace, content)
+
+
+class Scanner:
+    """Locate the keys and values of a document.
+
+    The document is expected to be valid TOML: the data comes from `rtoml`,
+    and the scanner only tracks enough of the structure to name each element.
+    """
+
+    def __init__(self, content: str, line_offset: int = 0):
+        self.content = content
+        self.line_offset = line_offset
+        self.line_starts = [0]
+        self.line_starts.extend(m.end() for m in re.finditer("\n", content))
+        self.line_starts.append(len(content) + 1)
+
+        # The scan moves forward, so the last line is usually the right one.
+        self.line = 0
+
+        # Ranges are packed as they are found, in the layout of `RangeTable`.
+        self.rows = dict[ElementPath, int]()
+        self.key_columns = array("q")
+        self.value_columns = array("q")
+
+        # Arrays of tables, whose elements cannot be addressed by an `ElementPath`.
+        self.arrays = set[ElementPath]()
+
+    def line_of(self, offset: int) -> int:
+        line = self.line
+        starts = self.line_starts
+
+        if starts[line] <= offset < starts[line + 1]:
+            return line
+
+        # Otherwise, the offset is usually on the next line.
+        line += 1
+        if not starts[line] <= offset < starts[line + 1]:
+            line = bisect_right(starts, offset) - 1
+
+        self.line = line
+        return line
+
+    def record(
+        self,
+        path: ElementPath,
+        key: CompactRange,
+        value: CompactRange = NO_RANGE,
+    ) -> None:
+        """Store the ranges of an element, in the coordinates of `span`."""
+        if (row := self.rows.get(path)) is None:
+            self.rows[path] = len(self.rows)
+            self.key_columns.extend(key)
+            self.value_columns.extend(value)
+        else:
+            row *= 4
+            self.key_columns[row : row + 4] = array("q", key)
+            self.value_columns[row : row + 4] = array("q", value)
+
+    def span(self, start: int, end: int) -> CompactRange:
+        """Range of a span of the content, shifted by the line offset."""
+        starts = self.line_starts
+        offset = self.line_offset
+        start_line = self.line_of(start)
+        end_line = self.line_of(end)
+        return (
+            start_line + offset,
+            start - starts[start_line],
+            end_line + offset,
+            end - starts[end_line],
+        )
+
+    def error(self, message: str, offset: int) -> TomlParsingError:
+        line = self.line_of(offset)
+        character = offset - self.line_starts[line]
+        return TomlParsingError(f"{message} at line {line + 1} column {character + 1}")
+
+    def expect(self, pattern: re.Pattern[str], index: int, what: str) -> int:
+        if (match := pattern.match(self.content, index)) is None:
+            raise self.error(f"Expected {what}", index)
+        return match.end()
+
+    def skip(self, pattern: re.Pattern[str], index: int) -> int:
+        """Skip an optional pattern, e.g. whitespace."""
+        if (match := pattern.match(self.content, index)) is None:
+            return index
+        return match.end()
+
+    def in_array(self, path: ElementPath) -> bool:
+        return any(path[:i] in self.arrays for i in range(1, len(path) + 1))
+
+    def scan(self) -> None:
+        content = self.content
+        length = len(content)
+
+        root: ElementPath = ()
+        addressable = True
+
+        index = 1 if content.startswith("\ufeff") else 0
+        steps = 0
+        while index < length:
+            steps += 1
+            if steps % CHECKPOINT == 0:
+                checkpoint()
+
+            if (match := SIMPLE_KEY_VALUE.match(content, index)) is not None:
+                if addressable:
+                    # Simple lines hold a single key-value pair.
+                    base = self.line_starts[line := self.line_of(index)]
+                    line += self.line_offset
+                    key_start, key_end = match.span("key")
+                    value_start, value_end = match.span("value")
+                    self.record(
+                        root + tuple(map(intern, match.group("key").split("."))),
+                        (line, key_start - base, line, key_end - base),
+                        (line, value_start - base, line, value_end - base),
+                    )
+
+                index = match.end()
+                continue
+
+            index = self.skip(WHITESPACE, index)
+
+            if (match := END_OF_LINE.match(content, index)) is not None:
+                if match.end() == index:
+                    break
+                index = match.end()
+                continue
+
+            if content.startswith("[[", index):
+                root, start, end = self.keys(index + 2)
+                index = self.expect(ARRAY_TABLE_END, end, "`]]`")
+                self.arrays.add(root)
+                addressable = False
+            elif content[index] == "[":
+                root, start, end = self.keys(index + 1)
+                index = self.expect(TABLE_END, end, "`]`")
+                addressable = not self.in_array(root)
+                if addressable:
+                    self.record(root, self.span(start, end))
+            else:
+                keys, start, end = self.keys(index)
+                index = self.expect(EQUAL, end, "`=`")
+                index = self.pair(
+                    root + keys if addressable else None, start, end, index
+                )
+
+            if (match := END_OF_LINE.match(content, index)) is None:
+                raise self.error("Expected a new line", index)
+            index = match.end()
+
+    def key(self, index: int) -> tuple[str, int]:
+        content = self.content
+
+        # Keys are interned, such that paths and tables share their components.
+        if (match := BARE_KEY.match(content, index)) is not None:
+            return intern(match.group()), match.end()
+        if (match := BASIC_STRING.match(content, index)) is not None:
+            return intern(unescape(match.group(1))), match.end()
+        if (match := LITERAL_STRING.match(content, index)) is not None:
+            return intern(match.group(1)), match.end()
+
+        raise self.error("Expected a key", index)
+
+    def keys(self, index: int) -> tuple[ElementPath, int, int]:
+        """Parse a dotted key. Returns the path, and the span of the key."""
+        index = self.skip(WHITESPACE, index)
+        start = index
+
+        key, index = self.key(index)
+        keys = [key]
+
+        while (match := DOT.match(self.content, index)) is not None:
+            key, index = self.key(match.end())
+            keys.append(key)
+
+        return tuple(keys), start, index
+
+    def pair(self, path: ElementPath | None, start: int, end: int, index: int) -> int:
+        """Record a key spanning `[start, end)` and its value starting at `index`.
+
+        Returns the end of the value. Nothing is recorded if `path` is None.
+        """
+        if path is None:
+            return self.value(index)
+
+        key = self.span(start, end)
+
+        if self.content[index] in "[{":
+            # Record the key first, such that rows remain in document order.
+            self.record(path, key)
+
+        value_end = self.value(index, path)
+        self.record(path, key, self.span(index, value_end))
+
+        return value_end
+
+    def value(self, index: int, path: ElementPath | None = None) -> int:
+        """End of the value starting at `index`.
+
+        Elements nested in arrays and inline tables are recorded below `path`,
+        unless it is None.
+        """
+        content = self.content
+        char = content[index : index + 1]
+
+        if char == '"':
+            if (match := MULTILINE_BASIC_STRING.match(content, index)) is not None:
+                return match.end()
+            if (match := BASIC_STRING.match(content, index)) is not None:
+                return match.end()
+        elif char == "'":
+            if (match := MULTILINE_LITERAL_STRING.match(content, index)) is not None:
+                return match.end()
+            if (match := LITERAL_STRING.match(content, index)) is not None:
+                return match.end()
+        elif char == "[":
+            return self.array(index + 1, path)
+        elif char == "{":
+            return self.inline_table(index + 1, path)
+        elif (match := SCALAR.match(content, index)) is not None:
+            return match.end()
+
+        raise self.error("Invalid value", index)
+
+    def array(self, index: int, path: ElementPath | None = None) -> int:
+        content = self.content
+        items = 0
+
+        while True:
+            index = self.skip(WHITESPACE_NEWLINES, index)
+
+            if content.startswith("]", index):
+                return index + 1
+
+            start = index
+
+            # Items have no key. Only strings, which may be references, and
+            # inline tables, which hold keys, are recorded.
+            if path is None or content[index] not in "\"'{":
+                index = self.value(index)
+            else:
+                item = (*path, intern(str(items)))
+                if content[index] == "{":
+                    self.record(item, NO_RANGE)
+                index = self.value(index, item)
+                self.record(item, NO_RANGE, self.span(start, index))
+
+            items += 1
+            index = self.skip(WHITESPACE_NEWLINES, index)
+
+            if content.startswith(",", index):
+                index += 1
+            elif not content.startswith("]", index):
+                raise self.error("Expected `,` or `]`", index)
+
+    def inline_table(self, index: int, path: ElementPath | None = None) -> int:
+        content = self.content
+
+        # Newlines and a trailing comma are allowed, as of TOML 1.1.
+        while True:
+            index = self.skip(WHITESPACE_NEWLINES, index)
+
+            if content.startswith("}", index):
+                return index + 1
+
+            keys, start, end = self.keys(index)
+            index = self.expect(INLINE_EQUAL, end, "`=`")
+            index = self.pair(None if path is None else path + keys, start, end, index)
+            index = self.skip(WHITESPACE_NEWLINES, index)
+
+            if content.startswith(",", index):
+                index += 1
+            elif not content.startswith("}", index):
+                raise self.error("Expected `,` or `}`", index)
+
+
+def scan_columns(
+    content: str,
+    line_offset: int = 0,
+) -> tuple[dict[str, Any], dict[ElementPath, int], array, array]:
+    """Parse a TOML document, returning its data and its packed element ranges.
+
+    The data is parsed by `rtoml`, which also rejects invalid documents.
+    Ranges are packed four integers per row, as expected by `RangeTable`.
+    """
+    try:
+        data = rtoml.loads(content)
+    except rtoml.TomlParsingError as e:
+        raise TomlParsingError(str(e)) from None
+
+    checkpoint()
+    scanner = Scanner(content, line_offset)
+
+    try:
+        scanner.scan()
+    except TomlParsingError as e:
+        # Valid syntax the scanner does not know about: locate what we can.
+        logger.debug("Falling back to the slow parser: %s", e)
+
+        scanner = Scanner(content, line_offset)
+        for kind, element in parse_toml(content):
+            location = element.location
+            compact = (
+                location.start.line + line_offset,
+                location.start.character,
+                location.end.line + line_offset,
+                location.end.character,
+            )
+            if kind == "key":
+                scanner.record(element.path, compact)
+            else:
+                row = 4 * scanner.rows[element.path]
+                scanner.value_columns[row : row + 4] = array("q", compact)
+
+    return data, scanner.rows, scanner.key_columns, scanner.value_columns
+
+
+def scan(content: str) -> tuple[dict[str, Any], list[tuple[Kind, Element]]]:
+    """Parse a TOML document, returning both its data and its elements."""
+    data, rows, keys, values = scan_columns(content)
+    elements = list[tuple[Kind, Element]]()
+
+    for path, row in rows.items():
+        row *= 4
+        if keys[row] != MISSING:
+            elements.append(("key", Element(path=path, location=expand(keys, row))))
+        if values[row] != MISSING:
+            elements.append(("value", Element(path=path, location=expand(values, row))))
+
+    return data, elements
+
+
+def expand(columns: array, row: int) -> Range:
+    return Range(
+        start=Position(line=columns[row], character=columns[row + 1]),
+        end=Position(line=columns[row + 2], character=columns[row + 3]),
+    )
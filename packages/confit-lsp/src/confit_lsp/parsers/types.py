@@ -22,6 +22,13 @@ class Element:
 
 Kind = Literal["key", "value"]
 
+CompactRange = tuple[int, int, int, int]
+"""Start line, start character, end line, end character."""
+
+MISSING = -1
+"""Start line of the rows that have no range, e.g. table headers have no value and
+array items no key."""
+
 
 class ConfigurationParser(Protocol):
     """The protocol configuration parsers should adhere to."""
@@ -0,0 +1,203 @@
+"""Compact storage of element ranges.
+
+A `Range` holds two `Position` objects, which adds up to several hundred bytes
+per element once keys and values are indexed. Tables below pack ranges into an
+integer array instead - four columns per row - and only materialize `Range`
+objects when a response needs them.
+
+Keys and values of a document share their paths: each path is stored once,
+along with its row in the columns. Table headers have no value, and array items
+no key.
+"""
+
+from array import array
+from bisect import bisect_left
+from itertools import chain, islice
+from collections.abc import Iterator, Mapping
+from typing import Self
+
+from lsprotocol.types import Position, Range
+
+from .parsers import ElementPath
+from .parsers.types import MISSING, CompactRange
+
+
+def expand(location: CompactRange) -> Range:
+    start_line, start_character, end_line, end_character = location
+    return Range(
+        start=Position(line=start_line, character=start_character),
+        end=Position(line=end_line, character=end_character),
+    )
+
+
+def pack(line: int, character: int) -> int:
+    """A position as a single integer, ordered like `(line, character)`."""
+    return line << 32 | character
+
+
+class RangeTable(Mapping[ElementPath, Range]):
+    """Read-only mapping of paths to ranges, packed in integer columns."""
+
+    __slots__ = ("rows", "columns", "size")
+
+    def __init__(self, rows: dict[ElementPath, int], columns: array, size: int):
+        self.rows = rows
+        """Row of each path. May be shared with other tables."""
+
+        self.columns = columns
+        """Start line, start character, end line and end character of each row."""
+
+        self.size = size
+        """Number of rows that have a range."""
+
+    @classmethod
+    def from_columns(
+        cls,
+        rows: dict[ElementPath, int],
+        keys: array,
+        values: array,
+    ) -> tuple[Self, Self]:
+        """Wrap columns packed by the scanner into two tables sharing their paths."""
+        return cls(rows, keys, count(keys)), cls(rows, values, count(values))
+
+    def __getitem__(self, path: ElementPath) -> Range:
+        return expand(self.compact(path))
+
+    def compact(self, path: ElementPath) -> CompactRange:
+        row = 4 * self.rows[path]
+        start_line, start_character, end_line, end_character = self.columns[
+            row : row + 4
+        ]
+
+        if start_line == MISSING:
+            raise KeyError(path)
+
+        return start_line, start_character, end_line, end_character
+
+    def __contains__(self, path: object) -> bool:
+        row = self.rows.get(path)  # type: ignore[arg-type]
+        return row is not None and self.columns[4 * row] != MISSING
+
+    def __iter__(self) -> Iterator[ElementPath]:
+        columns = self.columns
+        for path, row in self.rows.items():
+            if columns[4 * row] != MISSING:
+                yield path
+
+    def __len__(self) -> int:
+        return self.size
+
+    def compact_items(self) -> Iterator[tuple[ElementPath, CompactRange]]:
+        """Iterate over the ranges without materializing `Range` objects."""
+        columns = self.columns
+        for path, row in self.rows.items():
+            row *= 4
+            if columns[row] != MISSING:
+                yield path, tuple(columns[row : row + 4])  # type: ignore[misc]
+
+    def points(self) -> tuple[array, array]:
+        """Packed start and end positions of each row, in row order.
+
+        Rows without a range get `MISSING` points.
+        """
+        columns = self.columns
+        starts, ends = array("q"), array("q")
+
+        for i in range(0, len(columns), 4):
+            if columns[i] == MISSING:
+                starts.append(MISSING)
+                ends.append(MISSING)
+            else:
+                starts.append(pack(columns[i], columns[i + 1]))
+                ends.append(pack(columns[i + 2], columns[i + 3]))
+
+        return starts, ends
+
+
+def count(columns: array) -> int:
+    """Number of rows that have a range."""
+    return len(columns) // 4 - columns[0::4].count(MISSING)
+
+
+def shift(columns: array, lines: int) -> None:
+    """Shift rows by a number of lines, in place. Rows without a range are left as is."""
+    if not lines:
+        return
+
+    starts = columns[0::4]
+    shifted_starts = array("q", [line + lines for line in starts])
+    shifted_ends = array("q", [line + lines for line in columns[2::4]])
+
+    row = -1
+    while (row := find(starts, MISSING, row + 1)) >= 0:
+        shifted_starts[row] = MISSING
+        shifted_ends[row] = 0
+
+    columns[0::4] = shifted_starts
+    columns[2::4] = shifted_ends
+
+
+def find(columns: array, value: int, start: int) -> int:
+    """Index of the next occurrence of a value, or -1."""
+    try:
+        return columns.index(value, start)
+    except ValueError:
+        return -1
+
+
+def patch_tables(
+    keys: RangeTable,
+    values: RangeTable,
+    region: tuple[RangeTable, RangeTable],
+    start: int,
+    stop: int,
+    delta: int,
+) -> tuple[RangeTable, RangeTable, list[ElementPath]]:
+    """Replace the elements whose key starts within `[start, stop)` by the region ones.
+
+    Elements after the region are shifted by `delta` lines. Returns the
+    patched tables, and the paths that were dropped.
+
+    Rows are expected in document order, such that the elements before and
+    after the region are copied in bulk.
+    """
+    region_keys, region_values = region
+
+    def line(row: int) -> int:
+        row *= 4
+        line = keys.columns[row]
+        # Array items have no key.
+        return values.columns[row] if line == MISSING else line
+
+    rows = range(len(keys.rows))
+    lo = bisect_left(rows, start, key=line)
+    hi = bisect_left(rows, stop, lo=lo, key=line)
+
+    removed = list(islice(keys.rows, lo, hi))
+
+    if list(region_keys.rows) == removed:
+        # Values were edited in place: rows are unchanged.
+        patched = keys.rows
+    else:
+        paths = chain(
+            islice(keys.rows, lo),
+            region_keys.rows,
+            islice(keys.rows, hi, None),
+        )
+        size = len(keys.rows) - len(removed) + len(region_keys.rows)
+        patched = dict(zip(paths, range(size)))
+
+    tables = list[RangeTable]()
+
+    for table, replacement in [(keys, region_keys), (values, region_values)]:
+        columns = table.columns[: 4 * lo]
+        columns += replacement.columns
+
+        after = table.columns[4 * hi :]
+        shift(after, delta)
+        columns += after
+
+        size = table.size - count(table.columns[4 * lo : 4 * hi]) + replacement.size
+        tables.append(RangeTable(patched, columns, size))
+
+    return tables[0], tables[1], removed
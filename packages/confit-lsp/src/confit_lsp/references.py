@@ -0,0 +1,141 @@
+"""Reverse lookups of in-document references, for find-references and rename."""
+
+import re
+from dataclasses import dataclass
+from typing import Self, Sequence
+
+from lsprotocol.types import Position, Range, TextEdit
+
+from .parsers import ElementPath
+from .ranges import RangeTable
+
+KEY_COMPONENT = re.compile(r"\"(?:[^\"\\]|\\.)*\"|'[^']*'|[A-Za-z0-9_-]+")
+"""A component of a dotted key, as written in the document."""
+
+BARE_KEY = re.compile(r"[A-Za-z0-9_-]+")
+
+
+@dataclass
+class ReferenceIndex:
+    """Referencing paths, by target path and by every prefix of the target.
+
+    A reference to `$a.b.c` points within `a` and `a.b`, which matters when
+    renaming either of them.
+    """
+
+    references: dict[ElementPath, ElementPath]
+    """Reference path to target path."""
+
+    within: dict[ElementPath, list[ElementPath]]
+    """Target path, or prefix of a target path, to the references pointing within it."""
+
+    @classmethod
+    def build(cls, references: dict[ElementPath, ElementPath]) -> Self:
+        within = dict[ElementPath, list[ElementPath]]()
+
+        for source, target in references.items():
+            for i in range(1, len(target) + 1):
+                within.setdefault(target[:i], []).append(source)
+
+        return cls(references=references, within=within)
+
+    def referencing(
+        self, target: ElementPath, nested: bool = True
+    ) -> list[ElementPath]:
+        """References pointing to a path, or within it if `nested`."""
+        sources = self.within.get(target, [])
+
+        if nested:
+            return sources
+
+        return [source for source in sources if self.references[source] == target]
+
+
+def component_range(
+    location: Range,
+    text: str,
+    offset: int,
+    index: int,
+) -> Range | None:
+    """Range of the `index`-th dotted component, within text starting at `offset`."""
+    for i, match in enumerate(KEY_COMPONENT.finditer(text)):
+        if i == index:
+            line = location.start.line
+            return Range(
+                start=Position(line=line, character=offset + match.start()),
+                end=Position(line=line, character=offset + match.end()),
+            )
+
+    return None
+
+
+def line_text(lines: Sequence[str], location: Range) -> str | None:
+    """Text of a single-line range."""
+    if location.start.line != location.end.line or location.start.line >= len(lines):
+        return None
+
+    return lines[location.start.line][location.start.character : location.end.character]
+
+
+def rename_edits(
+    keys: RangeTable,
+    values: RangeTable,
+    index: ReferenceIndex,
+    lines: Sequence[str],
+    path: ElementPath,
+    name: str,
+) -> list[TextEdit]:
+    """Edits renaming the last component of a path, in keys and references.
+
+    Keys are renamed wherever the component is written: table headers and
+    dotted keys of nested elements included.
+    """
+    depth = len(path) - 1
+    edits = dict[tuple[int, int], TextEdit]()
+
+    for key in keys:
+        if key[: len(path)] != path:
+            continue
+
+        location = keys[key]
+
+        if (text := line_text(lines, location)) is None:
+            continue
+
+        # The key only spells the last components of its path.
+        written = len(KEY_COMPONENT.findall(text))
+        first = len(key) - written
+
+        if depth < first:
+            continue
+
+        edit_range = component_range(
+            location, text, location.start.character, depth - first
+        )
+
+        if edit_range is not None:
+            edits[edit_range.start.line, edit_range.start.character] = TextEdit(
+                range=edit_range, new_text=name
+            )
+
+    for source in index.referencing(path):
+        location = values[source]
+        text = line_text(lines, location)
+
+        # Only plain strings, e.g. `"$a.b"`, can be edited in place.
+        if text is None or not re.fullmatch(r"([\"'])\$[A-Za-z0-9_.-]+\1", text):
+            continue
+
+        edit_range = component_range(
+            location,
+            text[2:-1],
+            location.start.character + 2,
+            depth,
+        )
+
+        if edit_range is not None:
+            edits[edit_range.start.line, edit_range.start.character] = TextEdit(
+                range=edit_range, new_text=name
+            )
+
+    return list(edits.values())
@@ -0,0 +1,184 @@
+"""Hot reload of the modules behind registered factories.
+
+The source files of imported factories are polled for changes. A changed
+module is re-imported on its own - which registers its factories again - and
+the registry is compared to its previous state, such that only the caches and
+documents depending on the affected factories are refreshed.
+"""
+
+import importlib
+import inspect
+import logging
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from confit_lite.registry import REGISTRY, Registry
+
+from .descriptor import ConfigurationView
+from .metadata import SourceFile
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RegistryDiff:
+    added: set[str] = field(default_factory=set)
+    removed: set[str] = field(default_factory=set)
+
+    changed: set[str] = field(default_factory=set)
+    """Factories registered again with a different signature."""
+
+    updated: set[str] = field(default_factory=set)
+    """Factories registered again with the same signature, e.g. a new docstring."""
+
+    @property
+    def names(self) -> set[str]:
+        """Every affected factory."""
+        return self.added | self.removed | self.changed | self.updated
+
+    @property
+    def validation(self) -> set[str]:
+        """Factories whose diagnostics may have changed."""
+        return self.added | self.removed | self.changed
+
+    def __bool__(self) -> bool:
+        return bool(self.names)
+
+
+def signature(func: Callable) -> str | None:
+    try:
+        return str(inspect.signature(func))
+    except (TypeError, ValueError):
+        return None
+
+
+def compare(
+    before: dict[str, Callable],
+    after: dict[str, Callable],
+) -> RegistryDiff:
+    diff = RegistryDiff(
+        added=after.keys() - before.keys(),
+        removed=before.keys() - after.keys(),
+    )
+
+    for name in before.keys() & after.keys():
+        if after[name] is before[name]:
+            continue
+
+        if signature(after[name]) != signature(before[name]):
+            diff.changed.add(name)
+        else:
+            diff.updated.add(name)
+
+    return diff
+
+
+def factory_names(view: ConfigurationView) -> set[str]:
+    """Names of the factories a document uses."""
+    names = set[str]()
+
+    for path in view.factories():
+        name = view.get_value((*path, "factory"))
+        if isinstance(name, str):
+            names.add(name)
+
+    return names
+
+
+def lookup(module: Any, qualname: str) -> Any:
+    obj = module
+
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr, None)
+
+    return obj
+
+
+class FactoryReloader:
+    """Watch the modules of imported factories, and reload them on change."""
+
+    def __init__(self, registry: Registry = REGISTRY):
+        self.registry = registry
+
+        self._sources = dict[str, SourceFile]()
+        """State of each watched source file."""
+
+        self._modules = dict[str, str]()
+        """Module defined by each watched source file."""
+
+    def track(self) -> None:
+        """Watch the source files of the factories imported since the last call."""
+        watched = set(self._modules.values())
+
+        for func in self.registry.loaded().values():
+            module = getattr(func, "__module__", None)
+
+            if module is None or module in watched:
+                continue
+
+            watched.add(module)
+
+            try:
+                path = inspect.getsourcefile(func)
+            except TypeError:
+                continue
+
+            if path is None or (source := SourceFile.from_path(path)) is None:
+                continue
+
+            self._sources[path] = source
+            self._modules[path] = module
+
+    def changed(self) -> list[str]:
+        """Modules whose source file changed since the last call."""
+        modules = list[str]()
+
+        for path, source in list(self._sources.items()):
+            current = SourceFile.from_path(path)
+
+            # Missing files are usually being saved: check again later.
+            if current is None or current == source:
+                continue
+
+            self._sources[path] = current
+            modules.append(self._modules[path])
+
+        return modules
+
+    def poll(self) -> list[str]:
+        self.track()
+        return self.changed()
+
+    def reload(self, name: str) -> RegistryDiff:
+        """Re-import a module, and report how the registry changed.
+
+        Factories defined in the module but registered elsewhere are bound to
+        their new definition. Factories that are no longer defined are removed.
+        """
+        if (module := sys.modules.get(name)) is None:
+            return RegistryDiff()
+
+        before = self.registry.loaded()
+
+        importlib.reload(module)
+
+        after = self.registry.loaded()
+
+        for factory, func in before.items():
+            if (
+                getattr(func, "__module__", None) != name
+                or after.get(factory) is not func
+            ):
+                continue
+
+            # Reloading keeps the previous attributes of the module around.
+            new = lookup(module, func.__qualname__)
+
+            if callable(new) and new is not func:
+                self.registry[factory] = new
+            else:
+                logger.info("Factory %s is no longer defined in %s", factory, name)
+                del self.registry[factory]
+
+        return compare(before, self.registry.loaded())
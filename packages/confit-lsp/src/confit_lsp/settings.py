@@ -0,0 +1,79 @@
+import logging
+import os
+from typing import Any, Self
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from pydantic.alias_generators import to_camel
+
+logger = logging.getLogger(__name__)
+
+
+class Settings(BaseModel):
+    """Server settings, provided by the client through `initializationOptions`.
+
+    Keys are expected in camel case, e.g. `{"maxViews": 64}`. Logging settings
+    default to the `CONFIT_LSP_LOG_*` environment variables, such that they
+    apply before the client sends its options.
+    """
+
+    model_config = ConfigDict(
+        alias_generator=to_camel,
+        populate_by_name=True,
+        extra="ignore",
+    )
+
+    max_views: int = 32
+    """Maximum number of parsed documents kept in memory."""
+
+    max_completions: int = 100
+    """Maximum number of completion items per response, refined as the user types."""
+
+    metadata_cache: bool = True
+    """Whether to persist factory metadata to the user cache directory."""
+
+    workspace_index: bool = True
+    """Whether to index every `.toml` file in the workspace folders."""
+
+    index_workers: int | None = None
+    """Number of processes used to index the workspace. Defaults to the CPU count."""
+
+    request_workers: int = 2
+    """Number of threads parsing documents and describing factories for requests."""
+
+    reload_interval: float | None = 1.0
+    """Seconds between checks of the factory sources for changes. Disabled if `None`."""
+
+    stats_file: str | None = None
+    """JSON lines file where `confit.stats` snapshots are appended, if any."""
+
+    log_level: str = Field(
+        default_factory=lambda: os.environ.get("CONFIT_LSP_LOG_LEVEL", "WARNING")
+    )
+
+    log_file: str | None = Field(
+        default_factory=lambda: os.environ.get("CONFIT_LSP_LOG_FILE")
+    )
+    """Log destination. Logs go to stderr if unset."""
+
+    log_max_bytes: int = 10 * 2**20
+    """Size at which the log file is rotated."""
+
+    log_backups: int = 3
+    """Number of rotated log files to keep."""
+
+    log_to_client: bool = False
+    """Whether to forward logs to the client through `window/logMessage`."""
+
+    @classmethod
+    def from_options(cls, options: Any) -> Self:
+        """Read settings from initialization options, falling back to defaults."""
+        if not isinstance(options, dict):
+            return cls()
+
+        try:
+            return cls.model_validate(options)
+        except ValidationError:
+            logger.warning(
+                "Invalid initialization options, using defaults.", exc_info=True
+            )
+            return cls()
@@ -0,0 +1,199 @@
+"""Lightweight instrumentation: latency histograms and cache counters.
+
+Statistics are kept in memory, and retrieved through the `confit.stats`
+command. Recording is cheap enough to stay enabled at all times.
+"""
+
+import functools
+import inspect
+import json
+import sys
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable
+
+BUCKETS = [1e-5 * 2**i for i in range(24)]
+"""Upper bounds of the histogram buckets, in seconds: from 10 µs to about 80 s."""
+
+
+@dataclass
+class Histogram:
+    """Latency histogram, with logarithmic buckets."""
+
+    counts: list[int] = field(default_factory=lambda: [0] * (len(BUCKETS) + 1))
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def record(self, elapsed: float) -> None:
+        self.counts[bisect_left(BUCKETS, elapsed)] += 1
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the `q` quantile."""
+        rank = q * self.count
+        seen = 0
+
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def summary(self) -> dict[str, Any]:
+        if self.count == 0:
+            return dict(count=0)
+
+        return dict(
+            count=self.count,
+            mean_ms=self.total / self.count * 1e3,
+            p50_ms=self.percentile(0.5) * 1e3,
+            p90_ms=self.percentile(0.9) * 1e3,
+            p99_ms=self.percentile(0.99) * 1e3,
+            max_ms=self.max * 1e3,
+        )
+
+
+@dataclass
+class CacheCounter:
+    hits: int = 0
+    misses: int = 0
+
+    def summary(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=self.hits / total if total else None,
+        )
+
+
+class Stats:
+    """Statistics for the whole server. Safe to update from worker threads."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.handlers = defaultdict[str, Histogram](Histogram)
+        """Latency by request or notification handler."""
+
+        self.documents = defaultdict[str, defaultdict[str, Histogram]](
+            lambda: defaultdict(Histogram)
+        )
+        """Latency by document, then by operation (e.g. parse, validate)."""
+
+        self._lock = Lock()
+
+    def record(self, handler: str, elapsed: float) -> None:
+        with self._lock:
+            self.handlers[handler].record(elapsed)
+
+    def record_document(self, uri: str, operation: str, elapsed: float) -> None:
+        with self._lock:
+            self.documents[uri][operation].record(elapsed)
+
+    def forget(self, uri: str) -> None:
+        with self._lock:
+            self.documents.pop(uri, None)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self.handlers.clear()
+            self.documents.clear()
+
+    def snapshot(self, **extra: Any) -> dict[str, Any]:
+        """JSON-serializable summary, along with additional entries."""
+        with self._lock:
+            return dict(
+                timestamp=time.time(),
+                uptime_s=time.time() - self.started,
+                handlers={
+                    name: histogram.summary()
+                    for name, histogram in sorted(self.handlers.items())
+                },
+                documents={
+                    uri: {
+                        operation: histogram.summary()
+                        for operation, histogram in operations.items()
+                    }
+                    for uri, operations in sorted(self.documents.items())
+                },
+                **extra,
+            )
+
+
+def export(snapshot: dict[str, Any], path: str | Path) -> None:
+    """Append a snapshot to a JSON lines file."""
+    with open(path, "a") as f:
+        f.write(json.dumps(snapshot) + "\n")
+
+
+def deep_size(obj: Any) -> int:
+    """Approximate memory footprint of an object graph, in bytes."""
+    seen = set[int]()
+    size = 0
+    stack = [obj]
+
+    while stack:
+        item = stack.pop()
+
+        if id(item) in seen:
+            continue
+
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__slots__"):
+            stack.extend(
+                getattr(item, slot)
+                for slot in item.__slots__
+                if hasattr(item, slot) and slot != "__weakref__"
+            )
+        elif hasattr(item, "__dict__"):
+            stack.append(vars(item))
+
+    return size
+
+
+def instrument(name: str) -> Callable[[Callable], Callable]:
+    """Record the latency of a handler whose first argument is the server.
+
+    The server is expected to expose a `Stats` object as `stats`.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(ls, *args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(ls, *args, **kwargs)
+                finally:
+                    ls.stats.record(name, time.perf_counter() - start)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(ls, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(ls, *args, **kwargs)
+            finally:
+                ls.stats.record(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
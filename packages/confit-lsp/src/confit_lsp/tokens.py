@@ -0,0 +1,204 @@
+"""Semantic tokens, encoded from the packed ranges of a view.
+
+Elements are walked in document order through the element index, and
+classified from the table they belong to: factory names, argument keys
+(flagged if the factory does not accept them) and references get their own
+token types. The last token array sent for each document is cached, such that
+delta requests only send the span that changed.
+"""
+
+from itertools import count
+from typing import Any, Iterable, Sequence
+
+from lsprotocol.types import Position, SemanticTokensEdit, SemanticTokensLegend
+
+from .descriptor import ConfigurationView
+from .executor import checkpoint
+from .metadata import MetadataStore
+from .parsers import ElementPath
+from .ranges import MISSING
+
+TOKEN_TYPES = ["namespace", "property", "parameter", "keyword", "function", "variable"]
+NAMESPACE, PROPERTY, PARAMETER, KEYWORD, FUNCTION, VARIABLE = range(len(TOKEN_TYPES))
+
+TOKEN_MODIFIERS = ["unknown"]
+UNKNOWN = 1
+"""Modifier of the arguments that the factory does not accept."""
+
+LEGEND = SemanticTokensLegend(token_types=TOKEN_TYPES, token_modifiers=TOKEN_MODIFIERS)
+
+CHUNK = 1024
+"""Number of integers compared at once when looking for the changed span."""
+
+CHECKPOINT = 1024
+"""Number of keys encoded between cancellation checks."""
+
+
+def table_factory(
+    view: ConfigurationView,
+    path: ElementPath,
+    metadata: MetadataStore,
+) -> tuple[str | None, Any]:
+    """Factory of a table if any, along with the arguments it accepts if known."""
+    try:
+        table = view.get_object(path)
+    except (KeyError, TypeError, IndexError):
+        return None, None
+
+    if not isinstance(table, dict) or not isinstance(name := table.get("factory"), str):
+        return None, None
+
+    factory = metadata.get(name)
+
+    return name, None if factory is None else factory.fields
+
+
+def encode(
+    view: ConfigurationView,
+    metadata: MetadataStore,
+    start: Position | None = None,
+    end: Position | None = None,
+) -> list[int]:
+    """Relative-encoded tokens of the document, or of the elements overlapping a range.
+
+    Tokens spanning several lines are skipped.
+    """
+    index = view.element_index
+    items = index.items
+    rows = view.keys.rows
+    keys = view.keys.columns
+    values = view.values.columns
+    references = view.references
+
+    indices: Iterable[int]
+    if start is None or end is None:
+        indices = range(len(index))
+    else:
+        indices = index.indices(start, end)
+
+    # Table each parent path belongs to - dotted keys define nested tables
+    # that have no row - along with its factory.
+    tables = dict[ElementPath, tuple[int, str | None, Any]]()
+    data = list[int]()
+    previous_line = previous_character = 0
+
+    def emit(line: int, character: int, length: int, kind: int, modifiers: int):
+        nonlocal previous_line, previous_character
+
+        if line < previous_line or (
+            line == previous_line and character < previous_character
+        ):
+            return
+
+        delta = character - previous_character if line == previous_line else character
+        data.extend((line - previous_line, delta, length, kind, modifiers))
+        previous_line, previous_character = line, character
+
+    for n, i in enumerate(indices):
+        if n % CHECKPOINT == 0:
+            checkpoint()
+
+        path = items[i]
+        row = 4 * rows[path]
+        parent = path[:-1]
+
+        if (table := tables.get(parent)) is None:
+            depth = len(parent)
+            while depth and parent[:depth] not in rows:
+                depth -= 1
+            table = tables[parent] = (
+                depth,
+                *table_factory(view, parent[:depth], metadata),
+            )
+
+        depth, factory, accepted = table
+        key = path[depth]
+        value_line = values[row]
+
+        if keys[row] != MISSING:
+            modifiers = 0
+
+            if value_line == MISSING:
+                kind = NAMESPACE
+            elif factory is None:
+                kind = PROPERTY
+            elif key == "factory":
+                kind = KEYWORD
+            else:
+                kind = PARAMETER
+                if accepted is not None and key not in accepted:
+                    modifiers = UNKNOWN
+
+            if keys[row] == keys[row + 2]:
+                length = keys[row + 3] - keys[row + 1]
+                emit(keys[row], keys[row + 1], length, kind, modifiers)
+
+        if value_line == MISSING or values[row + 2] != value_line:
+            continue
+
+        if path in references:
+            kind = VARIABLE
+        elif key == "factory" and factory is not None and len(path) == depth + 1:
+            kind = FUNCTION
+        else:
+            continue
+
+        emit(value_line, values[row + 1], values[row + 3] - values[row + 1], kind, 0)
+
+    return data
+
+
+def common_prefix(a: Sequence[int], b: Sequence[int]) -> int:
+    """Length of the common prefix of two sequences, comparing chunks at once."""
+    n = min(len(a), len(b))
+    i = 0
+
+    while i + CHUNK <= n and a[i : i + CHUNK] == b[i : i + CHUNK]:
+        i += CHUNK
+
+    while i < n and a[i] == b[i]:
+        i += 1
+
+    return i
+
+
+def token_edits(previous: list[int], current: list[int]) -> list[SemanticTokensEdit]:
+    """A single edit replacing the span that differs between two token arrays."""
+    prefix = common_prefix(previous, current)
+
+    if prefix == len(previous) == len(current):
+        return []
+
+    # Compare the remaining spans backwards, without overlapping the prefix.
+    suffix = common_prefix(previous[prefix:][::-1], current[prefix:][::-1])
+
+    return [
+        SemanticTokensEdit(
+            start=prefix,
+            delete_count=len(previous) - prefix - suffix,
+            data=current[prefix : len(current) - suffix],
+        )
+    ]
+
+
+class TokenCache:
+    """Last token array sent for each document, along with its result ID."""
+
+    def __init__(self):
+        self._tokens = dict[str, tuple[str, list[int]]]()
+        self._ids = count()
+
+    def get(self, uri: str, result_id: str) -> list[int] | None:
+        match self._tokens.get(uri):
+            case (cached_id, data) if cached_id == result_id:
+                return data
+            case _:
+                return None
+
+    def put(self, uri: str, data: list[int]) -> str:
+        result_id = str(next(self._ids))
+        self._tokens[uri] = (result_id, data)
+        return result_id
+
+    def pop(self, uri: str) -> None:
+        self._tokens.pop(uri, None)
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import RLock
+
+from .descriptor import ConfigurationView
+from .stats import CacheCounter
+
+
+@dataclass
+class CachedView:
+    version: int | None
+    """Document version the view was built from."""
+
+    source: str
+    """Document content the view was built from, used to replay incremental edits."""
+
+    view: ConfigurationView
+
+
+class ViewCache:
+    """Least-recently-used cache of parsed documents, keyed by URI and version.
+
+    Documents are parsed on the request pool, hence the lock.
+    """
+
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        self._entries = OrderedDict[str, CachedView]()
+        self.counter = CacheCounter()
+        self._lock = RLock()
+
+    def __contains__(self, uri: str) -> bool:
+        return uri in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entries(self) -> list[CachedView]:
+        with self._lock:
+            return list(self._entries.values())
+
+    def items(self) -> list[tuple[str, CachedView]]:
+        with self._lock:
+            return list(self._entries.items())
+
+    def get(self, uri: str) -> CachedView | None:
+        """Get the latest view of a document, regardless of its version."""
+        with self._lock:
+            entry = self._entries.get(uri)
+
+            if entry is not None:
+                self._entries.move_to_end(uri)
+
+            return entry
+
+    def lookup(
+        self, uri: str, version: int | None, source: str
+    ) -> ConfigurationView | None:
+        """Get the view of a document, if it is up to date.
+
+        Documents are identified by their version. Unversioned documents
+        fall back to comparing the content.
+        """
+        entry = self.get(uri)
+
+        if entry is None:
+            view = None
+        elif version is None or entry.version is None:
+            view = entry.view if entry.source == source else None
+        else:
+            view = entry.view if entry.version == version else None
+
+        if view is None:
+            self.counter.misses += 1
+        else:
+            self.counter.hits += 1
+
+        return view
+
+    def put(
+        self,
+        uri: str,
+        version: int | None,
+        source: str,
+        view: ConfigurationView,
+    ) -> None:
+        """Cache a view, unless a newer version of the document is cached already.
+
+        A view parsed off the loop may complete after the next edit was applied.
+        """
+        with self._lock:
+            entry = self._entries.get(uri)
+
+            if (
+                entry is not None
+                and entry.version is not None
+                and version is not None
+                and entry.version > version
+            ):
+                return
+
+            self._entries[uri] = CachedView(version=version, source=source, view=view)
+            self._entries.move_to_end(uri)
+            self.evict()
+
+    def pop(self, uri: str) -> CachedView | None:
+        with self._lock:
+            return self._entries.pop(uri, None)
+
+    def resize(self, max_size: int) -> None:
+        with self._lock:
+            self.max_size = max_size
+            self.evict()
+
+    def evict(self) -> None:
+        with self._lock:
+            while len(self._entries) > max(self.max_size, 0):
+                self._entries.popitem(last=False)
@@ -0,0 +1,211 @@
+"""Workspace-wide index of configuration files.
+
+Files are parsed into compact, picklable indexes - such that they can be built
+by a process pool - holding what cross-file features need: the factories each
+file uses, and where.
+"""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Mapping, Self
+
+from lsprotocol.types import FileChangeType, FileEvent, Location
+from pygls.uris import from_fs_path, to_fs_path
+
+from .descriptor import ConfigurationView
+from .parsers import ElementPath
+from .ranges import CompactRange, expand
+
+logger = logging.getLogger(__name__)
+
+EXCLUDED_DIRECTORIES = frozenset({"node_modules", "__pycache__", "site-packages"})
+"""Directories that are never searched for configuration files, along with hidden ones."""
+
+PARALLEL_THRESHOLD = 64
+"""Below this number of files, a process pool costs more than it saves."""
+
+START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+"""How index workers are started. Forking the server would copy its threads' locks."""
+
+Progress = Callable[[int, int], None]
+"""Called with the number of indexed files and the total."""
+
+
+@dataclass
+class FileIndex:
+    uri: str
+    mtime_ns: int
+
+    factories: dict[ElementPath, str]
+    """Factory name by object path."""
+
+    locations: dict[ElementPath, CompactRange]
+    """Range of the factory name by object path, for usages."""
+
+    error: str | None = None
+    """Parsing error, if the file is not valid TOML."""
+
+    @classmethod
+    def from_view(cls, uri: str, view: ConfigurationView, mtime_ns: int = 0) -> Self:
+        factories = dict[ElementPath, str]()
+        locations = dict[ElementPath, CompactRange]()
+
+        for path in view.factories():
+            name = view.get_value((*path, "factory"))
+            if isinstance(name, str) and (*path, "factory") in view.values:
+                factories[path] = name
+                locations[path] = view.values.compact((*path, "factory"))
+
+        return cls(
+            uri=uri,
+            mtime_ns=mtime_ns,
+            factories=factories,
+            locations=locations,
+        )
+
+    def usages(self, factory_name: str) -> Iterator[Location]:
+        """Locations of the values that instantiate a factory."""
+        for path, name in self.factories.items():
+            if name == factory_name:
+                yield Location(uri=self.uri, range=expand(self.locations[path]))
+
+
+def index_file(path: str, uri: str | None = None) -> FileIndex:
+    """Parse and index a single file. Runs in worker processes."""
+    uri = uri or from_fs_path(os.path.abspath(path)) or Path(path).absolute().as_uri()
+
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+        source = Path(path).read_text(encoding="utf-8")
+        view = ConfigurationView.from_source(source)
+    except (OSError, ValueError) as e:
+        return FileIndex(
+            uri=uri,
+            mtime_ns=0,
+            factories={},
+            locations={},
+            error=str(e),
+        )
+
+    return FileIndex.from_view(uri, view, mtime_ns)
+
+
+def discover(roots: Iterable[str]) -> list[str]:
+    """Find the `.toml` files under the given directories."""
+    paths = list[str]()
+
+    for root in roots:
+        for directory, directories, files in os.walk(root):
+            directories[:] = [
+                d
+                for d in directories
+                if not d.startswith(".") and d not in EXCLUDED_DIRECTORIES
+            ]
+            paths.extend(
+                os.path.join(directory, file)
+                for file in files
+                if file.endswith(".toml")
+            )
+
+    return sorted(paths)
+
+
+def collect(
+    results: Iterable[FileIndex],
+    total: int,
+    progress: Progress | None,
+    every: int = 16,
+) -> dict[str, FileIndex]:
+    files = dict[str, FileIndex]()
+
+    for done, file in enumerate(results, start=1):
+        files[file.uri] = file
+        if file.error is not None:
+            logger.debug("Could not index %s: %s", file.uri, file.error)
+        if progress is not None and (done % every == 0 or done == total):
+            progress(done, total)
+
+    return files
+
+
+class WorkspaceIndex:
+    """Index of every configuration file in the workspace, by URI."""
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers
+        """Size of the process pool. Defaults to the number of CPUs."""
+
+        self.files = dict[str, FileIndex]()
+
+    def index(
+        self,
+        paths: list[str],
+        progress: Progress | None = None,
+    ) -> dict[str, FileIndex]:
+        """Index files, in parallel if there are enough of them.
+
+        Blocking: meant to be run in a thread. The index itself is left
+        untouched - merge the result with `update`, from the event loop.
+        """
+        workers = self.max_workers or os.cpu_count() or 1
+        total = len(paths)
+
+        if workers == 1 or total < PARALLEL_THRESHOLD:
+            results = map(index_file, paths)
+            return collect(results, total, progress)
+
+        chunksize = max(1, min(64, total // (4 * workers)))
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(START_METHOD),
+        ) as executor:
+            results = executor.map(index_file, paths, chunksize=chunksize)
+            return collect(results, total, progress, every=chunksize)
+
+    def refresh(self, changes: Iterable[FileEvent]) -> dict[str, FileIndex | None]:
+        """Re-index the files behind file system events. Deleted files map to `None`.
+
+        Blocking, and left for `update` to merge, like `index`.
+        """
+        files = dict[str, FileIndex | None]()
+
+        for change in changes:
+            if not change.uri.endswith(".toml"):
+                continue
+
+            if change.type == FileChangeType.Deleted:
+                files[change.uri] = None
+                continue
+
+            if (path := to_fs_path(change.uri)) is not None:
+                files[change.uri] = index_file(path, change.uri)
+
+        return files
+
+    def update(self, files: Mapping[str, FileIndex | None]) -> None:
+        """Merge indexed files, dropping the ones that map to `None`.
+
+        The mapping is replaced rather than mutated, such that iterations over
+        the previous one are not affected.
+        """
+        merged = dict(self.files)
+
+        for uri, file in files.items():
+            if file is None:
+                merged.pop(uri, None)
+            else:
+                merged[uri] = file
+
+        self.files = merged
+
+    def usages(self, factory_name: str) -> Iterator[Location]:
+        """Locations where a factory is used, across the workspace."""
+        for file in self.files.values():
+            yield from file.usages(factory_name)
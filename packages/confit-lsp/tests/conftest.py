@@ -0,0 +1,18 @@
+import pytest
+from lsprotocol.types import ClientCapabilities, InitializeParams
+
+from confit_lsp.main import ConfitLanguageServer
+from confit_lsp.metadata import MetadataStore
+
+
+@pytest.fixture
+def language_server() -> ConfitLanguageServer:
+    """A server whose workspace is set up, as after an `initialize` request."""
+    ls = ConfitLanguageServer("test", "v0")
+    ls.metadata = MetadataStore(None)
+
+    params = InitializeParams(capabilities=ClientCapabilities())
+    for _ in ls.protocol.lsp_initialize(params):
+        pass
+
+    return ls
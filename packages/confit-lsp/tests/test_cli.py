@@ -0,0 +1,105 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+from confit_lite.registry import register
+
+from confit_lsp import cli
+from confit_lsp.cli import run_check
+from confit_lsp.diagnostics import check_path
+
+
+@register("tests.cli.scale")
+def scale(value: float, factor: int = 2) -> float:
+    return value * factor
+
+
+VALID = """
+[model]
+factory = "tests.cli.scale"
+value = 1.0
+"""
+
+INVALID = """
+[model]
+factory = "tests.cli.scale"
+value = "one"
+"""
+
+
+def write_configs(root: Path) -> None:
+    (root / "valid.toml").write_text(VALID)
+    (root / "invalid.toml").write_text(INVALID)
+    (root / "broken.toml").write_text("[model\n")
+
+
+def test_check_text(tmp_path: Path):
+    write_configs(tmp_path)
+    output = io.StringIO()
+
+    assert run_check([str(tmp_path / "valid.toml")], output) == 0
+    assert output.getvalue() == ""
+
+    assert run_check([str(tmp_path), "--jobs", "1"], output) == 1
+
+    lines = output.getvalue().splitlines()
+    assert len(lines) == 2
+    assert lines[0].startswith(f"{tmp_path / 'broken.toml'}:1:1: error:")
+    assert lines[1].startswith(
+        f"{tmp_path / 'invalid.toml'}:4:1: error: Argument `value` has incompatible type."
+    )
+
+
+def test_check_jsonl(tmp_path: Path):
+    write_configs(tmp_path)
+    output = io.StringIO()
+
+    assert run_check([str(tmp_path / "invalid.toml"), "--format", "jsonl"], output) == 1
+
+    (record,) = map(json.loads, output.getvalue().splitlines())
+    assert record["line"] == 4
+    assert record["severity"] == "error"
+
+
+def test_check_sarif(tmp_path: Path):
+    write_configs(tmp_path)
+    output = io.StringIO()
+
+    assert run_check([str(tmp_path), "--format", "sarif"], output) == 1
+
+    log = json.loads(output.getvalue())
+    (run,) = log["runs"]
+    assert len(run["results"]) == 2
+
+
+def test_check_dotted_argument(tmp_path: Path):
+    (tmp_path / "dotted.toml").write_text(VALID + "sub.c = 2\n")
+    output = io.StringIO()
+
+    assert run_check([str(tmp_path / "dotted.toml"), "--format", "jsonl"], output) == 0
+
+    # `sub` has no key of its own: the warning points to `sub.c`.
+    (record,) = map(json.loads, output.getvalue().splitlines())
+    assert (record["line"], record["column"], record["endColumn"]) == (5, 1, 6)
+    assert record["message"].startswith("Argument `sub` is not recognized")
+
+
+def test_check_internal_error(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    write_configs(tmp_path)
+
+    def fail(path: str):
+        if path.endswith("valid.toml"):
+            raise RuntimeError("boom")
+        return check_path(path)
+
+    monkeypatch.setattr(cli, "check_path", fail)
+    output = io.StringIO()
+
+    assert run_check([str(tmp_path), "--jobs", "1"], output) == 1
+
+    lines = output.getvalue().splitlines()
+    assert len(lines) == 3
+    assert lines[2].endswith(
+        "error: Could not validate the document: RuntimeError: boom"
+    )
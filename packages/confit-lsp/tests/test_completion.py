@@ -0,0 +1,90 @@
+from confit_lsp.completion import CompletionIndex, enclosing_table
+from confit_lsp.metadata import FactoryMetadata, FieldMetadata
+
+
+def metadata(name: str) -> FactoryMetadata:
+    return FactoryMetadata(
+        name=name,
+        docstring=f"Build {name}.",
+        uri="file:///factories.py",
+        range=(0, 0, 0, 0),
+        fields={},
+        return_type=None,
+    )
+
+
+NAMES = ["model.Linear", "model.Scale", "optim.Adam", "data.scale_loader", "Scaler"]
+
+INDEX = CompletionIndex.build({name: metadata(name) for name in NAMES}, generation=0)
+
+
+def labels(query: str, limit: int = 100) -> list[str]:
+    items, _ = INDEX.search(query, limit)
+    return [item.label for item in items]
+
+
+def test_prefix_then_segment_then_fuzzy():
+    assert labels("scale") == ["Scaler", "model.Scale", "data.scale_loader"]
+    assert labels("lin") == ["model.Linear"]
+    assert labels("mdlsc") == ["model.Scale"]
+
+
+def test_empty_query():
+    assert labels("") == sorted(NAMES, key=str.lower)
+
+
+def test_ranking_and_incompleteness():
+    items, is_incomplete = INDEX.search("", 2)
+
+    assert is_incomplete
+    assert [item.sort_text for item in items] == ["000000", "000001"]
+
+    _, is_incomplete = INDEX.search("adam", 2)
+    assert not is_incomplete
+
+
+def test_documentation_is_deferred():
+    items, _ = INDEX.search("optim", 10)
+
+    assert items[0].documentation is None
+    assert items[0].data == dict(factory="optim.Adam")
+
+
+def test_enclosing_table():
+    lines = [
+        "[model]",
+        'factory = "model.Linear"',
+        "",
+        '[model."sub.layer"]',
+        "size = 2",
+    ]
+
+    assert enclosing_table(lines, 0) == ("model",)
+    assert enclosing_table(lines, 2) == ("model",)
+    assert enclosing_table(lines, 4) == ("model", "sub.layer")
+    assert enclosing_table(["a = 1"], 0) == ()
+
+
+def test_argument_completion():
+    linear = metadata("model.Linear")
+    linear.fields = dict(
+        bias=FieldMetadata(
+            annotation="bool", type_name="bool", required=False, default="True"
+        ),
+        size=FieldMetadata(
+            annotation="int", type_name="int", required=True, default=None
+        ),
+        name=FieldMetadata(
+            annotation="str", type_name="str", required=True, default=None
+        ),
+    )
+    index = CompletionIndex.build({"model.Linear": linear}, generation=0)
+
+    items = index.arguments("model.Linear", ["factory", "size"])
+
+    assert [item.label for item in items] == ["required arguments", "bias", "name"]
+    assert items[0].insert_text == "name = ${1:str}\n$0"
+    assert [item.sort_text for item in items[1:]] == ["1000000", "0000002"]
+
+    assert index.arguments("model.Linear", ["size", "name", "bias"]) == []
+    assert index.arguments("unknown", []) == []
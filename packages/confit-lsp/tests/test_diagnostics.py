@@ -0,0 +1,276 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from confit_lite.registry import register
+from lsprotocol.types import (
+    Diagnostic,
+    DocumentDiagnosticParams,
+    ProgressParams,
+    RelatedUnchangedDocumentDiagnosticReport,
+    TextDocumentIdentifier,
+    TextDocumentItem,
+    WorkspaceDiagnosticParams,
+)
+
+from confit_lsp.descriptor import ConfigurationView
+from confit_lsp.diagnostics import (
+    DiagnosticsScheduler,
+    IncrementalValidator,
+    validate_config,
+)
+from confit_lsp.executor import Cancelled, checkpoint
+from confit_lsp.main import (
+    WORKSPACE_DIAGNOSTIC_BATCH,
+    ConfitLanguageServer,
+    document_diagnostic,
+    workspace_diagnostic,
+)
+
+
+@register("tests.scale")
+def scale(value: float, factor: int, name: str = "scale") -> float:
+    return value * factor
+
+
+TOML = """
+[values]
+factor = "twelve"
+
+[model]
+factory = "tests.scale"
+value = "not a float"
+factor = "$values.factor"
+name = "ok"
+"""
+
+OTHER = """
+[other]
+factory = "tests.scale"
+value = 1.0
+"""
+
+VIEW = ConfigurationView(data={}, keys={}, values={})
+
+
+def test_debounce():
+    published = list[tuple[str, int | None]]()
+    calls = list[ConfigurationView]()
+
+    def validate(view: ConfigurationView) -> list[Diagnostic]:
+        calls.append(view)
+        return []
+
+    async def main():
+        scheduler = DiagnosticsScheduler(
+            lambda uri, version, _: published.append((uri, version)),
+            delay=0.01,
+            validate=validate,
+        )
+
+        for version in range(5):
+            scheduler.schedule("file:///a.toml", version, VIEW)
+
+        await scheduler.schedule("file:///b.toml", 0, VIEW)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+
+    assert len(calls) == 2
+    assert sorted(published) == [("file:///a.toml", 4), ("file:///b.toml", 0)]
+
+
+def test_stale_results_are_dropped():
+    published = list[tuple[str, int | None]]()
+    started = threading.Event()
+    release = threading.Event()
+
+    def validate(view: ConfigurationView) -> list[Diagnostic]:
+        started.set()
+        release.wait()
+        return []
+
+    async def main():
+        scheduler = DiagnosticsScheduler(
+            lambda uri, version, _: published.append((uri, version)),
+            delay=0,
+            validate=validate,
+        )
+
+        first = scheduler.schedule("file:///a.toml", 1, VIEW)
+        await asyncio.to_thread(started.wait)
+
+        # The first run is already executing and has no checkpoint left:
+        # it cannot be interrupted, but its result must not be published.
+        second = scheduler.schedule("file:///a.toml", 2, VIEW)
+        release.set()
+
+        await asyncio.gather(first, second, return_exceptions=True)
+
+    asyncio.run(main())
+
+    assert published == [("file:///a.toml", 2)]
+
+
+def test_superseded_runs_are_interrupted():
+    published = list[tuple[str, int | None]]()
+    started = threading.Event()
+    interrupted = threading.Event()
+
+    def validate(view: ConfigurationView) -> list[Diagnostic]:
+        if started.is_set():
+            return []
+
+        started.set()
+        deadline = time.monotonic() + 5
+
+        try:
+            while time.monotonic() < deadline:
+                checkpoint()
+                time.sleep(0.001)
+        except Cancelled:
+            interrupted.set()
+            raise
+
+        return []
+
+    async def main():
+        scheduler = DiagnosticsScheduler(
+            lambda uri, version, _: published.append((uri, version)),
+            delay=0,
+            validate=validate,
+        )
+
+        scheduler.schedule("file:///a.toml", 1, VIEW)
+        await asyncio.to_thread(started.wait)
+
+        await scheduler.schedule("file:///a.toml", 2, VIEW)
+
+    start = time.monotonic()
+    asyncio.run(main())
+
+    assert interrupted.is_set()
+    assert time.monotonic() - start < 1
+    assert published == [("file:///a.toml", 2)]
+
+
+def test_validate_config():
+    view = ConfigurationView.from_source(TOML)
+    diagnostics = validate_config(view)
+
+    errors = {d.range.start.line: d.message for d in diagnostics}
+
+    assert len(diagnostics) == 2
+    assert errors[6].startswith("Argument `value` has incompatible type.")
+    # Errors on referenced values point to the referenced element.
+    assert errors[2].startswith("Argument `factor` has incompatible type.")
+
+
+CYCLES = """
+[a]
+factory = "tests.scale"
+value = 1.0
+factor = "$b"
+
+[b]
+factory = "tests.scale"
+value = "$a"
+factor = "$a.value"
+
+[c]
+x = "$c.y"
+y = "$c.x"
+"""
+
+
+def test_cycles():
+    view = ConfigurationView.from_source(CYCLES)
+    diagnostics = validate_config(view)
+
+    cycles = {
+        d.range.start.line: d.message
+        for d in diagnostics
+        if d.message.startswith("Circular reference")
+    }
+
+    # `b.factor` references `a`, but is not part of the cycle.
+    assert cycles == {
+        4: "Circular reference between `a.factor`, `b.value`.",
+        8: "Circular reference between `a.factor`, `b.value`.",
+        12: "Circular reference between `c.x`, `c.y`.",
+        13: "Circular reference between `c.x`, `c.y`.",
+    }
+
+
+def test_incremental_validation():
+    validator = IncrementalValidator()
+
+    view = ConfigurationView.from_source(TOML + OTHER)
+    assert validator(view) == validate_config(view)
+
+    model = validator.problems[("model",)]
+    other = validator.problems[("other",)]
+
+    # Shift everything down, and change the referenced value.
+    source = "\n" + TOML.replace('"twelve"', "12") + OTHER
+    view = ConfigurationView.from_source(source)
+
+    assert validator(view) == validate_config(view)
+    assert validator.problems[("model",)] is not model
+    assert validator.problems[("other",)] is other
+
+
+def test_pull_diagnostics(language_server: ConfitLanguageServer):
+    ls = language_server
+    ls.workspace.put_text_document(
+        TextDocumentItem(uri="file:///a.toml", language_id="toml", version=1, text=TOML)
+    )
+
+    params = DocumentDiagnosticParams(
+        text_document=TextDocumentIdentifier(uri="file:///a.toml")
+    )
+
+    report = asyncio.run(document_diagnostic(ls, params))
+    assert len(report.items) == 2
+
+    params.previous_result_id = report.result_id
+    unchanged = asyncio.run(document_diagnostic(ls, params))
+    assert isinstance(unchanged, RelatedUnchangedDocumentDiagnosticReport)
+
+    # Registering a factory may change the diagnostics.
+    register("tests.other", scale)
+    report = asyncio.run(document_diagnostic(ls, params))
+    assert report.result_id != params.previous_result_id
+    assert len(report.items) == 2
+
+
+def test_workspace_diagnostic_partial_results(
+    tmp_path: Path,
+    language_server: ConfitLanguageServer,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    ls = language_server
+
+    paths = list[str]()
+    for i in range(WORKSPACE_DIAGNOSTIC_BATCH + 1):
+        path = tmp_path / f"{i}.toml"
+        path.write_text(TOML)
+        paths.append(str(path))
+
+    ls.index.update(ls.index.index(paths))
+
+    sent = list[ProgressParams]()
+    monkeypatch.setattr(ls, "progress", sent.append)
+
+    params = WorkspaceDiagnosticParams(previous_result_ids=[])
+    report = asyncio.run(workspace_diagnostic(ls, params))
+    assert len(report.items) == WORKSPACE_DIAGNOSTIC_BATCH + 1
+    assert sent == []
+
+    # With a token, every report is sent as a partial result.
+    params.partial_result_token = "token"
+    report = asyncio.run(workspace_diagnostic(ls, params))
+    assert report.items == []
+    assert [len(p.value.items) for p in sent] == [WORKSPACE_DIAGNOSTIC_BATCH, 1]
@@ -1,7 +1,12 @@
+from lsprotocol.types import Position, Range, TextDocumentContentChangePartial
+from pygls.workspace import TextDocument
+import pytest
+
 from confit_lsp.descriptor import ConfigurationView
+from confit_lsp.parsers import TomlParsingError
 
 TOML = """
-top-level = 3
+top-level = "$section.b"
 
 [section]
 factory = "add"
@@ -9,7 +14,7 @@ a = 9
 
 [section.b]
 factory = "subtract"
-a = 0
+a = "$section.a"
 b = 42
 """
 
@@ -20,3 +25,102 @@ def test_factories():
         ("section",): "add",
         ("section", "b"): "subtract",
     }
+
+
+@pytest.mark.parametrize(
+    "start,end,text",
+    [
+        ((2, 0), (2, 0), "other = 1\n"),
+        ((5, 4), (5, 5), "12"),
+        ((4, 0), (7, 0), ""),
+        ((9, 0), (10, 0), "[section.c]\n"),
+    ],
+)
+def test_apply_change(start: tuple[int, int], end: tuple[int, int], text: str):
+    change = Range(
+        start=Position(line=start[0], character=start[1]),
+        end=Position(line=end[0], character=end[1]),
+    )
+
+    view = ConfigurationView.from_source(TOML)
+    # References and indexes are carried over to the updated view once computed.
+    view.references
+    view.element_index
+    view.key_index
+
+    document = TextDocument("file:///config.toml", source=TOML)
+    document.apply_change(TextDocumentContentChangePartial(range=change, text=text))
+
+    updated = view.apply_change(document.source, change, text)
+    expected = ConfigurationView.from_source(document.source)
+
+    assert updated.data == expected.data
+    assert updated.keys == expected.keys
+    assert updated.values == expected.values
+    assert updated.references == expected.references
+    assert updated.element_index == expected.element_index
+    assert updated.key_index == expected.key_index
+    assert sorted(updated.heads["section"]) == sorted(expected.heads["section"])
+
+    assert view.data == ConfigurationView.from_source(TOML).data
+
+
+@pytest.mark.parametrize(
+    "start,end,text",
+    [
+        # Duplicate header, outside of the re-parsed region
+        ((7, 0), (7, 11), "[section]"),
+        ((6, 0), (6, 0), "[section.b]\n"),
+        # Dotted keys extending a table defined by a header
+        ((2, 0), (2, 0), "section.c = 1\n"),
+        # Header extending a value
+        ((7, 0), (7, 11), "[top-level.c]"),
+        # Value redefining an implicit table
+        ((2, 0), (2, 0), "section = 1\n"),
+    ],
+)
+def test_apply_change_conflict(
+    start: tuple[int, int],
+    end: tuple[int, int],
+    text: str,
+):
+    change = Range(
+        start=Position(line=start[0], character=start[1]),
+        end=Position(line=end[0], character=end[1]),
+    )
+
+    view = ConfigurationView.from_source(TOML)
+
+    document = TextDocument("file:///config.toml", source=TOML)
+    document.apply_change(TextDocumentContentChangePartial(range=change, text=text))
+
+    with pytest.raises(TomlParsingError):
+        view.apply_change(document.source, change, text)
+
+
+def test_apply_change_nested_header():
+    source = TOML.replace("b = 42\n", "b = 42\n\n[section.b.c]\nd = 1\n")
+    change = Range(
+        start=Position(line=5, character=4), end=Position(line=5, character=5)
+    )
+
+    document = TextDocument("file:///config.toml", source=source)
+    document.apply_change(TextDocumentContentChangePartial(range=change, text="1"))
+
+    view = ConfigurationView.from_source(source)
+    updated = view.apply_change(document.source, change, "1")
+
+    assert updated.data == ConfigurationView.from_source(document.source).data
+
+
+def test_array_references():
+    view = ConfigurationView.from_source('a = 1\nb = [{c = "$a"}, "$a"]\n')
+
+    assert view.references == {("b", "0", "c"): ("a",), ("b", "1"): ("a",)}
+    assert view.get_value(("b", "0", "c")) == "$a"
+
+    assert view.get_element_from_position(Position(line=1, character=18)) == (
+        "value",
+        ("b", "1"),
+    )
+    assert view.get_target_from_position(Position(line=1, character=18)) == ("a",)
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+import pytest
+
+from confit_lsp.executor import RequestExecutor, checkpoint
+
+
+def test_run():
+    executor = RequestExecutor()
+
+    async def main():
+        return await executor.run(threading.current_thread)
+
+    thread = asyncio.run(main())
+
+    assert thread is not threading.main_thread()
+    assert thread.name.startswith("confit-requests")
+
+    # Checkpoints do nothing outside of the executor.
+    checkpoint()
+
+
+def test_cancellation():
+    executor = RequestExecutor()
+    started = threading.Event()
+    iterations = list[int]()
+
+    def work() -> None:
+        started.set()
+        for i in range(1000):
+            checkpoint()
+            iterations.append(i)
+            threading.Event().wait(0.001)
+
+    async def main():
+        task = asyncio.create_task(executor.run(work))
+        await asyncio.to_thread(started.wait)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+    # The work stops at its next checkpoint, rather than running to completion.
+    executor.executor.shutdown(wait=True)
+    assert len(iterations) < 1000
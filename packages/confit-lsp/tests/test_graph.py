@@ -0,0 +1,33 @@
+from confit_lsp.graph import DependencyGraph
+
+REFERENCES = {
+    ("b",): ("a",),
+    ("c",): ("b", "x"),
+    ("d",): ("c",),
+    ("e",): ("f", "g", "h"),
+    ("i",): ("j",),
+}
+
+
+def test_affected():
+    graph = DependencyGraph.build(REFERENCES)
+
+    # Transitively, through references to a nested element.
+    assert graph.affected([("a",)]) == {("b",), ("c",), ("d",)}
+
+    # Changes within a target, and around it.
+    assert graph.affected([("a", "y")]) == {("b",), ("c",), ("d",)}
+    assert graph.affected([("f",)]) == {("e",)}
+    assert graph.affected([("f", "g", "h", "k")]) == {("e",)}
+
+    assert graph.affected([("f", "z")]) == set()
+    assert graph.affected([("j",), ("c",)]) == {("i",), ("d",)}
+    assert graph.affected([()]) == set(REFERENCES)
+
+
+def test_affected_long_chain():
+    n = 20_000
+    references = {(f"r{i}",): (f"r{i + 1}", "value") for i in range(n)}
+    graph = DependencyGraph.build(references)
+
+    assert len(graph.affected([(f"r{n}",)])) == n
@@ -0,0 +1,101 @@
+import random
+
+from lsprotocol.types import Position, Range
+
+from confit_lsp.index import RangeIndex
+
+
+def make_range(line: int, start: int, end: int) -> Range:
+    return Range(
+        start=Position(line=line, character=start),
+        end=Position(line=line, character=end),
+    )
+
+
+ELEMENTS = [
+    (("a",), make_range(1, 1, 2)),
+    (("a", "b"), make_range(2, 0, 9)),
+    (("a", "c"), make_range(3, 0, 14)),
+    (("d",), make_range(5, 1, 2)),
+    (("d", "e"), make_range(6, 0, 5)),
+]
+
+
+def test_at():
+    index = RangeIndex.build(ELEMENTS)
+
+    for path, location in ELEMENTS:
+        assert index.at(location.start) == (path, location)
+        assert index.at(location.end) is None
+
+    assert index.at(Position(line=0, character=0)) is None
+    assert index.at(Position(line=4, character=0)) is None
+    assert index.at(Position(line=3, character=13)) == ELEMENTS[2]
+
+
+def test_overlapping():
+    index = RangeIndex.build(ELEMENTS)
+
+    result = index.overlapping(
+        Position(line=2, character=9),
+        Position(line=5, character=0),
+    )
+    assert [path for path, _ in result] == [("a", "b"), ("a", "c")]
+
+    assert (
+        list(
+            index.overlapping(
+                Position(line=7, character=0), Position(line=9, character=0)
+            )
+        )
+        == []
+    )
+
+
+def test_matches_linear_scan():
+    rng = random.Random(0)
+
+    elements = []
+    for i in range(500):
+        line = rng.randrange(200)
+        start = rng.randrange(20)
+        elements.append(
+            ((str(i),), make_range(line, start, start + rng.randrange(1, 20)))
+        )
+
+    index = RangeIndex.build(elements)
+
+    for _ in range(500):
+        lo = Position(line=rng.randrange(200), character=rng.randrange(40))
+        hi = Position(line=lo.line + rng.randrange(5), character=rng.randrange(40))
+
+        expected = {path for path, r in elements if r.start <= lo < r.end}
+        found = index.at(lo)
+        assert (found is None) == (not expected)
+        assert found is None or found[0] in expected
+
+        expected = {path for path, r in elements if not (r.start > hi or lo > r.end)}
+        assert {path for path, _ in index.overlapping(lo, hi)} == expected
+
+
+def test_splice():
+    index = RangeIndex.build(ELEMENTS)
+
+    # Replace line 2 by two lines.
+    region = RangeIndex.build(
+        [(("a", "f"), make_range(2, 0, 30)), (("a", "g"), make_range(3, 0, 1))]
+    )
+    spliced = index.splice(2 << 32, 3 << 32, region, 1 << 32)
+
+    expected = [
+        ELEMENTS[0],
+        (("a", "f"), make_range(2, 0, 30)),
+        (("a", "g"), make_range(3, 0, 1)),
+        *[
+            (path, make_range(r.start.line + 1, r.start.character, r.end.character))
+            for path, r in ELEMENTS[2:]
+        ],
+    ]
+
+    assert spliced == RangeIndex.build(expected)
+    assert index == RangeIndex.build(ELEMENTS)
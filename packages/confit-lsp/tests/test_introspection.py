@@ -2,7 +2,7 @@ from typing import Callable
 from pydantic import BaseModel, ConfigDict
 import pytest
 
-from confit_lsp.capabilities import FunctionDescription
+from confit_lsp.capabilities import FunctionDescription, describe, invalidate
 
 
 class Model:
@@ -58,3 +58,18 @@ def test_compatibility():
         descriptor1.return_type
         == descriptor2.input_model.model_fields["model"].annotation
     )
+
+
+def test_describe_is_memoized():
+    invalidate()
+
+    description = describe("func", func1)
+    assert describe("func", func1) is description
+
+    # Registering another function under the same name invalidates the entry.
+    other = describe("func", func2)
+    assert other is not description
+    assert other.return_type is str
+
+    invalidate("func")
+    assert describe("func", func2) is not other
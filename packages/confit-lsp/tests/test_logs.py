@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from pathlib import Path
+
+import pytest
+from lsprotocol.types import LogMessageParams, MessageType
+
+from confit_lsp.logs import LogConfiguration
+from confit_lsp.settings import Settings
+
+logger = logging.getLogger("confit_lsp.tests")
+
+
+@pytest.fixture
+def logs():
+    level = logging.getLogger().level
+    configuration = LogConfiguration()
+    yield configuration
+    configuration.stop()
+    logging.getLogger().setLevel(level)
+
+
+def test_log_file(logs: LogConfiguration, tmp_path: Path):
+    path = tmp_path / "confit-lsp.log"
+    logs.configure(Settings(log_file=str(path), log_level="info"))
+
+    logger.debug("hidden")
+    logger.info("shown")
+
+    logs.stop()
+
+    content = path.read_text()
+    assert "shown" in content
+    assert "hidden" not in content
+
+
+def test_log_to_client(logs: LogConfiguration, tmp_path: Path):
+    messages = list[LogMessageParams]()
+
+    class Server:
+        def window_log_message(self, params: LogMessageParams) -> None:
+            messages.append(params)
+
+    async def main():
+        settings = Settings(log_file=str(tmp_path / "log"), log_to_client=True)
+        logs.configure(settings, Server())
+
+        logger.warning("forwarded")
+        logging.getLogger("pygls.protocol").warning("not forwarded")
+
+        for _ in range(100):
+            if messages:
+                break
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+
+    assert len(messages) == 1
+    assert messages[0].type == MessageType.Warning
+    assert messages[0].message == "confit_lsp.tests: forwarded"
@@ -0,0 +1,94 @@
+from pathlib import Path
+
+from confit_lite.registry import Registry
+
+from confit_lsp.metadata import MetadataStore
+
+
+def scale(x: float, factor: float = 2.0) -> float:
+    """Scale a number."""
+    return x * factor
+
+
+def test_metadata_round_trip(tmp_path: Path):
+    registry = Registry()
+    registry["tests.scale"] = scale
+
+    path = tmp_path / "factories.json"
+    store = MetadataStore(path, registry=registry)
+
+    metadata = store.get("tests.scale")
+    assert metadata is not None
+    assert path.exists()
+
+    assert metadata.docstring == "Scale a number."
+    assert metadata.fields["x"].type_name == "float"
+    assert metadata.fields["x"].required
+    assert metadata.fields["factor"].default == "2.0"
+
+    # A fresh store reads from disk, without touching the registry.
+    cached = MetadataStore(path, registry=Registry()).get("tests.scale")
+    assert cached == metadata
+    assert cached.location == metadata.location
+
+
+def test_metadata_peek(tmp_path: Path):
+    registry = Registry()
+    registry["tests.scale"] = scale
+
+    store = MetadataStore(tmp_path / "factories.json", registry=registry)
+
+    # Peeking never imports nor describes anything.
+    assert store.peek("tests.scale") is None
+
+    metadata = store.get("tests.scale")
+    assert store.peek("tests.scale") is metadata
+    assert store.peek({"not": "a name"}) is None
+
+
+def test_metadata_enumeration(tmp_path: Path):
+    registry = Registry()
+    registry["tests.scale"] = scale
+
+    path = tmp_path / "factories.json"
+    assert set(MetadataStore(path, registry=registry).all()) == {"tests.scale"}
+
+    store = MetadataStore(path, registry=Registry())
+    assert store.cache.complete
+    assert set(store.all()) == {"tests.scale"}
+
+
+def test_stale_metadata(tmp_path: Path):
+    registry = Registry()
+    registry["tests.scale"] = scale
+
+    path = tmp_path / "factories.json"
+    MetadataStore(path, registry=registry).get("tests.scale")
+
+    store = MetadataStore(path, registry=Registry())
+    metadata = store.cache.factories["tests.scale"]
+    assert metadata.source is not None
+
+    metadata.source.mtime_ns -= 1
+
+    # The factory is gone from the registry: stale metadata is dropped.
+    assert store.get("tests.scale") is None
+    assert "tests.scale" not in store.cache.factories
+
+
+def test_metadata_saved_on_change(tmp_path: Path):
+    registry = Registry()
+    registry["tests.scale"] = scale
+
+    path = tmp_path / "factories.json"
+    store = MetadataStore(path, registry=registry)
+    store.all()
+    path.unlink()
+
+    # Nothing changed: the cache is not written again.
+    store.all()
+    assert not path.exists()
+
+    store.invalidate("tests.scale")
+    store.all()
+    assert path.exists()
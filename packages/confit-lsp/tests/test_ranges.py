@@ -0,0 +1,111 @@
+from array import array
+
+from lsprotocol.types import Position, Range
+
+from confit_lsp.parsers.types import MISSING, ElementPath
+from confit_lsp.ranges import RangeTable, patch_tables
+
+
+def make_range(line: int, start: int, end: int) -> Range:
+    return Range(
+        start=Position(line=line, character=start),
+        end=Position(line=line, character=end),
+    )
+
+
+def pack(
+    keys: dict[ElementPath, Range],
+    values: dict[ElementPath, Range],
+    line_offset: int = 0,
+) -> tuple[RangeTable, RangeTable]:
+    """Pack ranges the way the scanner does. Every value must have a key."""
+    rows = {path: row for row, path in enumerate(keys)}
+    key_columns = array("q", [MISSING, 0, 0, 0] * len(rows))
+    value_columns = array("q", [MISSING, 0, 0, 0] * len(rows))
+
+    for ranges, columns in ((keys, key_columns), (values, value_columns)):
+        for path, location in ranges.items():
+            row = 4 * rows[path]
+            columns[row : row + 4] = array(
+                "q",
+                (
+                    location.start.line + line_offset,
+                    location.start.character,
+                    location.end.line + line_offset,
+                    location.end.character,
+                ),
+            )
+
+    return RangeTable.from_columns(rows, key_columns, value_columns)
+
+
+KEYS = {
+    ("a",): make_range(0, 1, 2),
+    ("a", "b"): make_range(1, 0, 1),
+    ("a", "c"): make_range(2, 0, 1),
+}
+
+VALUES = {
+    ("a", "b"): make_range(1, 4, 5),
+    ("a", "c"): make_range(2, 4, 9),
+}
+
+
+def test_mapping():
+    keys, values = pack(KEYS, VALUES)
+
+    assert keys == KEYS
+    assert values == VALUES
+    assert len(values) == 2
+
+    assert ("a",) in keys
+    assert ("a",) not in values
+    assert values.get(("a",)) is None
+    assert values[("a", "c")] == make_range(2, 4, 9)
+
+    assert dict(values.compact_items()) == {
+        ("a", "b"): (1, 4, 1, 5),
+        ("a", "c"): (2, 4, 2, 9),
+    }
+
+
+def test_line_offset():
+    keys, _ = pack(KEYS, VALUES, line_offset=3)
+    assert keys[("a", "c")] == make_range(5, 0, 1)
+
+
+def test_patch():
+    keys, values = pack(KEYS, VALUES)
+
+    # Replace `b = ...` on line 1 by two lines.
+    region = pack(
+        {("a", "d"): make_range(1, 0, 1), ("a", "e"): make_range(2, 0, 1)},
+        {("a", "d"): make_range(1, 4, 5)},
+    )
+
+    keys, values, removed = patch_tables(keys, values, region, 1, 2, 1)
+
+    assert removed == [("a", "b")]
+    assert list(keys) == [("a",), ("a", "d"), ("a", "e"), ("a", "c")]
+    assert keys[("a", "c")] == make_range(3, 0, 1)
+    assert values == {
+        ("a", "d"): make_range(1, 4, 5),
+        ("a", "c"): make_range(3, 4, 9),
+    }
+
+
+def test_patch_in_place():
+    keys, values = pack(KEYS, VALUES)
+
+    # Edit the value of `b`, without adding lines.
+    region = pack(
+        {("a", "b"): make_range(1, 0, 1)},
+        {("a", "b"): make_range(1, 4, 8)},
+    )
+
+    patched_keys, patched_values, removed = patch_tables(keys, values, region, 1, 2, 0)
+
+    assert removed == [("a", "b")]
+    assert patched_keys.rows is keys.rows
+    assert patched_keys == KEYS
+    assert patched_values == {**VALUES, ("a", "b"): make_range(1, 4, 8)}
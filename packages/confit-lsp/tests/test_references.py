@@ -0,0 +1,77 @@
+from lsprotocol.types import Position, Range, TextEdit
+
+from confit_lsp.descriptor import ConfigurationView
+from confit_lsp.references import rename_edits
+
+TOML = """\
+[model]
+factory = "add"
+a = 1
+
+[model.sub]
+factory = "subtract"
+a = "$model.a"
+b = '$model'
+
+[other]
+model.c = 2
+x = "$model.sub.a"
+"""
+
+VIEW = ConfigurationView.from_source(TOML)
+
+
+def test_referencing():
+    index = VIEW.reference_index
+
+    assert index.referencing(("model", "a")) == [("model", "sub", "a")]
+    assert set(index.referencing(("model",))) == {
+        ("model", "sub", "a"),
+        ("model", "sub", "b"),
+        ("other", "x"),
+    }
+    assert index.referencing(("model",), nested=False) == [("model", "sub", "b")]
+
+
+def test_target_from_position():
+    assert VIEW.get_target_from_position(Position(line=6, character=6)) == (
+        "model",
+        "a",
+    )
+    assert VIEW.get_target_from_position(Position(line=4, character=3)) == (
+        "model",
+        "sub",
+    )
+
+
+def edit(line: int, start: int, end: int, text: str) -> TextEdit:
+    return TextEdit(
+        range=Range(
+            start=Position(line=line, character=start),
+            end=Position(line=line, character=end),
+        ),
+        new_text=text,
+    )
+
+
+def test_rename():
+    lines = TOML.splitlines(keepends=True)
+
+    edits = rename_edits(
+        VIEW.keys, VIEW.values, VIEW.reference_index, lines, ("model", "sub"), "inner"
+    )
+    assert sorted(edits, key=lambda e: e.range.start.line) == [
+        edit(4, 7, 10, "inner"),
+        edit(11, 12, 15, "inner"),
+    ]
+
+    edits = rename_edits(
+        VIEW.keys, VIEW.values, VIEW.reference_index, lines, ("model",), "net"
+    )
+    assert sorted(edits, key=lambda e: e.range.start.line) == [
+        edit(0, 1, 6, "net"),
+        edit(4, 1, 6, "net"),
+        edit(6, 6, 11, "net"),
+        edit(7, 6, 11, "net"),
+        edit(11, 6, 11, "net"),
+    ]
@@ -0,0 +1,168 @@
+import asyncio
+import importlib
+import sys
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from confit_lite.registry import Registry
+from lsprotocol.types import (
+    ClientCapabilities,
+    DiagnosticWorkspaceClientCapabilities,
+    TextDocumentItem,
+    WorkspaceClientCapabilities,
+)
+
+from confit_lsp.main import ConfitLanguageServer
+from confit_lsp.reload import FactoryReloader, RegistryDiff
+
+SOURCE = """
+import confit_lsp_reload_registry as registries
+
+
+def scale(x: float) -> float:
+    return x
+
+
+def offset(x: float) -> float:
+    return x
+
+
+registries.REGISTRY["tests.offset"] = offset
+"""
+
+
+@pytest.fixture
+def module(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    registries = type(sys)("confit_lsp_reload_registry")
+    registries.REGISTRY = Registry()
+    monkeypatch.setitem(sys.modules, registries.__name__, registries)
+
+    path = tmp_path / "confit_lsp_reload_factories.py"
+    path.write_text(SOURCE)
+
+    monkeypatch.syspath_prepend(tmp_path)
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    importlib.invalidate_caches()
+
+    yield path
+
+    sys.modules.pop("confit_lsp_reload_factories", None)
+
+
+def test_reload(module: Path):
+    factories = importlib.import_module("confit_lsp_reload_factories")
+    registry = sys.modules["confit_lsp_reload_registry"].REGISTRY
+
+    # Registered outside of the module that defines it.
+    registry["tests.scale"] = factories.scale
+
+    reloader = FactoryReloader(registry)
+    assert reloader.poll() == []
+
+    module.write_text(SOURCE.replace("def scale(x: float)", "def scale(x: int)"))
+    assert reloader.poll() == ["confit_lsp_reload_factories"]
+
+    diff = reloader.reload("confit_lsp_reload_factories")
+    assert diff.changed == {"tests.scale"}
+    assert diff.updated == {"tests.offset"}
+    assert diff.validation == {"tests.scale"}
+    assert registry["tests.scale"] is factories.scale
+
+    module.write_text(SOURCE.replace("def scale", "def other"))
+    assert reloader.poll() == ["confit_lsp_reload_factories"]
+
+    diff = reloader.reload("confit_lsp_reload_factories")
+    assert diff.removed == {"tests.scale"}
+    assert "tests.scale" not in registry
+
+
+def open_documents(ls: ConfitLanguageServer) -> None:
+    for uri, name in [("file:///a.toml", "tests.a"), ("file:///b.toml", "tests.b")]:
+        ls.workspace.put_text_document(
+            TextDocumentItem(
+                uri=uri,
+                language_id="toml",
+                version=1,
+                text=f'[model]\nfactory = "{name}"\n',
+            )
+        )
+        ls.parse(ls.workspace.get_text_document(uri))
+
+
+def test_refresh_factories(
+    language_server: ConfitLanguageServer,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    ls = language_server
+
+    # Invalid documents are skipped, without stopping the others.
+    ls.workspace.put_text_document(
+        TextDocumentItem(
+            uri="file:///invalid.toml", language_id="toml", version=1, text="[model"
+        )
+    )
+    open_documents(ls)
+
+    scheduled = list[str]()
+    monkeypatch.setattr(
+        ls, "schedule_diagnostics", lambda doc, *_, **__: scheduled.append(doc.uri)
+    )
+
+    ls.refresh_factories(RegistryDiff(updated={"tests.a"}))
+    assert scheduled == []
+
+    ls.refresh_factories(RegistryDiff(changed={"tests.a"}))
+    assert scheduled == ["file:///a.toml"]
+
+    # Documents evicted from the view cache are still open.
+    ls.views.pop("file:///b.toml")
+
+    ls.refresh_factories(RegistryDiff(changed={"tests.b"}))
+    assert scheduled == ["file:///a.toml", "file:///b.toml"]
+
+
+@pytest.mark.parametrize("refresh_support", [False, True])
+def test_refresh_pulled_diagnostics(
+    language_server: ConfitLanguageServer,
+    monkeypatch: pytest.MonkeyPatch,
+    refresh_support: bool,
+):
+    ls = language_server
+    ls.pull_diagnostics = True
+    ls.protocol.client_capabilities = ClientCapabilities(
+        workspace=WorkspaceClientCapabilities(
+            diagnostics=DiagnosticWorkspaceClientCapabilities(
+                refresh_support=refresh_support
+            )
+        )
+    )
+    open_documents(ls)
+
+    refreshed = list[None]()
+    monkeypatch.setattr(ls, "workspace_diagnostic_refresh", refreshed.append)
+
+    ls.refresh_factories(RegistryDiff(changed={"tests.a"}))
+    assert len(refreshed) == refresh_support
+
+
+def test_watch_factories(
+    language_server: ConfitLanguageServer,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    ls = language_server
+    calls = list[None]()
+
+    async def reload_factories() -> None:
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError("refresh failed")
+        raise asyncio.CancelledError()
+
+    monkeypatch.setattr(ls, "reload_factories", reload_factories)
+
+    # Watching goes on after a failed refresh.
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(ls.watch_factories(0))
+
+    assert len(calls) == 2
@@ -0,0 +1,186 @@
+import pytest
+import rtoml
+
+from confit_lsp.executor import TOKEN, CancellationToken, Cancelled
+from confit_lsp.parsers import TomlParsingError, scan
+from confit_lsp.parsers.scanner import CHECKPOINT, Scanner
+
+DOCUMENTS = [
+    """
+top-level = 3
+
+[section]
+factory = "add"
+a = 9
+
+[section.b]
+factory = "subtract"
+a = 0
+b = 42
+""",
+    """
+# A comment
+"quoted key" = 'literal'
+dotted.key = "escaped\\t\\u00e9"  # trailing comment
+numbers = [1, -2, 0x1f, 0o7, 0b1, 1_000, 3.5e-2, +inf]
+nested = [
+  [1, 2],  # comment
+  ["a", 'b'],
+]
+inline = { a = 1, b.c = true, d = { e = [] } }
+multiline = \"\"\"
+Roses are red\\
+   Violets are blue\"\"\"
+raw = '''
+C:\\path'''
+
+[table . "sub key"]
+date = 1979-05-27T07:32:00Z
+
+[[array]]
+x = 1
+
+[[array]]
+x = 2
+""",
+]
+
+
+VALID = [
+    *DOCUMENTS,
+    "\ufeffa = 1",
+    "a = {b = 1,}",
+    "a = {\n  b = 1, # comment\n  c = 2\n}",
+    "a = {b =\n  1, c # comment\n  = 2}",
+    'a = "\\x41\\e"',
+    "a = 1979-05-27 07:32:00\nb = 07:32\nc = 1979-05-27",
+    "a = [{b = 1}, {c = [2]}]",
+    "a = -0.5e+3\nb = 1_000.0\nc = -inf",
+    "a.b = 1\n[c]\nd.e = 2",
+    "[a.b]\nc = 1\n[a]\nd = 2",
+    "[[a]]\nb = 1\n[a.c]\nd = 2\n[[a]]",
+    "\"a.b\" = 1\n'c' = 2",
+    "a = '''\nb = 1\n'''\nc = \"\"\"d\"\"\"",
+    "a = 1\r\nb = 2\r\n",
+]
+
+INVALID = [
+    "a = 1\na = 2",
+    "[a]\n[a]",
+    "a = ",
+    "a = [1,,]",
+    'a = "\\q"',
+    "a = 1 b",
+    "a = 01",
+    "a.b = 1\n[a]\nc = 1",
+    "a = {b = 1}\n[a.c]",
+    "[a.b]\n[a]\n[a]",
+    'a = "x\x01y"',
+    "a = 1 # \x01",
+    "a = {b = 1,,}",
+    "[a]\nb = 1\n[a.b]\n[a]",
+]
+
+
+@pytest.mark.parametrize("content", VALID)
+def test_data(content: str):
+    data, _ = scan(content)
+    assert data == rtoml.loads(content)
+
+
+@pytest.mark.parametrize("content", VALID)
+def test_scanner_accepts(content: str):
+    # Scanner failures would otherwise be hidden by the fallback parser.
+    Scanner(content).scan()
+
+
+def test_elements():
+    _, elements = scan(DOCUMENTS[0])
+
+    locations = {
+        (kind, element.path): (
+            element.location.start.line,
+            element.location.start.character,
+            element.location.end.character,
+        )
+        for kind, element in elements
+    }
+
+    assert locations == {
+        ("key", ("top-level",)): (1, 0, 9),
+        ("value", ("top-level",)): (1, 12, 13),
+        ("key", ("section",)): (3, 1, 8),
+        ("key", ("section", "factory")): (4, 0, 7),
+        ("value", ("section", "factory")): (4, 10, 15),
+        ("key", ("section", "a")): (5, 0, 1),
+        ("value", ("section", "a")): (5, 4, 5),
+        ("key", ("section", "b")): (7, 1, 10),
+        ("key", ("section", "b", "factory")): (8, 0, 7),
+        ("value", ("section", "b", "factory")): (8, 10, 20),
+        ("key", ("section", "b", "a")): (9, 0, 1),
+        ("value", ("section", "b", "a")): (9, 4, 5),
+        ("key", ("section", "b", "b")): (10, 0, 1),
+        ("value", ("section", "b", "b")): (10, 4, 6),
+    }
+
+
+def test_nested_elements():
+    _, elements = scan('a = {b = "$c", d = ["$e", 1, {f = 2}]}')
+
+    locations = {
+        (kind, element.path): (
+            element.location.start.character,
+            element.location.end.character,
+        )
+        for kind, element in elements
+    }
+
+    # Array items have no key, and only strings and tables are located.
+    assert locations == {
+        ("key", ("a",)): (0, 1),
+        ("value", ("a",)): (4, 38),
+        ("key", ("a", "b")): (5, 6),
+        ("value", ("a", "b")): (9, 13),
+        ("key", ("a", "d")): (15, 16),
+        ("value", ("a", "d")): (19, 37),
+        ("value", ("a", "d", "0")): (20, 24),
+        ("value", ("a", "d", "2")): (29, 36),
+        ("key", ("a", "d", "2", "f")): (30, 31),
+        ("value", ("a", "d", "2", "f")): (34, 35),
+    }
+
+
+def test_multiline_value_range():
+    _, elements = scan("a = [\n  1,\n  2,\n]\nb = 1\n")
+    kind, element = elements[1]
+
+    assert kind == "value"
+    assert element.location.start.line == 0
+    assert element.location.end.line == 3
+
+
+def test_bom():
+    _, elements = scan("\ufeffa = 1")
+    kind, element = elements[0]
+
+    assert kind == "key"
+    assert element.path == ("a",)
+    assert element.location.start.character == 1
+
+
+@pytest.mark.parametrize("content", INVALID)
+def test_invalid(content: str):
+    with pytest.raises(TomlParsingError):
+        scan(content)
+
+
+def test_cancellation():
+    token = CancellationToken()
+    token.cancel()
+    reset = TOKEN.set(token)
+
+    try:
+        with pytest.raises(Cancelled):
+            scan("".join(f"a{i} = 1\n" for i in range(CHECKPOINT)))
+    finally:
+        TOKEN.reset(reset)
@@ -0,0 +1,46 @@
+import asyncio
+from dataclasses import dataclass, field
+
+from confit_lsp.stats import Histogram, Stats, instrument
+
+
+def test_histogram():
+    histogram = Histogram()
+
+    for _ in range(90):
+        histogram.record(1e-4)
+    for _ in range(10):
+        histogram.record(0.5)
+
+    assert histogram.count == 100
+    assert histogram.percentile(0.5) < 2e-4
+    assert 0.3 < histogram.percentile(0.99) <= 0.5
+
+    summary = histogram.summary()
+    assert summary["max_ms"] == 500
+
+
+@dataclass
+class Server:
+    stats: Stats = field(default_factory=Stats)
+
+
+def test_instrument():
+    @instrument("sync")
+    def handler(ls: Server, value: int) -> int:
+        return value
+
+    @instrument("async")
+    async def async_handler(ls: Server, value: int) -> int:
+        return value
+
+    ls = Server()
+
+    assert handler(ls, 1) == 1
+    assert asyncio.run(async_handler(ls, 2)) == 2
+
+    snapshot = ls.stats.snapshot(extra=True)
+
+    assert snapshot["handlers"]["sync"]["count"] == 1
+    assert snapshot["handlers"]["async"]["count"] == 1
+    assert snapshot["extra"]
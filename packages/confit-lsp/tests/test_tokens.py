@@ -0,0 +1,137 @@
+from confit_lite.registry import Registry
+from lsprotocol.types import Position
+
+from confit_lsp.descriptor import ConfigurationView
+from confit_lsp.metadata import MetadataStore
+from confit_lsp.tokens import (
+    FUNCTION,
+    KEYWORD,
+    NAMESPACE,
+    PARAMETER,
+    PROPERTY,
+    UNKNOWN,
+    VARIABLE,
+    TokenCache,
+    encode,
+    token_edits,
+)
+
+
+def scale(value: float, factor: int = 2) -> float:
+    return value * factor
+
+
+TOML = """
+[values]
+factor = 3
+
+[model]
+factory = "tests.scale"
+value = 1.0
+factor = "$values.factor"
+other = 1
+"""
+
+
+def metadata() -> MetadataStore:
+    registry = Registry()
+    registry["tests.scale"] = scale
+    return MetadataStore(None, registry=registry)
+
+
+def decode(data: list[int]) -> list[tuple[int, int, int, int, int]]:
+    """Absolute positions of relative-encoded tokens."""
+    tokens = []
+    line = character = 0
+
+    for i in range(0, len(data), 5):
+        delta_line, delta_character, length, kind, modifiers = data[i : i + 5]
+        character = character + delta_character if delta_line == 0 else delta_character
+        line += delta_line
+        tokens.append((line, character, length, kind, modifiers))
+
+    return tokens
+
+
+def test_encode():
+    view = ConfigurationView.from_source(TOML)
+
+    assert decode(encode(view, metadata())) == [
+        (1, 1, 6, NAMESPACE, 0),
+        (2, 0, 6, PROPERTY, 0),
+        (4, 1, 5, NAMESPACE, 0),
+        (5, 0, 7, KEYWORD, 0),
+        (5, 10, 13, FUNCTION, 0),
+        (6, 0, 5, PARAMETER, 0),
+        (7, 0, 6, PARAMETER, 0),
+        (7, 9, 16, VARIABLE, 0),
+        (8, 0, 5, PARAMETER, UNKNOWN),
+    ]
+
+
+def test_encode_nested():
+    view = ConfigurationView.from_source(
+        TOML
+        + 'inline = {factory = "tests.scale", value = "$values.factor"}\n'
+        + 'factors = ["$values.factor", 1]\n'
+        + "sub.factor = 2\n"
+    )
+
+    assert decode(encode(view, metadata()))[9:] == [
+        (9, 0, 6, PARAMETER, UNKNOWN),
+        (9, 10, 7, KEYWORD, 0),
+        (9, 20, 13, FUNCTION, 0),
+        (9, 35, 5, PARAMETER, 0),
+        (9, 43, 16, VARIABLE, 0),
+        (10, 0, 7, PARAMETER, UNKNOWN),
+        (10, 11, 16, VARIABLE, 0),
+        # Dotted keys are classified by their first component.
+        (11, 0, 10, PARAMETER, UNKNOWN),
+    ]
+
+
+def test_encode_range():
+    view = ConfigurationView.from_source(TOML)
+    tokens = decode(encode(view, metadata()))
+
+    data = encode(
+        view,
+        metadata(),
+        Position(line=5, character=0),
+        Position(line=6, character=0),
+    )
+
+    assert decode(data) == tokens[3:6]
+
+
+def test_token_edits():
+    store = metadata()
+    previous = encode(ConfigurationView.from_source(TOML), store)
+    current = encode(
+        ConfigurationView.from_source(
+            TOML.replace("value = 1.0", "value = 1.0\nbias = 0")
+        ),
+        store,
+    )
+
+    [edit] = token_edits(previous, current)
+    patched = list(previous)
+    patched[edit.start : edit.start + edit.delete_count] = edit.data or []
+
+    assert patched == current
+    assert len(edit.data or []) < len(current)
+
+    assert token_edits(current, current) == []
+
+
+def test_token_cache():
+    cache = TokenCache()
+
+    result_id = cache.put("file:///a.toml", [0, 0, 1, 0, 0])
+    assert cache.get("file:///a.toml", result_id) == [0, 0, 1, 0, 0]
+
+    assert cache.put("file:///a.toml", []) != result_id
+    assert cache.get("file:///a.toml", result_id) is None
+
+    cache.pop("file:///a.toml")
+    assert cache.get("file:///a.toml", result_id) is None
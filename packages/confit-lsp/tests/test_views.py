@@ -0,0 +1,59 @@
+from confit_lsp.descriptor import ConfigurationView
+from confit_lsp.settings import Settings
+from confit_lsp.views import ViewCache
+
+
+def make_view() -> ConfigurationView:
+    return ConfigurationView(data={}, keys={}, values={})
+
+
+def test_lookup_by_version():
+    cache = ViewCache()
+    view = make_view()
+
+    cache.put("file:///a.toml", 1, "a = 1", view)
+
+    assert cache.lookup("file:///a.toml", 1, "a = 1") is view
+    assert cache.lookup("file:///a.toml", 2, "a = 1") is None
+    assert cache.lookup("file:///b.toml", 1, "a = 1") is None
+
+    # Unversioned documents are compared by content.
+    assert cache.lookup("file:///a.toml", None, "a = 1") is view
+    assert cache.lookup("file:///a.toml", None, "a = 2") is None
+
+
+def test_lru_eviction():
+    cache = ViewCache(max_size=2)
+
+    cache.put("file:///a.toml", 1, "", make_view())
+    cache.put("file:///b.toml", 1, "", make_view())
+
+    # Accessing `a` makes `b` the least recently used.
+    cache.get("file:///a.toml")
+    cache.put("file:///c.toml", 1, "", make_view())
+
+    assert "file:///a.toml" in cache
+    assert "file:///b.toml" not in cache
+    assert "file:///c.toml" in cache
+
+    cache.resize(1)
+    assert len(cache) == 1
+    assert "file:///c.toml" in cache
+
+
+def test_stale_put():
+    cache = ViewCache()
+    view = make_view()
+
+    cache.put("file:///a.toml", 2, "a = 2", view)
+
+    # A slow parse of the previous version completes after the edit.
+    cache.put("file:///a.toml", 1, "a = 1", make_view())
+
+    assert cache.lookup("file:///a.toml", 2, "a = 2") is view
+
+
+def test_settings():
+    assert Settings.from_options(None).max_views == 32
+    assert Settings.from_options({"maxViews": 4}).max_views == 4
+    assert Settings.from_options({"maxViews": "many"}).max_views == 32
@@ -0,0 +1,110 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from lsprotocol.types import (
+    FileChangeType,
+    FileEvent,
+    Position,
+    ReferenceContext,
+    ReferenceParams,
+    TextDocumentIdentifier,
+    TextDocumentItem,
+)
+
+from confit_lsp import workspace
+from confit_lsp.main import ConfitLanguageServer, references
+from confit_lsp.workspace import WorkspaceIndex, discover
+
+CONFIG = """
+[model]
+factory = "tests.scale"
+value = 1.0
+factor = "$other.factor"
+
+[other]
+factor = 2
+"""
+
+
+def test_workspace_index(tmp_path: Path):
+    (tmp_path / "configs").mkdir()
+    (tmp_path / ".venv").mkdir()
+
+    config = tmp_path / "configs" / "a.toml"
+    config.write_text(CONFIG)
+    (tmp_path / "configs" / "broken.toml").write_text("[model\n")
+    (tmp_path / ".venv" / "ignored.toml").write_text(CONFIG)
+
+    paths = discover([str(tmp_path)])
+    assert [Path(p).name for p in paths] == ["a.toml", "broken.toml"]
+
+    index = WorkspaceIndex()
+    progress = list[tuple[int, int]]()
+    index.update(index.index(paths, lambda done, total: progress.append((done, total))))
+
+    assert progress[-1] == (2, 2)
+
+    uri = config.as_uri()
+    file = index.files[uri]
+
+    assert file.error is None
+    assert file.factories == {("model",): "tests.scale"}
+    assert file.locations == {("model",): (2, 10, 2, 23)}
+
+    (usage,) = index.usages("tests.scale")
+    assert usage.uri == uri
+    assert usage.range.start.line == 2
+
+    config.write_text(CONFIG.replace("tests.scale", "tests.other"))
+    files = index.refresh([FileEvent(uri=uri, type=FileChangeType.Changed)])
+    assert list(index.usages("tests.scale")) != []
+
+    index.update(files)
+    assert list(index.usages("tests.scale")) == []
+
+    index.update(index.refresh([FileEvent(uri=uri, type=FileChangeType.Deleted)]))
+    assert uri not in index.files
+
+
+def test_parallel_index(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(workspace, "PARALLEL_THRESHOLD", 1)
+
+    for i in range(4):
+        (tmp_path / f"{i}.toml").write_text(CONFIG)
+
+    index = WorkspaceIndex(max_workers=2)
+    files = index.index(discover([str(tmp_path)]))
+
+    assert len(files) == 4
+    assert index.files == {}
+
+
+def test_factory_references(tmp_path: Path, language_server: ConfitLanguageServer):
+    ls = language_server
+
+    for name in ["indexed", "open"]:
+        (tmp_path / f"{name}.toml").write_text(CONFIG)
+
+    ls.index.update(ls.index.index(discover([str(tmp_path)])))
+
+    # The open document differs from its indexed version.
+    uri = (tmp_path / "open.toml").as_uri()
+    ls.workspace.put_text_document(
+        TextDocumentItem(uri=uri, language_id="toml", version=1, text="\n" + CONFIG)
+    )
+
+    params = ReferenceParams(
+        text_document=TextDocumentIdentifier(uri=uri),
+        position=Position(line=3, character=12),
+        context=ReferenceContext(include_declaration=False),
+    )
+    locations = asyncio.run(references(ls, params))
+
+    assert locations is not None
+    assert sorted(
+        (location.uri, location.range.start.line) for location in locations
+    ) == [
+        ((tmp_path / "indexed.toml").as_uri(), 2),
+        (uri, 3),
+    ]
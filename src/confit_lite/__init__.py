@@ -1 +1,2 @@
 from .registry import REGISTRY
+from .resolution import aresolve, resolve
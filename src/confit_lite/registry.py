@@ -1,9 +1,166 @@
-from typing import Callable, overload
+import importlib
+import json
+import os
+from collections.abc import Iterator, MutableMapping
+from pathlib import Path
+from threading import RLock
+from typing import Any, Callable, overload
 
 from importlib.metadata import entry_points
 
 
-REGISTRY = dict[str, Callable]()
+MANIFEST_ENV = "CONFIT_MANIFEST"
+"""Environment variable pointing to a pre-generated manifest."""
+
+
+class Registry(MutableMapping[str, Callable]):
+    """Factory registry, with lazily imported plugins.
+
+    Plugins are discovered from entry-point metadata, without importing them.
+    Entry points that target a single factory (`name = "module:function"`)
+    are only imported when that factory is first resolved. Entry points that
+    target a whole module are imported the first time a name cannot be found,
+    or the registry is enumerated - unless a manifest lists their factories.
+    """
+
+    def __init__(self):
+        self._factories = dict[str, Callable]()
+        """Resolved factories."""
+
+        self._deferred = dict[str, Callable[[], Any]]()
+        """Known factory names, with the function that imports them."""
+
+        self._plugins = list[Callable[[], Any]]()
+        """Plugins whose factories are unknown until they are imported."""
+
+        self._exhaustive = False
+        """Whether the known names cover all plugins (i.e. a manifest was loaded)."""
+
+        self.generation = 0
+        """Incremented whenever a factory is registered or removed."""
+
+        self._lock = RLock()
+
+    def defer(self, name: str, loader: Callable[[], Any]) -> None:
+        """Declare a factory, imported by `loader` upon first access."""
+        with self._lock:
+            if name not in self._factories:
+                self._deferred[name] = loader
+
+    def defer_plugin(self, loader: Callable[[], Any]) -> None:
+        """Declare a plugin, whose factories are unknown until imported."""
+        with self._lock:
+            self._plugins.append(loader)
+
+    def load_manifest(self, path: str | os.PathLike) -> bool:
+        """Declare the factories listed in a manifest, without importing them.
+
+        A manifest maps factory names to `module:qualname` references, and is
+        considered exhaustive: plugins are not imported to enumerate names.
+
+        Returns:
+            Whether the manifest was loaded. Manifests written for another set
+            of installed plugins are stale, and ignored.
+        """
+        manifest = json.loads(Path(path).read_text())
+
+        if manifest.get("plugins") != installed_plugins():
+            return False
+
+        for name, target in manifest["factories"].items():
+            self.defer(name, lambda target=target: import_object(target))
+
+        self._exhaustive = True
+        return True
+
+    def loaded(self) -> dict[str, Callable]:
+        """Factories imported so far, without importing anything."""
+        with self._lock:
+            return dict(self._factories)
+
+    def load(self, name: str) -> Callable | None:
+        with self._lock:
+            if (factory := self._factories.get(name)) is not None:
+                return factory
+
+            if (loader := self._deferred.pop(name, None)) is not None:
+                loaded = loader()
+                # Importing the module usually registers the factory.
+                if name not in self._factories and callable(loaded):
+                    self._factories[name] = loaded
+                return self._factories.get(name)
+
+            if self._plugins:
+                self.load_plugins()
+                return self.load(name)
+
+            return None
+
+    def load_plugins(self) -> None:
+        """Import all plugins whose factories are not known yet."""
+        with self._lock:
+            while self._plugins:
+                self._plugins.pop(0)()
+
+    def load_all(self) -> None:
+        """Import every plugin and factory."""
+        with self._lock:
+            self.load_plugins()
+            for name in list(self._deferred):
+                self.load(name)
+
+    def __getitem__(self, name: str) -> Callable:
+        if (factory := self.load(name)) is None:
+            raise KeyError(name)
+        return factory
+
+    def __setitem__(self, name: str, factory: Callable) -> None:
+        # Plugins register their factories while being imported, from the
+        # thread that holds the lock: it is reentrant.
+        with self._lock:
+            self._factories[name] = factory
+            self._deferred.pop(name, None)
+            self.generation += 1
+
+    def __delitem__(self, name: str) -> None:
+        with self._lock:
+            if name in self._factories:
+                del self._factories[name]
+            else:
+                del self._deferred[name]
+            self.generation += 1
+
+    def __contains__(self, name: object) -> bool:
+        if name in self._factories or name in self._deferred:
+            return True
+
+        if not isinstance(name, str) or not self._plugins:
+            return False
+
+        self.load_plugins()
+        return name in self._factories or name in self._deferred
+
+    def names(self, load: bool = True) -> set[str]:
+        """All factory names, without importing factories whose name is known.
+
+        Args:
+            load: Whether to import plugins whose factories are unknown.
+                If `False`, only names known from metadata are returned.
+        """
+        if load and not self._exhaustive:
+            self.load_plugins()
+
+        with self._lock:
+            return self._factories.keys() | self._deferred.keys()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(sorted(self.names()))
+
+    def __len__(self) -> int:
+        return len(self.names())
+
+
+REGISTRY = Registry()
 
 
 @overload
@@ -31,9 +188,55 @@ def register[F: Callable](
     return do_register
 
 
+def import_object(target: str) -> Any:
+    """Import an object from a `module:qualname` reference."""
+    module_name, _, qualname = target.partition(":")
+    obj = importlib.import_module(module_name)
+
+    for attr in filter(None, qualname.split(".")):
+        obj = getattr(obj, attr)
+
+    return obj
+
+
+def installed_plugins() -> list[str]:
+    """The `confit` entry points, along with the version of their distribution."""
+    return sorted(
+        f"{ep.name}={ep.value}@{ep.dist.version if ep.dist else ''}"
+        for ep in entry_points(group="confit")
+    )
+
+
+def write_manifest(path: str | os.PathLike, registry: Registry = REGISTRY) -> None:
+    """Import every plugin, and write the resulting manifest."""
+    registry.load_all()
+
+    manifest = {
+        "plugins": installed_plugins(),
+        "factories": {
+            name: f"{factory.__module__}:{factory.__qualname__}"
+            for name, factory in sorted(registry.items())
+        },
+    }
+
+    Path(path).write_text(json.dumps(manifest, indent=2) + "\n")
+
+
 def load_plugins() -> None:
+    """Discover plugins from the `confit` entry point group.
+
+    Nothing is imported here: factories are resolved on first access.
+    """
+    manifest = os.environ.get(MANIFEST_ENV)
+
+    if manifest is not None and REGISTRY.load_manifest(manifest):
+        return
+
     for plugin in entry_points(group="confit"):
-        plugin.load()
+        if plugin.attr is None:
+            REGISTRY.defer_plugin(plugin.load)
+        else:
+            REGISTRY.defer(plugin.name, plugin.load)
 
 
 load_plugins()
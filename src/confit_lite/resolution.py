@@ -0,0 +1,390 @@
+"""Resolution of parsed configurations into objects.
+
+Tables with a `factory` key are instantiated with their (resolved) arguments,
+and `$path` strings are replaced by the element they point to. Each element is
+resolved exactly once, such that every reference to a factory shares the same
+object.
+
+Elements form a dependency graph: a table depends on its children, and a
+reference on its target. Factories whose dependencies are resolved run
+concurrently - on a thread pool, or on the event loop for async factories with
+`aresolve` - such that resolving a configuration takes as long as its critical
+path rather than the sum of its factories.
+"""
+
+import asyncio
+import inspect
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Self
+
+from .registry import REGISTRY, Registry
+
+Path = tuple[str | int, ...]
+"""Location of an element. Integers index arrays."""
+
+
+class ResolutionError(Exception):
+    """Raised when a configuration cannot be resolved."""
+
+
+class CircularReferenceError(ResolutionError):
+    """Raised when elements depend on each other."""
+
+    def __init__(self, cycle: list[Path]):
+        self.cycle = cycle
+        super().__init__(
+            "Circular reference: " + " -> ".join(map(dotted, [*cycle, cycle[0]]))
+        )
+
+
+def dotted(path: Path) -> str:
+    return ".".join(map(str, path)) or "<root>"
+
+
+def is_reference(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith("$")
+
+
+def reference_target(value: str) -> Path:
+    return tuple(value[1:].split("."))
+
+
+@dataclass
+class Node:
+    """An element that needs resolving: a table, an array or a reference."""
+
+    path: Path
+    value: Any
+    """The raw value, from the configuration."""
+
+    dependencies: list[Path] = field(default_factory=list)
+    """Nodes that must be resolved first."""
+
+    target: Path | None = None
+    """Normalized target, for references."""
+
+    @property
+    def factory(self) -> str | None:
+        if isinstance(self.value, dict) and isinstance(
+            name := self.value.get("factory"), str
+        ):
+            return name
+        return None
+
+
+class Resolver:
+    """Resolve a parsed configuration, see `resolve`."""
+
+    def __init__(self, config: dict[str, Any], registry: Registry = REGISTRY):
+        self.config = config
+        self.registry = registry
+
+        self.nodes = dict[Path, Node]()
+        """Tables, arrays and references, children first."""
+
+        self._collect((), config)
+
+        for node in self.nodes.values():
+            if is_reference(node.value):
+                node.target = self.locate(reference_target(node.value))
+                if node.target in self.nodes:
+                    node.dependencies.append(node.target)
+
+        self.check_cycles()
+
+    @classmethod
+    def from_nodes(
+        cls,
+        config: dict[str, Any],
+        nodes: dict[Path, Node],
+        registry: Registry = REGISTRY,
+    ) -> Self:
+        """Restore a resolver whose graph was built and checked already."""
+        resolver = cls.__new__(cls)
+        resolver.config = config
+        resolver.registry = registry
+        resolver.nodes = nodes
+        return resolver
+
+    def factories(self) -> dict[Path, str]:
+        """Factory name of each factory table."""
+        return {
+            path: name
+            for path, node in self.nodes.items()
+            if (name := node.factory) is not None
+        }
+
+    def _collect(self, path: Path, value: Any) -> None:
+        if isinstance(value, dict):
+            children = list(value.items())
+        elif isinstance(value, list):
+            children = list(enumerate(value))
+        elif is_reference(value):
+            self.nodes[path] = Node(path=path, value=value)
+            return
+        else:
+            return
+
+        dependencies = list[Path]()
+
+        for key, child in children:
+            child_path = (*path, key)
+            self._collect(child_path, child)
+            if child_path in self.nodes:
+                dependencies.append(child_path)
+
+        self.nodes[path] = Node(path=path, value=value, dependencies=dependencies)
+
+    def locate(self, target: Path) -> Path:
+        """Normalize a reference target, following the references along the way.
+
+        For instance, with `a = "$b"`, the target `a.c` is located at `b.c`.
+        """
+        seen = set[Path]()
+
+        while True:
+            value: Any = self.config
+            located = list[str | int]()
+
+            for i, key in enumerate(target):
+                if is_reference(value):
+                    prefix = target[:i]
+                    if prefix in seen:
+                        raise CircularReferenceError(sorted(seen, key=len))
+                    seen.add(prefix)
+                    target = reference_target(value) + target[i:]
+                    break
+
+                if isinstance(value, list) and isinstance(key, str) and key.isdigit():
+                    key = int(key)
+
+                try:
+                    value = value[key]
+                except (KeyError, IndexError, TypeError):
+                    raise ResolutionError(
+                        f"Reference to unknown element `{dotted(target)}`"
+                    ) from None
+
+                located.append(key)
+            else:
+                return tuple(located)
+
+    def check_cycles(self) -> None:
+        """Raise a `CircularReferenceError` before anything is instantiated."""
+        state = dict[Path, bool]()
+        """Whether a visited node is finished (`True`) or on the stack (`False`)."""
+
+        for root in self.nodes:
+            if root in state:
+                continue
+
+            stack = [(root, iter(self.nodes[root].dependencies))]
+            state[root] = False
+
+            while stack:
+                path, dependencies = stack[-1]
+
+                for dependency in dependencies:
+                    if (visited := state.get(dependency)) is None:
+                        state[dependency] = False
+                        stack.append(
+                            (dependency, iter(self.nodes[dependency].dependencies))
+                        )
+                        break
+                    if not visited:
+                        on_stack = [p for p, _ in stack]
+                        raise CircularReferenceError(
+                            on_stack[on_stack.index(dependency) :]
+                        )
+                else:
+                    state[path] = True
+                    stack.pop()
+
+    def value(self, path: Path, results: dict[Path, Any]) -> Any:
+        """Resolved value of an element, leaves included."""
+        if path in results:
+            return results[path]
+
+        value: Any = self.config
+        for key in path:
+            value = value[key]
+        return value
+
+    def build(self, node: Node, results: dict[Path, Any]) -> Any:
+        """Resolve a node that is not a factory, from its resolved dependencies."""
+        if node.target is not None:
+            return self.value(node.target, results)
+
+        if isinstance(node.value, list):
+            return [
+                self.value((*node.path, i), results) for i in range(len(node.value))
+            ]
+
+        return {key: self.value((*node.path, key), results) for key in node.value}
+
+    def call(self, node: Node, results: dict[Path, Any]) -> tuple[Callable, dict]:
+        """The factory of a node, along with its resolved arguments."""
+        name = node.factory
+        assert name is not None
+
+        if (factory := self.registry.get(name)) is None:
+            raise ResolutionError(f"Unknown factory `{name}` at `{dotted(node.path)}`")
+
+        arguments = {
+            key: self.value((*node.path, key), results)
+            for key in node.value
+            if key != "factory"
+        }
+
+        return factory, arguments
+
+    def resolve(self, max_workers: int | None = None) -> dict[str, Any]:
+        """Resolve the configuration, running factories on a thread pool."""
+        results = dict[Path, Any]()
+        remaining, dependents, ready = self._schedule()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = dict[Future, Path]()
+
+            try:
+                while ready or pending:
+                    while ready:
+                        node = self.nodes[ready.popleft()]
+
+                        if node.factory is None:
+                            results[node.path] = self.build(node, results)
+                            ready.extend(self._done(node.path, remaining, dependents))
+                            continue
+
+                        factory, arguments = self.call(node, results)
+                        future = executor.submit(run, factory, arguments)
+                        pending[future] = node.path
+
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                    for future in finished:
+                        path = pending.pop(future)
+                        results[path] = self._result(path, future.result)
+                        ready.extend(self._done(path, remaining, dependents))
+            finally:
+                for future in pending:
+                    future.cancel()
+
+        return results[()]
+
+    async def aresolve(self) -> dict[str, Any]:
+        """Resolve the configuration on the event loop.
+
+        Async factories are awaited, and the others run in the default executor.
+        """
+        results = dict[Path, Any]()
+        remaining, dependents, ready = self._schedule()
+        pending = dict[asyncio.Future, Path]()
+
+        try:
+            while ready or pending:
+                while ready:
+                    node = self.nodes[ready.popleft()]
+
+                    if node.factory is None:
+                        results[node.path] = self.build(node, results)
+                        ready.extend(self._done(node.path, remaining, dependents))
+                        continue
+
+                    factory, arguments = self.call(node, results)
+
+                    if inspect.iscoroutinefunction(factory):
+                        task = asyncio.ensure_future(factory(**arguments))
+                    else:
+                        task = asyncio.ensure_future(
+                            asyncio.to_thread(factory, **arguments)
+                        )
+
+                    pending[task] = node.path
+
+                if not pending:
+                    break
+
+                finished, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in finished:
+                    path = pending.pop(task)
+                    results[path] = self._result(path, task.result)
+                    ready.extend(self._done(path, remaining, dependents))
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return results[()]
+
+    def _schedule(
+        self,
+    ) -> tuple[dict[Path, int], dict[Path, list[Path]], deque[Path]]:
+        remaining = dict[Path, int]()
+        dependents = dict[Path, list[Path]]()
+
+        for node in self.nodes.values():
+            remaining[node.path] = len(node.dependencies)
+            for dependency in node.dependencies:
+                dependents.setdefault(dependency, []).append(node.path)
+
+        ready = deque(path for path, count in remaining.items() if count == 0)
+
+        return remaining, dependents, ready
+
+    def _done(
+        self,
+        path: Path,
+        remaining: dict[Path, int],
+        dependents: dict[Path, list[Path]],
+    ) -> list[Path]:
+        """Mark a node as resolved, and return the nodes that became ready."""
+        ready = list[Path]()
+
+        for dependent in dependents.get(path, []):
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+
+        return ready
+
+    def _result(self, path: Path, result: Callable[[], Any]) -> Any:
+        try:
+            return result()
+        except Exception as e:
+            name = self.nodes[path].factory
+            raise ResolutionError(
+                f"Factory `{name}` failed at `{dotted(path)}`: {e}"
+            ) from e
+
+
+def run(factory: Callable, arguments: dict[str, Any]) -> Any:
+    if inspect.iscoroutinefunction(factory):
+        return asyncio.run(factory(**arguments))
+    return factory(**arguments)
+
+
+def resolve(
+    config: dict[str, Any],
+    registry: Registry = REGISTRY,
+    max_workers: int | None = None,
+) -> dict[str, Any]:
+    """Instantiate the factories of a parsed configuration, and resolve references.
+
+    Independent factories run concurrently on a thread pool of `max_workers`
+    threads. Raises a `CircularReferenceError` if elements depend on each
+    other, before any factory is called.
+    """
+    return Resolver(config, registry).resolve(max_workers)
+
+
+async def aresolve(
+    config: dict[str, Any],
+    registry: Registry = REGISTRY,
+) -> dict[str, Any]:
+    """Like `resolve`, awaiting async factories on the running event loop."""
+    return await Resolver(config, registry).aresolve()
@@ -1,3 +1,5 @@
+"""Pydantic models of factory signatures, shared by the LSP and `compile_config`."""
+
 import inspect
 from typing import Callable, Any, get_type_hints
 from pydantic import BaseModel, ConfigDict, create_model
@@ -0,0 +1,294 @@
+"""Compiled configuration snapshots, for fast startup.
+
+`compile_config` validates a configuration against the signatures of its
+factories once, and writes its resolution graph to a binary snapshot.
+`load_config` then reads the snapshot instead of parsing and validating the
+configuration, as long as the snapshot matches the configuration file and the
+factories currently in the registry.
+
+Snapshots are pickles: only load the ones you wrote.
+"""
+
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import sys
+import tomllib
+from dataclasses import dataclass
+from pathlib import Path as FilePath
+from typing import Any, Callable, Iterable
+
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import FieldInfo
+
+from .registry import REGISTRY, Registry
+from .resolution import Node, Path, ResolutionError, Resolver, dotted
+from .signatures import get_pydantic_input_model
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CONFIT"
+SNAPSHOT_VERSION = 1
+
+
+class CompilationError(ResolutionError):
+    """Raised when a configuration does not match the signatures of its factories."""
+
+    def __init__(self, problems: list[str]):
+        self.problems = problems
+        super().__init__(
+            "Invalid configuration:\n" + "\n".join(f"- {p}" for p in problems)
+        )
+
+
+@dataclass
+class Snapshot:
+    fingerprint: str
+    """Identifies the factories the snapshot was validated against."""
+
+    source: tuple[int, int] | None
+    """Modification time and size of the configuration file, if any."""
+
+    config: dict[str, Any]
+    nodes: dict[Path, Node]
+
+
+def source_stat(path: str | os.PathLike) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def fingerprint(names: Iterable[str], registry: Registry = REGISTRY) -> str:
+    """Identify the factories behind a set of names, along with their signatures."""
+    entries = [sys.version]
+
+    for name in sorted(set(names)):
+        if (factory := registry.get(name)) is None:
+            entries.append(f"{name}=")
+            continue
+
+        try:
+            signature = str(inspect.signature(factory))
+        except (TypeError, ValueError):
+            signature = ""
+
+        module = getattr(factory, "__module__", "")
+        qualname = getattr(factory, "__qualname__", "")
+        entries.append(f"{name}={module}:{qualname}{signature}")
+
+    return hashlib.sha256("\n".join(entries).encode()).hexdigest()
+
+
+def input_model(
+    factory: Callable,
+) -> tuple[type[BaseModel], dict[str, FieldInfo], bool]:
+    """Input model of a factory, its named arguments, and whether it accepts others.
+
+    `*args` and `**kwargs` are part of the model, but are neither required nor
+    valid argument names.
+    """
+    model, _ = get_pydantic_input_model(factory)
+
+    try:
+        parameters = inspect.signature(factory).parameters
+    except (TypeError, ValueError):
+        return model, model.model_fields, False
+
+    variadic = {
+        name
+        for name, parameter in parameters.items()
+        if parameter.kind
+        in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD)
+    }
+    extra = any(
+        parameter.kind == inspect.Parameter.VAR_KEYWORD
+        for parameter in parameters.values()
+    )
+    fields = {
+        key: info for key, info in model.model_fields.items() if key not in variadic
+    }
+
+    return model, fields, extra
+
+
+def validate(resolver: Resolver) -> list[str]:
+    """Check the arguments of every factory against its signature.
+
+    Literal arguments - and references to literals - are validated with the
+    input model of the factory. Arguments provided by other factories are only
+    known once resolved.
+    """
+    problems = list[str]()
+    models = dict[str, tuple[type[BaseModel], dict[str, FieldInfo], bool]]()
+
+    for path, name in resolver.factories().items():
+        if (factory := resolver.registry.get(name)) is None:
+            problems.append(f"`{dotted(path)}`: unknown factory `{name}`.")
+            continue
+
+        if name not in models:
+            models[name] = input_model(factory)
+
+        model, fields, extra = models[name]
+
+        table = resolver.nodes[path].value
+        arguments = table.keys() - {"factory"}
+
+        if not extra:
+            for key in sorted(arguments - fields.keys()):
+                problems.append(
+                    f"`{dotted(path)}`: argument `{key}` is not recognized by `{name}`."
+                )
+
+        for key, info in fields.items():
+            if info.is_required() and key not in arguments:
+                problems.append(f"`{dotted(path)}`: argument `{key}` is missing.")
+
+        literals = dict[str, Any]()
+
+        for key in arguments & fields.keys():
+            node = resolver.nodes.get((*path, key))
+
+            if node is None:
+                literals[key] = table[key]
+            elif node.target is not None and node.target not in resolver.nodes:
+                literals[key] = resolver.value(node.target, {})
+
+        if not literals:
+            continue
+
+        try:
+            model.model_validate(literals)
+        except ValidationError as e:
+            for error in e.errors():
+                loc = error["loc"]
+
+                # Missing arguments were reported above.
+                if not loc or loc[0] not in literals:
+                    continue
+
+                problems.append(
+                    f"`{dotted((*path, str(loc[0])))}`: incompatible type. {error['msg']}"
+                )
+
+    return problems
+
+
+def compile_config(
+    config: dict[str, Any],
+    snapshot: str | os.PathLike,
+    registry: Registry = REGISTRY,
+    source: str | os.PathLike | None = None,
+) -> Resolver:
+    """Validate a parsed configuration, and write its snapshot.
+
+    Args:
+        config: The parsed configuration.
+        snapshot: Where to write the snapshot.
+        registry: The registry to validate against.
+        source: The configuration file, whose modification invalidates the snapshot.
+
+    Returns:
+        A resolver for the configuration.
+
+    Raises:
+        CompilationError: If arguments do not match the factory signatures.
+        CircularReferenceError: If elements depend on each other.
+    """
+    resolver = Resolver(config, registry)
+
+    if problems := validate(resolver):
+        raise CompilationError(problems)
+
+    content = Snapshot(
+        fingerprint=fingerprint(resolver.factories().values(), registry),
+        source=None if source is None else source_stat(source),
+        config=config,
+        nodes=resolver.nodes,
+    )
+
+    path = FilePath(snapshot)
+    header = MAGIC + SNAPSHOT_VERSION.to_bytes(2, "little")
+
+    try:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(header + pickle.dumps(content, pickle.HIGHEST_PROTOCOL))
+        os.replace(tmp, path)
+    except OSError:
+        logger.warning("Could not write snapshot %s", path, exc_info=True)
+
+    return resolver
+
+
+def load_snapshot(
+    snapshot: str | os.PathLike,
+    registry: Registry = REGISTRY,
+    source: str | os.PathLike | None = None,
+) -> Resolver | None:
+    """Read a snapshot, or `None` if it is missing or stale."""
+    try:
+        data = FilePath(snapshot).read_bytes()
+    except OSError:
+        return None
+
+    header = MAGIC + SNAPSHOT_VERSION.to_bytes(2, "little")
+
+    if not data.startswith(header):
+        return None
+
+    try:
+        content = pickle.loads(memoryview(data)[len(header) :])
+    except (
+        pickle.UnpicklingError,
+        EOFError,
+        AttributeError,
+        ImportError,
+        IndexError,
+        TypeError,
+        ValueError,
+    ):
+        # Truncated, or referring to classes that moved since.
+        logger.warning("Ignoring invalid snapshot %s", snapshot)
+        return None
+
+    if not isinstance(content, Snapshot):
+        return None
+
+    if source is not None:
+        try:
+            if content.source != source_stat(source):
+                return None
+        except OSError:
+            return None
+
+    names = [name for node in content.nodes.values() if (name := node.factory)]
+
+    if content.fingerprint != fingerprint(names, registry):
+        return None
+
+    return Resolver.from_nodes(content.config, content.nodes, registry)
+
+
+def load_config(
+    path: str | os.PathLike,
+    snapshot: str | os.PathLike | None = None,
+    registry: Registry = REGISTRY,
+    max_workers: int | None = None,
+) -> dict[str, Any]:
+    """Resolve a TOML configuration, through its snapshot when it is up to date.
+
+    The snapshot defaults to the configuration path with a `.snapshot` suffix,
+    and is (re-)compiled whenever it is missing or stale.
+    """
+    if snapshot is None:
+        snapshot = FilePath(path).with_suffix(".snapshot")
+
+    resolver = load_snapshot(snapshot, registry, source=path)
+
+    if resolver is None:
+        config = tomllib.loads(FilePath(path).read_text(encoding="utf-8"))
+        resolver = compile_config(config, snapshot, registry, source=path)
+
+    return resolver.resolve(max_workers)
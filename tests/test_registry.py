@@ -0,0 +1,114 @@
+import os
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+from confit_lite import registry as registry_module
+from confit_lite.registry import Registry, write_manifest
+
+
+class Loader:
+    """Counts imports, registering factories like a plugin module would."""
+
+    def __init__(self, registry: Registry, **factories: Callable):
+        self.registry = registry
+        self.factories = factories
+        self.calls = 0
+
+    def __call__(self) -> Any:
+        self.calls += 1
+        for name, factory in self.factories.items():
+            self.registry[name] = factory
+
+
+def test_deferred_entry_point():
+    registry = Registry()
+    loader = Loader(registry, join=os.path.join)
+    registry.defer("join", loader)
+
+    assert "join" in registry
+    assert registry.names() == {"join"}
+    assert loader.calls == 0
+
+    assert registry["join"] is os.path.join
+    assert registry["join"] is os.path.join
+    assert loader.calls == 1
+
+
+@pytest.mark.parametrize(
+    "access",
+    [
+        pytest.param(lambda registry: registry.get("missing"), id="miss"),
+        pytest.param(list, id="enumeration"),
+    ],
+)
+def test_module_plugin(access: Callable[[Registry], Any]):
+    registry = Registry()
+    loader = Loader(registry, join=os.path.join)
+    registry.defer_plugin(loader)
+
+    assert registry.loaded() == {}
+
+    access(registry)
+
+    assert loader.calls == 1
+    assert registry.loaded() == {"join": os.path.join}
+
+    access(registry)
+    assert loader.calls == 1
+
+
+def test_manifest(tmp_path: Path):
+    path = tmp_path / "manifest.json"
+
+    registry = Registry()
+    registry.defer_plugin(Loader(registry, join=os.path.join))
+    write_manifest(path, registry)
+
+    registry = Registry()
+    loader = Loader(registry, join=os.path.join)
+    registry.defer_plugin(loader)
+
+    assert registry.load_manifest(path)
+
+    # Names come from the manifest, without importing plugins.
+    assert registry.names() == {"join"}
+    assert loader.calls == 0
+
+    assert registry["join"] is os.path.join
+    assert loader.calls == 0
+
+
+def test_stale_manifest(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    path = tmp_path / "manifest.json"
+
+    registry = Registry()
+    registry["join"] = os.path.join
+    write_manifest(path, registry)
+
+    monkeypatch.setattr(
+        registry_module, "installed_plugins", lambda: ["other=other:f@1.0"]
+    )
+
+    registry = Registry()
+    loader = Loader(registry, split=os.path.split)
+    registry.defer_plugin(loader)
+
+    assert not registry.load_manifest(path)
+    assert registry.names() == {"split"}
+    assert loader.calls == 1
+
+
+def test_generation():
+    registry = Registry()
+    generation = registry.generation
+
+    registry["join"] = os.path.join
+    assert registry.generation == generation + 1
+
+    registry["join"] = os.path.split
+    assert registry.generation == generation + 2
+
+    del registry["join"]
+    assert registry.generation == generation + 3
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+
+import pytest
+
+from confit_lite.registry import Registry
+from confit_lite.resolution import (
+    CircularReferenceError,
+    ResolutionError,
+    aresolve,
+    resolve,
+)
+
+
+class Counter:
+    def __init__(self):
+        self.calls = list[str]()
+        self.lock = threading.Lock()
+
+    def record(self, name: str) -> None:
+        with self.lock:
+            self.calls.append(name)
+
+
+@pytest.fixture
+def counter() -> Counter:
+    return Counter()
+
+
+@pytest.fixture
+def registry(counter: Counter) -> Registry:
+    registry = Registry()
+
+    def make(name: str, value: object = None) -> dict:
+        counter.record(name)
+        return {"name": name, "value": value}
+
+    registry["make"] = make
+    return registry
+
+
+def test_shared_reference_runs_once(registry: Registry, counter: Counter):
+    config = {
+        "model": {"factory": "make", "name": "model"},
+        "a": {"factory": "make", "name": "a", "value": "$model"},
+        "b": {"factory": "make", "name": "b", "value": "$model"},
+        "alias": "$model",
+    }
+
+    result = resolve(config, registry)
+
+    assert sorted(counter.calls) == ["a", "b", "model"]
+    assert result["a"]["value"] is result["model"]
+    assert result["b"]["value"] is result["model"]
+    assert result["alias"] is result["model"]
+
+
+def test_independent_branches_overlap():
+    registry = Registry()
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait(name: str) -> str:
+        # Only passes if both branches run at the same time.
+        barrier.wait()
+        return name
+
+    registry["wait"] = wait
+    config = {
+        "a": {"factory": "wait", "name": "a"},
+        "b": {"factory": "wait", "name": "b"},
+    }
+
+    assert resolve(config, registry, max_workers=2) == {"a": "a", "b": "b"}
+
+
+def test_chain_runs_in_order(registry: Registry, counter: Counter):
+    config = {
+        "c": {"factory": "make", "name": "c", "value": "$b"},
+        "b": {"factory": "make", "name": "b", "value": "$a.value"},
+        "a": {"factory": "make", "name": "a", "value": {"x": 1}},
+    }
+
+    result = resolve(config, registry)
+
+    assert counter.calls == ["a", "b", "c"]
+    assert result["c"]["value"]["value"] == {"x": 1}
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        pytest.param({"a": "$b", "b": "$a"}, id="direct"),
+        pytest.param({"a": "$b.c", "b": {"c": "$a"}}, id="dotted"),
+        pytest.param({"a": {"b": "$a"}}, id="parent"),
+        pytest.param(
+            {
+                "a": {"factory": "make", "name": "a", "value": "$b"},
+                "b": {"factory": "make", "name": "b", "value": "$a"},
+            },
+            id="factories",
+        ),
+    ],
+)
+def test_cycles(config: dict, registry: Registry, counter: Counter):
+    with pytest.raises(CircularReferenceError):
+        resolve(config, registry)
+
+    # Cycles are detected before anything is instantiated.
+    assert counter.calls == []
+
+
+def test_unknown_factory(registry: Registry):
+    with pytest.raises(ResolutionError, match="Unknown factory `missing` at `a`"):
+        resolve({"a": {"factory": "missing"}}, registry)
+
+
+def test_unknown_reference(registry: Registry):
+    with pytest.raises(ResolutionError, match="unknown element `b.c`"):
+        resolve({"a": "$b.c", "b": {"d": 1}}, registry)
+
+
+def test_aresolve(registry: Registry, counter: Counter):
+    async def fetch(name: str, value: object = None) -> dict:
+        await asyncio.sleep(0)
+        counter.record(name)
+        return {"name": name, "value": value}
+
+    registry["fetch"] = fetch
+    config = {
+        "a": {"factory": "fetch", "name": "a"},
+        "b": {"factory": "make", "name": "b", "value": "$a"},
+        "c": {"factory": "fetch", "name": "c", "value": "$b"},
+    }
+
+    result = asyncio.run(aresolve(config, registry))
+
+    assert counter.calls == ["a", "b", "c"]
+    assert result["c"]["value"]["value"] is result["a"]
@@ -0,0 +1,125 @@
+from pathlib import Path
+
+import pytest
+
+from confit_lite.registry import Registry
+from confit_lite.snapshot import (
+    MAGIC,
+    CompilationError,
+    compile_config,
+    load_config,
+    load_snapshot,
+)
+
+CONFIG = """
+[model]
+factory = "scale"
+value = 2.0
+factor = "$settings.factor"
+
+[settings]
+factor = 3
+"""
+
+
+def scale(value: float, factor: int = 2) -> float:
+    return value * factor
+
+
+def scale_again(value: float, factor: int = 2, offset: float = 0.0) -> float:
+    return value * factor + offset
+
+
+@pytest.fixture
+def registry() -> Registry:
+    registry = Registry()
+    registry["scale"] = scale
+    return registry
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Path:
+    path = tmp_path / "config.toml"
+    path.write_text(CONFIG)
+    return path
+
+
+def test_round_trip(source: Path, registry: Registry):
+    snapshot = source.with_suffix(".snapshot")
+
+    assert load_config(source, registry=registry)["model"] == 6.0
+    assert snapshot.exists()
+
+    resolver = load_snapshot(snapshot, registry, source=source)
+    assert resolver is not None
+    assert resolver.resolve()["model"] == 6.0
+
+
+def test_stale_source(source: Path, registry: Registry):
+    snapshot = source.with_suffix(".snapshot")
+    load_config(source, registry=registry)
+
+    source.write_text(CONFIG.replace("factor = 3", "factor = 10"))
+
+    assert load_snapshot(snapshot, registry, source=source) is None
+    assert load_config(source, registry=registry)["model"] == 20.0
+
+
+def test_stale_signature(source: Path, registry: Registry):
+    snapshot = source.with_suffix(".snapshot")
+    load_config(source, registry=registry)
+
+    registry["scale"] = scale_again
+
+    assert load_snapshot(snapshot, registry, source=source) is None
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        pytest.param(b"NOTCONFIT", id="magic"),
+        pytest.param(MAGIC + (2**16 - 1).to_bytes(2, "little"), id="version"),
+    ],
+)
+def test_header_mismatch(source: Path, registry: Registry, header: bytes):
+    snapshot = source.with_suffix(".snapshot")
+    load_config(source, registry=registry)
+
+    data = snapshot.read_bytes()
+    snapshot.write_bytes(header + data[len(MAGIC) + 2 :])
+
+    assert load_snapshot(snapshot, registry, source=source) is None
+
+
+def test_truncated(source: Path, registry: Registry):
+    snapshot = source.with_suffix(".snapshot")
+    load_config(source, registry=registry)
+
+    snapshot.write_bytes(snapshot.read_bytes()[:-10])
+
+    assert load_snapshot(snapshot, registry, source=source) is None
+
+
+def test_variadic_arguments(tmp_path: Path):
+    def keywords(m: int, **kw: int) -> dict:
+        return dict(m=m, **kw)
+
+    def positional(m: int, *args: int) -> int:
+        return m
+
+    registry = Registry()
+    registry["keywords"] = keywords
+    registry["positional"] = positional
+
+    config = {
+        "a": {"factory": "keywords", "m": 1, "extra": 3},
+        "b": {"factory": "positional", "m": 1},
+    }
+
+    resolver = compile_config(config, tmp_path / "snapshot", registry)
+    assert resolver.resolve()["a"] == {"m": 1, "extra": 3}
+
+    config["b"]["extra"] = 3
+
+    with pytest.raises(CompilationError, match="argument `extra` is not recognized"):
+        compile_config(config, tmp_path / "snapshot", registry)